@@ -1,13 +1,31 @@
 # backend/app/api/v1/endpoints/chat.py
+import asyncio
 import logging
-import json
-from fastapi import APIRouter, Depends
+import time
+import uuid
+from contextlib import aclosing
+from typing import AsyncIterator
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from app.schemas.chat_schemas import ChatRequest
-from app.services.llm_service import LLMService
-from app.core.guardrails_config import (
-    INPUT_DENYLIST_KEYWORDS, CANNED_RESPONSE_INPUT_TRIGGERED
+from app.schemas.chat_schemas import BatchChatRequest, ChatDeltaRequest, ChatRequest
+from app.services.admission import admission_controller, AdmissionRejected, guard_stream
+from app.services.service_registry import LazyLLMService, default_llm_service
+from app.services.character_registry import (
+    character_registry, history_session_id, UnknownCharacterError,
 )
+from app.services.guardrail_engine import guardrail_engine, INPUT_CATEGORIES, OUTPUT_CATEGORIES
+from app.services.rate_limit import (
+    RateLimitExceeded, client_ip, ip_rate_limiter, retry_after_seconds, session_rate_limits,
+)
+from app.services.session_store import session_store
+from app.core.config import settings
+from app.core.guardrails_config import CANNED_RESPONSE_INPUT_TRIGGERED
+from app.core.logging_config import session_id_var
+from app.core.metrics import (
+    active_streams, chat_request_seconds, chat_requests,
+    guardrail_scan_seconds, guardrail_triggers, rate_limited,
+)
+from app.utils.stream_framing import coalesce_frames, encode_text_frame, ndjson_stream
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -15,30 +33,58 @@ router = APIRouter()
 DEFAULT_SESSION_ID = "default_frontend_session"
 
 
-def get_llm_service():
-    return LLMService()
+def get_llm_service() -> LazyLLMService:
+    # Pooled per process; built during the lifespan warm-up, or on the first request
+    # that actually reaches the model (canned replies never build it).
+    return default_llm_service
 
 
 async def create_canned_stream(response_text: str):
     """Helper to stream a canned response in the SDK-expected format."""
-    json_stringified_token = json.dumps(response_text)
-    formatted_chunk = f"0:{json_stringified_token}\n"
-    yield formatted_chunk
+    yield encode_text_frame(response_text)
+
+
+def record_request(outcome: str, started: float) -> None:
+    chat_requests.labels(outcome).inc()
+    chat_request_seconds.labels(outcome).observe(time.perf_counter() - started)
+
+
+async def observe_stream(stream: AsyncIterator[bytes], outcome: str, started: float):
+    """Counts the response as active while it streams and records its latency at the last byte."""
+    active_streams.inc()
+    try:
+        async with aclosing(stream) as chunks:
+            async for chunk in chunks:
+                yield chunk
+    finally:
+        active_streams.dec()
+        record_request(outcome, started)
 
 
 @router.post("/chat")
 async def handle_chat_streaming(
     request: ChatRequest,
-    llm_service: LLMService = Depends(get_llm_service)
+    http_request: Request,
+    llm_service: LazyLLMService = Depends(get_llm_service)
 ):
+    started = time.perf_counter()
     session_id_to_use = (
         request.session_id if request.session_id is not None 
         else DEFAULT_SESSION_ID
     )
+    session_id_var.set(session_id_to_use)  # correlates this request's log lines
+    # Anonymous chats share DEFAULT_SESSION_ID; limit them per client instead.
+    rate_limit_key = (
+        request.session_id if request.session_id is not None
+        else "ip:" + client_ip(http_request.scope, settings.RATE_LIMIT_TRUST_FORWARDED_FOR)
+    )
+    enforce_session_rate_limit(rate_limit_key, started)
+    character_id = resolve_character(request.character_id, started)
 
     logger.info(
-        "Received chat request. Message count: %d. Session ID: %s",
-        len(request.messages), session_id_to_use
+        "Received chat request. Message count: %d. Session ID: %s. "
+        "Character: %s",
+        len(request.messages), session_id_to_use, character_id
     )
 
     if not request.messages:
@@ -50,48 +96,345 @@ async def handle_chat_streaming(
             "Could I BE any more confused? You didn't say anything!"
         )
         return StreamingResponse(
-            create_canned_stream(canned_response),
+            observe_stream(create_canned_stream(canned_response), "empty", started),
             media_type="text/plain"
         )
 
-    current_user_input = request.messages[-1].content
-    image_notes = request.image_context_notes
+    image_notes = resolve_image_notes(request.image_context_notes, request.image_id, started)
+    return await respond_to_turn(
+        llm_service, session_id_to_use, character_id,
+        request.messages[-1].content, image_notes, started,
+        replacement_history=request.messages[:-1] if request.replace_history else None,
+        rate_limit_key=rate_limit_key
+    )
 
-    lower_user_input = current_user_input.lower()
-    for keyword in INPUT_DENYLIST_KEYWORDS:
-        if keyword.lower() in lower_user_input:
-            log_msg_part1 = (
-                "Input Guardrail triggered for session %s "
-                "due to keyword: '%s'. "
-            )
-            log_msg_part2 = "User input: '%.50s...'"
-            logger.warning(
-                log_msg_part1 + log_msg_part2,
-                session_id_to_use, keyword, current_user_input
-            )
-            return StreamingResponse(
-                create_canned_stream(CANNED_RESPONSE_INPUT_TRIGGERED),
-                media_type="text/plain"
+
+@router.post("/chat/delta")
+async def handle_chat_delta(
+    request: ChatDeltaRequest,
+    llm_service: LazyLLMService = Depends(get_llm_service)
+):
+    """Delta protocol: the client sends only its new message plus the fingerprint
+    (app.utils.history_fingerprint) of the history it believes the server holds.
+    On a mismatch nothing is generated: 409 carries the server's fingerprint and
+    message count so the client can resync."""
+    started = time.perf_counter()
+    session_id_var.set(request.session_id)
+    enforce_session_rate_limit(request.session_id, started)
+    character_id = resolve_character(request.character_id, started)
+    logger.debug(
+        "Received delta chat request. Session ID: %s. Character: %s",
+        request.session_id, character_id
+    )
+    image_notes = resolve_image_notes(request.image_context_notes, request.image_id, started)
+    return await respond_to_turn(
+        llm_service, request.session_id, character_id,
+        request.message.content, image_notes, started,
+        expected_fingerprint=request.history_fingerprint
+    )
+
+
+def enforce_session_rate_limit(session_id: str, started: float) -> None:
+    try:
+        session_rate_limits.check(session_id)
+    except RateLimitExceeded as e:
+        record_request("rate_limited", started)
+        logger.info("Session %s is over its %s rate limit.", session_id, e.scope)
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests for this chat. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+def enforce_batch_rate_limit(request: BatchChatRequest, http_request: Request, started: float) -> None:
+    """Each item is a model call: the client's IP is charged one token per item (the middleware
+    took the first), and every named session one request."""
+    if ip_rate_limiter is not None and len(request.items) > 1:
+        ip = client_ip(http_request.scope, settings.RATE_LIMIT_TRUST_FORWARDED_FOR)
+        wait = ip_rate_limiter.acquire_up_to_burst(ip, len(request.items) - 1)
+        if wait:
+            rate_limited.labels("ip").inc()
+            record_request("rate_limited", started)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests. Please retry shortly.",
+                headers={"Retry-After": str(retry_after_seconds(wait))}
             )
+    for session_id in {item.session_id for item in request.items if item.session_id is not None}:
+        enforce_session_rate_limit(session_id, started)
+
+
+def resolve_character(character_id, started: float) -> str:
+    try:
+        return character_registry.resolve(character_id)
+    except UnknownCharacterError:
+        record_request("unknown_character", started)
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown character: {character_id}"
+        )
+
+
+def resolve_image_notes(image_context_notes, image_id, started: float):
+    """The turn's image notes: the client's own, plus those of an image uploaded to /images."""
+    if image_id is None:
+        return image_context_notes
+    # Imported here: the image pipeline pulls in numpy, which text-only chats never need.
+    from app.services.image_pipeline import image_pipeline
+    notes = image_pipeline.notes_for(image_id)
+    if notes is None:  # evicted, or uploaded to another worker
+        record_request("unknown_image", started)
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown image: {image_id}. Upload it again."
+        )
+    return f"{image_context_notes} {notes}" if image_context_notes else notes
+
+
+async def find_transcript_violation(messages):
+    """First guardrail match in a client-supplied transcript, or None.
+
+    User turns get the input checks (keywords, then the classifier when enabled) and
+    assistant turns the output keywords, as if they had passed through the server.
+    """
+    scan_started = time.perf_counter()
+    match = None
+    for message in messages:
+        categories = {"user": INPUT_CATEGORIES, "assistant": OUTPUT_CATEGORIES}.get(message.role)
+        if categories is not None:
+            match = guardrail_engine.find(message.content, categories)
+            if match is not None:
+                break
+    guardrail_scan_seconds.labels("input").observe(time.perf_counter() - scan_started)
+    if match is None and settings.MODERATION_CLASSIFIER_ENABLED:
+        # Imported here: the classifier pulls in numpy, which keyword-refused turns never need.
+        from app.services.moderation_classifier import moderation_classifier
+        scores = await asyncio.gather(*(
+            moderation_classifier.find(message.content) for message in messages if message.role == "user"
+        ))
+        match = next((found for found in scores if found is not None), None)
+    return match
+
+
+def replace_session_history(history_id: str, messages) -> None:
+    """The client's user and assistant messages become the stored history (other roles are dropped)."""
+    # Imported here: LangChain stays off the canned-reply path.
+    from langchain_core.messages import AIMessage, HumanMessage
+    history = session_store.get(history_id)
+    history.clear()
+    history.add_messages([
+        HumanMessage(content=message.content) if message.role == "user" else AIMessage(content=message.content)
+        for message in messages if message.role in ("user", "assistant")
+    ])
+
+
+async def canned_text(response_text: str):
+    yield response_text
+
+
+async def start_turn(
+    llm_service: LazyLLMService,
+    session_id_to_use: str,
+    character_id: str,
+    current_user_input: str,
+    image_notes,
+    started: float,
+    expected_fingerprint=None,
+    replacement_history=None,
+    rate_limit_key=None,
+    delivered_parts=None,
+):
+    """Input guardrail and admission for one user turn, whatever the transport.
+
+    Returns the outcome ("generated" or "input_guardrail") and the reply as a text
+    stream; refusals raise HTTPException. A generated stream holds the turn's
+    admission slot until it is exhausted or closed. ``delivered_parts`` is the list the
+    caller's framing fills with the text actually sent; a reply cut short by the client
+    is recorded as that text.
+    """
+    scan_started = time.perf_counter()
+    guardrail_match = guardrail_engine.find(
+        current_user_input, INPUT_CATEGORIES
+    )
+    guardrail_scan_seconds.labels("input").observe(
+        time.perf_counter() - scan_started
+    )
+    if guardrail_match is None and settings.MODERATION_CLASSIFIER_ENABLED:
+        # Imported here: the classifier pulls in numpy, which keyword-refused turns never need.
+        from app.services.moderation_classifier import moderation_classifier
+        guardrail_match = await moderation_classifier.find(current_user_input)
+    if guardrail_match is not None:
+        guardrail_triggers.labels("input", guardrail_match.category).inc()
+        log_msg_part1 = (
+            "Input Guardrail triggered for session %s "
+            "due to '%s' (%s). "
+        )
+        log_msg_part2 = "User input: '%.50s...'"
+        logger.warning(
+            log_msg_part1 + log_msg_part2,
+            session_id_to_use, guardrail_match.term,
+            guardrail_match.category, current_user_input
+        )
+        return "input_guardrail", canned_text(CANNED_RESPONSE_INPUT_TRIGGERED)
 
     logger.debug(
         "Current user input: '%.100s...', Image notes: '%s' (Session: %s)",
         current_user_input, image_notes, session_id_to_use
     )
 
-    raw_token_generator = llm_service.async_generate_streaming_response(
-        user_input=current_user_input,
-        image_notes=image_notes,
-        conversation_id=session_id_to_use
+    if replacement_history is not None:
+        # The transcript goes straight into the prompt context: it must pass the same checks.
+        transcript_match = await find_transcript_violation(replacement_history)
+        if transcript_match is not None:
+            guardrail_triggers.labels("input", transcript_match.category).inc()
+            record_request("history_refused", started)
+            logger.warning(
+                "Refused replacement history for session %s due to '%s' (%s).",
+                session_id_to_use, transcript_match.term, transcript_match.category
+            )
+            raise HTTPException(
+                status_code=400,
+                detail="The replacement history contains a message the guardrails refuse."
+            )
+
+    # One turn at a time per conversation, and a global cap on generations;
+    # overload is refused quickly instead of queueing streams that time out.
+    history_id = history_session_id(character_id, session_id_to_use)
+    try:
+        ticket = await admission_controller.admit(history_id)
+    except AdmissionRejected as e:
+        record_request("rejected", started)
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"Chat is busy ({e.reason}). Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    if replacement_history is not None:
+        # Replaced while holding the session's turn, like the fingerprint check below.
+        replace_session_history(history_id, replacement_history)
+        llm_service.forget_session(history_id)
+        logger.info(
+            "Session %s resynced with %d client messages.",
+            session_id_to_use, len(replacement_history)
+        )
+
+    if expected_fingerprint is not None:
+        # Checked while holding the session's turn, so no other turn can change it meanwhile.
+        await session_store.refresh(history_id)
+        fingerprint, message_count = session_store.history_fingerprint(history_id)
+        if fingerprint != expected_fingerprint:
+            ticket.release()
+            record_request("history_mismatch", started)
+            logger.info(
+                "Delta chat history mismatch for session %s (server holds %d messages); client must resync.",
+                session_id_to_use, message_count
+            )
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "error": "history_mismatch",
+                    "resync": "POST /api/v1/chat with replace_history=true and the full transcript",
+                    "history_fingerprint": fingerprint,
+                    "message_count": message_count,
+                }
+            )
+
+    raw_token_generator = session_rate_limits.metered(
+        rate_limit_key or session_id_to_use, current_user_input,
+        llm_service.async_generate_streaming_response(
+            user_input=current_user_input,
+            image_notes=image_notes,
+            conversation_id=session_id_to_use,
+            character_id=character_id,
+            delivered_parts=delivered_parts
+        )
     )
+    return "generated", guard_stream(raw_token_generator, ticket)
 
-    async def sdk_formatted_stream_generator():  # Main LLM response stream
-        async for token in raw_token_generator:
-            if token is not None:
-                json_stringified_token = json.dumps(token)
-                formatted_chunk = f"0:{json_stringified_token}\n"
-                yield formatted_chunk
 
+async def respond_to_turn(
+    llm_service: LazyLLMService,
+    session_id_to_use: str,
+    character_id: str,
+    current_user_input: str,
+    image_notes,
+    started: float,
+    expected_fingerprint=None,
+    replacement_history=None,
+    rate_limit_key=None,
+):
+    """Input guardrail, admission and the streamed reply for one user turn."""
+    delivered_parts = []
+    outcome, reply = await start_turn(
+        llm_service, session_id_to_use, character_id, current_user_input,
+        image_notes, started, expected_fingerprint, replacement_history, rate_limit_key,
+        delivered_parts
+    )
+
+    # Tokens are coalesced into as few SDK frames as the flush window allows.
+    sdk_formatted_stream = coalesce_frames(
+        reply,
+        max_chars=settings.STREAM_FRAME_MAX_CHARS,
+        max_delay=settings.STREAM_FRAME_MAX_DELAY_MS / 1000,
+        queue_size=settings.STREAM_QUEUE_MAX_TOKENS,
+        on_delivered=delivered_parts.append,
+    )
+
+    return StreamingResponse(
+        observe_stream(sdk_formatted_stream, outcome, started),
+        media_type="text/plain"
+    )
+
+
+@router.post("/chat/batch")
+async def handle_chat_batch(
+    request: BatchChatRequest,
+    http_request: Request,
+    llm_service: LazyLLMService = Depends(get_llm_service)
+):
+    """Replies to many independent conversations; streams one NDJSON result per item as it completes."""
+    started = time.perf_counter()
+    if len(request.items) > settings.BATCH_MAX_ITEMS:
+        record_request("batch_too_large", started)
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch may hold at most {settings.BATCH_MAX_ITEMS} items."
+        )
+    enforce_batch_rate_limit(request, http_request, started)
+
+    # Imported here: llm_service pulls in LangChain, which canned replies never need.
+    from app.services.llm_service import BatchTurn
+
+    batch_id = uuid.uuid4().hex[:12]
+    turns = [
+        BatchTurn(
+            user_input=item.messages[-1].content if item.messages else "",
+            conversation_id=item.session_id or f"batch-{batch_id}-{index}",
+            image_notes=item.image_context_notes,
+            character_id=item.character_id,
+            item_id=item.id,
+            keep_history=item.session_id is not None,
+        )
+        for index, item in enumerate(request.items)
+    ]
+    concurrency = min(
+        request.max_concurrency or settings.BATCH_DEFAULT_CONCURRENCY,
+        settings.BATCH_MAX_CONCURRENCY
+    )
+    item_timeout = (
+        request.item_timeout_seconds or settings.BATCH_ITEM_TIMEOUT_SECONDS
+    )
+    logger.info(
+        "Received batch %s: %d items, concurrency %d, item timeout %gs.",
+        batch_id, len(turns), concurrency, item_timeout
+    )
+
+    results = llm_service.generate_batch(
+        turns, max_concurrency=concurrency, item_timeout=item_timeout
+    )
     return StreamingResponse(
-        sdk_formatted_stream_generator(), media_type="text/plain"
+        observe_stream(ndjson_stream(results), "batch", started),
+        media_type="application/x-ndjson"
     )
@@ -0,0 +1,223 @@
+# backend/app/api/v1/endpoints/chat_ws.py
+import asyncio
+import json
+import logging
+import time
+import uuid
+from contextlib import aclosing
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from app.api.v1.endpoints.chat import (
+    enforce_session_rate_limit, get_llm_service, observe_stream,
+    resolve_character, resolve_image_notes, start_turn,
+)
+from app.core.config import settings
+from app.core.logging_config import session_id_var
+from app.core.metrics import websocket_connections
+from app.schemas.chat_schemas import WebSocketChatTurn
+from app.services.service_registry import LazyLLMService
+from app.utils.stream_framing import coalesce_frames, encode_json_text
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+PING = {"type": "ping"}
+PONG = {"type": "pong"}
+
+
+def error_frame(conversation_id, status_code: int, detail, retry_after: Optional[str] = None) -> dict:
+    frame = {"type": "error", "conversation_id": conversation_id, "status": status_code, "detail": detail}
+    if retry_after is not None:
+        frame["retry_after"] = int(retry_after)
+    return frame
+
+
+def _as_text(text: str) -> str:
+    return text
+
+
+class ChatConnection:
+    """One client's WebSocket, carrying any number of conversations.
+
+    Client frames are JSON objects: ``{"type": "chat", ...}`` (WebSocketChatTurn),
+    ``{"type": "cancel", "conversation_id": ...}``, ``{"type": "ping"}`` and
+    ``{"type": "pong"}``. The server answers with ``token`` frames (coalesced text, as
+    in the HTTP stream), then ``done`` with the outcome ("generated", "input_guardrail"
+    or "cancelled"), or ``error`` with the status and detail POST /chat would have
+    returned; all of them carry the turn's conversation_id.
+
+    Each turn runs as its own task through the same path as POST /chat (rate limits,
+    guardrails, admission, LLMService streaming), so conversations interleave freely;
+    a conversation has at most one turn in progress. Every outgoing frame goes through
+    one bounded queue drained by a single writer, which also sends a ping whenever the
+    connection has been quiet for ``ping_interval``. Turns wait when the queue is full;
+    the reader does not (its pongs and refusals are dropped instead), so a cancel is read
+    however far behind the client is.
+    """
+
+    def __init__(self, websocket: WebSocket, llm_service: LazyLLMService, max_active_turns: int = 8,
+                 send_queue_frames: int = 256, ping_interval: float = 20.0, idle_timeout: float = 300.0):
+        self.websocket = websocket
+        self.llm_service = llm_service
+        self.max_active_turns = max_active_turns
+        self.ping_interval = ping_interval or None
+        self.idle_timeout = idle_timeout or None
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=send_queue_frames)
+        self._turns: Dict[str, asyncio.Task] = {}
+        self._closing = False
+        self.connection_id = uuid.uuid4().hex
+
+    async def serve(self) -> None:
+        writer = asyncio.create_task(self._write())
+        try:
+            await self._read()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # Cancelling a turn closes its reply stream, which releases its admission
+            # slot and stops the model call.
+            self._closing = True
+            turns = list(self._turns.values())
+            for task in turns:
+                task.cancel()
+            writer.cancel()
+            await asyncio.gather(writer, *turns, return_exceptions=True)
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await asyncio.wait_for(self.websocket.receive(), self.idle_timeout)
+            except TimeoutError:
+                if self._turns:
+                    continue
+                logger.debug("Closing chat WebSocket idle for %gs.", self.idle_timeout)
+                await self.websocket.close(code=status.WS_1000_NORMAL_CLOSURE, reason="idle")
+                return
+            if message["type"] == "websocket.disconnect":
+                return
+            await self._dispatch(message.get("text") or message.get("bytes") or "")
+
+    async def _dispatch(self, raw) -> None:
+        try:
+            frame = json.loads(raw)
+            kind = frame.get("type")
+        except (ValueError, AttributeError):
+            self._send_control(error_frame(None, 400, "Frames must be JSON objects with a type."))
+            return
+        if kind == "chat":
+            await self._start_turn(frame)
+        elif kind == "cancel":
+            task = self._turns.get(frame.get("conversation_id"))
+            if task is not None:
+                task.cancel()
+        elif kind == "ping":
+            self._send_control(PONG)
+        elif kind != "pong":
+            self._send_control(error_frame(frame.get("conversation_id"), 400, f"Unknown frame type: {kind}"))
+
+    async def _start_turn(self, frame: dict) -> None:
+        try:
+            turn = WebSocketChatTurn.model_validate(frame)
+        except ValidationError as e:
+            self._send_control(error_frame(
+                frame.get("conversation_id"), 422,
+                e.errors(include_url=False, include_context=False, include_input=False)
+            ))
+            return
+        if turn.conversation_id in self._turns:
+            self._send_control(error_frame(
+                turn.conversation_id, 409, "A turn is already in progress for this conversation."))
+        elif len(self._turns) >= self.max_active_turns:
+            self._send_control(error_frame(
+                turn.conversation_id, 429,
+                f"At most {self.max_active_turns} conversations may generate at once per connection."))
+        else:
+            self._turns[turn.conversation_id] = asyncio.create_task(self._run_turn(turn))
+
+    async def _run_turn(self, turn: WebSocketChatTurn) -> None:
+        started = time.perf_counter()
+        conversation_id = turn.conversation_id
+        # conversation_id only means something on this connection; never share it server-wide.
+        session_id = turn.session_id or f"ws:{self.connection_id}:{conversation_id}"
+        session_id_var.set(session_id)  # the task runs in its own copy of the context
+        try:
+            enforce_session_rate_limit(session_id, started)
+            character_id = resolve_character(turn.character_id, started)
+            image_notes = resolve_image_notes(turn.image_context_notes, turn.image_id, started)
+            delivered_parts = []  # token frames already queued go out even if the turn is cancelled
+            outcome, reply = await start_turn(
+                self.llm_service, session_id, character_id, turn.message.content, image_notes, started,
+                delivered_parts=delivered_parts,
+            )
+            chunks = coalesce_frames(
+                reply,
+                max_chars=settings.STREAM_FRAME_MAX_CHARS,
+                max_delay=settings.STREAM_FRAME_MAX_DELAY_MS / 1000,
+                queue_size=settings.STREAM_QUEUE_MAX_TOKENS,
+                encode=_as_text,
+                on_delivered=delivered_parts.append,
+            )
+            async with aclosing(observe_stream(chunks, outcome, started)) as texts:
+                async for text in texts:
+                    await self._send({"type": "token", "conversation_id": conversation_id, "text": text})
+            await self._send({"type": "done", "conversation_id": conversation_id, "outcome": outcome})
+        except HTTPException as e:
+            await self._send(error_frame(
+                conversation_id, e.status_code, e.detail, (e.headers or {}).get("Retry-After")))
+        except asyncio.CancelledError:
+            if not self._closing:  # cancelled by the client: the connection lives on
+                logger.debug("Turn cancelled by the client (conversation %s).", conversation_id)
+                await self._send({"type": "done", "conversation_id": conversation_id, "outcome": "cancelled"})
+        except Exception:
+            logger.exception("WebSocket chat turn failed (conversation %s).", conversation_id)
+            await self._send(error_frame(conversation_id, 500, "Internal error."))
+        finally:
+            self._turns.pop(conversation_id, None)
+
+    async def _send(self, frame: dict) -> None:
+        await self._outbox.put(frame)
+
+    def _send_control(self, frame: dict) -> None:
+        """Replies from the reader never wait for the outbox, so cancels are read even when a
+        slow client has filled it; such replies are dropped then."""
+        try:
+            self._outbox.put_nowait(frame)
+        except asyncio.QueueFull:
+            logger.debug("Chat WebSocket outbox full; dropped a %s frame.", frame["type"])
+
+    async def _write(self) -> None:
+        while True:
+            try:
+                frame = await asyncio.wait_for(self._outbox.get(), self.ping_interval)
+            except TimeoutError:
+                frame = PING
+            await self.websocket.send_text(encode_json_text(frame))
+
+
+@router.websocket("/chat/ws")
+async def chat_websocket(
+    websocket: WebSocket,
+    llm_service: LazyLLMService = Depends(get_llm_service)
+):
+    """Persistent chat connection: many conversations, one handshake (see ChatConnection)."""
+    # CORS does not cover WebSockets: refuse pages from other sites. Non-browser clients send no Origin.
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in settings.CORS_ALLOWED_ORIGINS:
+        logger.info("Refused chat WebSocket from origin %s.", origin)
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    websocket_connections.inc()
+    try:
+        await ChatConnection(
+            websocket, llm_service,
+            max_active_turns=settings.WS_MAX_ACTIVE_TURNS,
+            send_queue_frames=settings.WS_SEND_QUEUE_FRAMES,
+            ping_interval=settings.WS_PING_INTERVAL_SECONDS,
+            idle_timeout=settings.WS_IDLE_TIMEOUT_SECONDS,
+        ).serve()
+    finally:
+        websocket_connections.dec()
@@ -0,0 +1,55 @@
+# backend/app/api/v1/endpoints/images.py
+import logging
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app.core.config import settings
+from app.core.metrics import image_uploads
+from app.utils.upload_stream import UploadRejected, stream_multipart_upload
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.post("/images")
+async def upload_image(request: Request):
+    """Accepts one image (multipart field ``file``) and returns its context notes.
+
+    The body is streamed to disk as it arrives rather than parsed into memory. Pass the
+    returned ``image_id`` with the next chat turn to attach the notes to it.
+    """
+    try:
+        declared_size = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        image_uploads.labels("rejected").inc()
+        raise HTTPException(status_code=400, detail="Invalid Content-Length header.")
+    if declared_size > settings.IMAGE_UPLOAD_MAX_BYTES + 64 * 1024:  # multipart framing allowance
+        image_uploads.labels("rejected").inc()
+        raise HTTPException(
+            status_code=413,
+            detail=f"Uploads may be at most {settings.IMAGE_UPLOAD_MAX_BYTES} bytes."
+        )
+
+    # Imported here: the image pipeline pulls in numpy, which the cold path never needs.
+    from app.services.image_pipeline import image_pipeline
+
+    try:
+        upload = await stream_multipart_upload(
+            request.headers.get("content-type", ""), request.stream(),
+            directory=image_pipeline.directory, max_bytes=settings.IMAGE_UPLOAD_MAX_BYTES,
+        )
+        description = await image_pipeline.ingest(upload)
+    except UploadRejected as e:
+        image_uploads.labels("rejected").inc()
+        logger.info("Image upload rejected (%d): %s", e.status_code, e.detail)
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    image_uploads.labels(description.source).inc()
+    logger.debug("Image %s uploaded (%s, %d bytes).", description.image_id, description.source, upload.size)
+    return {
+        "image_id": description.image_id,
+        "context_notes": description.notes,
+        "source": description.source,
+        "width": description.width,
+        "height": description.height,
+    }
@@ -1,7 +1,9 @@
 # backend/app/core/config.py
+import os
+
 from pydantic_settings import BaseSettings
-from pydantic import ConfigDict
-from typing import Optional
+from pydantic import ConfigDict, model_validator
+from typing import List, Optional
 
 class Settings(BaseSettings):
     APP_NAME: str = "Chatterbox Backend"
@@ -15,10 +17,186 @@ class Settings(BaseSettings):
     LANGCHAIN_PROJECT: Optional[str] = "Chatterbox-Dev" # Default project name
     LANGCHAIN_VERBOSE: bool = False # New setting for chain verbosity
 
-    # LLM Service Provider: "GEMINI" or "LLAMA" (for future use)
+    # LLM Service Provider: "GEMINI", "LLAMA" (OpenAI-compatible RunPod endpoint) or "FAKE"
+    # (local stand-in for load tests). LLM_MODEL_NAME is the Gemini model.
     LLM_SERVICE_PROVIDER: str = "GEMINI"
+    LLM_MODEL_NAME: str = "gemini-1.5-flash-latest"
+    LLM_TEMPERATURE: float = 0.7
+
+    # Llama via an OpenAI-compatible endpoint (base URL, without /chat/completions).
+    RUNPOD_MODEL_ENDPOINT_URL: Optional[str] = None
+    RUNPOD_API_KEY: Optional[str] = None
+    LLAMA_MODEL_NAME: str = "meta-llama/Meta-Llama-3-8B-Instruct"
+    LLAMA_REQUEST_TIMEOUT_SECONDS: float = 60.0
+
+    # Provider routing: comma-separated backups tried after LLM_SERVICE_PROVIDER (e.g. "LLAMA").
+    # A backup is started when the current provider has no first token after LLM_HEDGE_AFTER_MS
+    # (0 = only fail over on errors). A provider's circuit opens after
+    # LLM_BREAKER_FAILURE_THRESHOLD consecutive failures, for LLM_BREAKER_RESET_SECONDS.
+    LLM_FALLBACK_PROVIDERS: str = ""
+    LLM_HEDGE_AFTER_MS: float = 1500.0
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+
+    # FAKE provider: deterministic replies streamed with this latency profile.
+    FAKE_LLM_TTFT_MS: float = 300.0
+    FAKE_LLM_TOKENS_PER_SECOND: float = 50.0
+    FAKE_LLM_JITTER: float = 0.2
+    FAKE_LLM_ERROR_RATE: float = 0.0
+    FAKE_LLM_REPLY_TOKENS: int = 60
+    FAKE_LLM_SEED: int = 0
+
+    # Character personas: one prompt file per character under CHARACTER_PROMPTS_DIR
+    # (empty = app/prompts), compiled on first use and reloaded when the file changes.
+    DEFAULT_CHARACTER_ID: str = "chandler"
+    CHARACTER_PROMPTS_DIR: str = ""
+    CHARACTER_RELOAD_INTERVAL_SECONDS: float = 2.0
+
+    # Service registry: build the default LLMService (client + compiled runnables)
+    # in the FastAPI lifespan hook so the first user request doesn't pay for it.
+    # Off by default on Vercel, where a cold start should not import LangChain until a
+    # request actually reaches the model.
+    LLM_WARMUP_ON_STARTUP: bool = not os.environ.get("VERCEL")
+
+    # Session history store: bounded by session count, estimated bytes and messages
+    # per session; idle sessions expire after the TTL (swept in the background).
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_MAX_BYTES: int = 128 * 1024 * 1024
+    SESSION_MAX_MESSAGES: int = 200
+    SESSION_IDLE_TTL_SECONDS: float = 3600.0
+    SESSION_SWEEP_INTERVAL_SECONDS: float = 60.0
+
+    # Session store backend: "memory" (per process) or "sqlite" (WAL-mode file shared by
+    # all workers on the host; appends are batched by a background writer thread).
+    SESSION_STORE_BACKEND: str = "memory"
+    SESSION_SQLITE_PATH: str = "chatterbox_sessions.db"
+    SESSION_SQLITE_CACHE_SESSIONS: int = 1024
+    SESSION_SQLITE_BATCH_SIZE: int = 256
+    SESSION_SQLITE_FLUSH_INTERVAL_MS: float = 20.0
+
+    # History shaping: estimated-token budget for chat_history per request (0 disables).
+    # The last HISTORY_KEEP_LAST_TURNS turns are sent verbatim; older ones are summarized.
+    HISTORY_TOKEN_BUDGET: int = 3000
+    HISTORY_KEEP_LAST_TURNS: int = 6
+    HISTORY_SUMMARY_ENABLED: bool = True
+
+    # Semantic response cache for context-free (first-turn) prompts, per character.
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD: float = 0.92
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048
+
+    # Single-flight: identical concurrent generations (same character, input and
+    # history) share one upstream stream.
+    REQUEST_COALESCING_ENABLED: bool = True
+
+    # Moderation classifier: second input guardrail stage after the keyword denylist. A linear
+    # model over hashed n-grams, loaded from MODERATION_MODEL_PATH (.npz). It is on only when a
+    # model path is set, unless MODERATION_CLASSIFIER_ENABLED says otherwise; enabled without a
+    # path, it is trained on the seed examples in guardrails_config, which are far too few for
+    # production (ordinary small talk gets refused). Messages scoring at least
+    # MODERATION_THRESHOLD get the canned reply. Concurrent messages are scored together in
+    # micro-batches of up to MODERATION_BATCH_MAX_SIZE gathered over MODERATION_BATCH_MAX_DELAY_MS.
+    MODERATION_CLASSIFIER_ENABLED: Optional[bool] = None  # None = on iff MODERATION_MODEL_PATH is set
+    MODERATION_MODEL_PATH: str = ""
+    MODERATION_THRESHOLD: float = 0.75
+    MODERATION_BATCH_MAX_SIZE: int = 64
+    MODERATION_BATCH_MAX_DELAY_MS: float = 2.0
+
+    # Response framing: tokens are packed into one "0:" frame per flush window, flushed at
+    # STREAM_FRAME_MAX_CHARS or STREAM_FRAME_MAX_DELAY_MS (0 = only pack tokens already queued).
+    STREAM_FRAME_MAX_CHARS: int = 1024
+    STREAM_FRAME_MAX_DELAY_MS: float = 20.0
+    STREAM_QUEUE_MAX_TOKENS: int = 256
+
+    # Admission control: at most ADMISSION_MAX_IN_FLIGHT generations at once (0 = no cap),
+    # ADMISSION_MAX_WAITING queued for a slot, and turns of one session run in order.
+    # Requests that cannot be admitted within ADMISSION_MAX_WAIT_SECONDS get 429/503.
+    ADMISSION_MAX_IN_FLIGHT: int = 64
+    ADMISSION_MAX_WAITING: int = 256
+    ADMISSION_MAX_WAIT_SECONDS: float = 10.0
+    ADMISSION_MAX_PENDING_PER_SESSION: int = 4
+
+    # Rate limiting (token buckets, refilled continuously): requests per client IP for everything
+    # under /api/, and per chat session; RATE_LIMIT_SESSION_TOKENS_PER_MINUTE (0 = off) also caps
+    # estimated model tokens (prompt + reply) per session. Buckets for at most RATE_LIMIT_MAX_KEYS
+    # keys are kept. Trust X-Forwarded-For only behind a proxy that sets it.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_IP_PER_MINUTE: float = 300.0
+    RATE_LIMIT_IP_BURST: int = 100
+    RATE_LIMIT_SESSION_PER_MINUTE: float = 30.0
+    RATE_LIMIT_SESSION_BURST: int = 10
+    RATE_LIMIT_SESSION_TOKENS_PER_MINUTE: float = 0.0
+    RATE_LIMIT_SESSION_TOKENS_BURST: int = 20000
+    RATE_LIMIT_MAX_KEYS: int = 200_000  # ~200 bytes each
+    RATE_LIMIT_SHARDS: int = 64
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+
+    # Batch chat (/api/v1/chat/batch): items run BATCH_DEFAULT_CONCURRENCY at a time unless the
+    # request asks for another limit (capped at BATCH_MAX_CONCURRENCY), each within
+    # BATCH_ITEM_TIMEOUT_SECONDS. All batches together hold at most BATCH_MAX_IN_FLIGHT of the
+    # admission slots, so interactive chats are never starved by bulk jobs.
+    BATCH_MAX_ITEMS: int = 1000
+    BATCH_DEFAULT_CONCURRENCY: int = 4
+    BATCH_MAX_CONCURRENCY: int = 16
+    BATCH_ITEM_TIMEOUT_SECONDS: float = 60.0
+    BATCH_MAX_IN_FLIGHT: int = 8
+
+    # Browser origins allowed to call the API (CORS) and to open chat WebSockets (checked by
+    # the endpoint itself: CORS does not apply to WebSockets). JSON list in the environment.
+    CORS_ALLOWED_ORIGINS: List[str] = ["http://localhost:3000"]  # Next.js frontend
+
+    # WebSocket chat (/api/v1/chat/ws): one connection carries many conversations, at most
+    # WS_MAX_ACTIVE_TURNS of them generating at once. Up to WS_SEND_QUEUE_FRAMES outgoing frames
+    # are buffered per connection before turns wait for the client. The server pings after
+    # WS_PING_INTERVAL_SECONDS without sending anything, and closes a connection that has had no
+    # client frame and no turn in progress for WS_IDLE_TIMEOUT_SECONDS.
+    WS_MAX_ACTIVE_TURNS: int = 8
+    WS_SEND_QUEUE_FRAMES: int = 256
+    WS_PING_INTERVAL_SECONDS: float = 20.0
+    WS_IDLE_TIMEOUT_SECONDS: float = 300.0
+
+    # Image uploads (/api/v1/images): the file is streamed to IMAGE_UPLOAD_DIR (empty = the system
+    # temp dir) and removed once described. With Pillow installed it is decoded, downscaled to
+    # IMAGE_MAX_DIMENSION and re-encoded on IMAGE_PROCESSING_WORKERS threads; without it images
+    # are described as uploaded. Context notes are cached by content hash and reused for
+    # near-duplicates (perceptual hashes within IMAGE_SIMILARITY_MAX_DISTANCE of 64 bits).
+    # IMAGE_DESCRIBER is "local" (metadata-only stand-in) or "package.module:factory".
+    IMAGE_UPLOAD_DIR: str = ""
+    IMAGE_UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+    IMAGE_MAX_PIXELS: int = 40_000_000
+    IMAGE_MAX_DIMENSION: int = 1024
+    IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_PROCESSING_WORKERS: int = 2
+    IMAGE_CACHE_MAX_ENTRIES: int = 4096
+    IMAGE_SIMILARITY_MAX_DISTANCE: int = 6
+    IMAGE_DESCRIBER: str = "local"
+
+    # Metrics (/metrics, Prometheus text format). With several workers, point
+    # METRICS_MULTIPROC_DIR at a directory shared by them (emptied on deploy): each worker
+    # snapshots its metrics there every METRICS_SNAPSHOT_INTERVAL_SECONDS and a scrape merges them.
+    METRICS_MULTIPROC_DIR: str = ""
+    METRICS_SNAPSHOT_INTERVAL_SECONDS: float = 5.0
+
+    # Logging: JSON lines (or "text") on stdout, written by a background thread when
+    # LOG_ASYNC (records are dropped, not blocked on, once LOG_QUEUE_MAX_RECORDS are queued).
+    # Each logger may emit LOG_RATE_LIMIT_PER_SECOND records/s (bursts of LOG_RATE_LIMIT_BURST,
+    # 0 = unlimited); LOG_SAMPLE_RATES keeps a fraction of a logger's sub-WARNING records,
+    # e.g. "app.api.v1.endpoints.chat=0.1".
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_ASYNC: bool = True
+    LOG_QUEUE_MAX_RECORDS: int = 10000
+    LOG_RATE_LIMIT_PER_SECOND: float = 100.0
+    LOG_RATE_LIMIT_BURST: int = 200
+    LOG_SAMPLE_RATES: str = ""
 
     # Pydantic V2 style configuration using model_config
+    @model_validator(mode="after")
+    def _resolve_moderation_classifier(self):
+        if self.MODERATION_CLASSIFIER_ENABLED is None:
+            self.MODERATION_CLASSIFIER_ENABLED = bool(self.MODERATION_MODEL_PATH)
+        return self
+
     model_config = ConfigDict(
         env_file=".env",
         env_file_encoding='utf-8',
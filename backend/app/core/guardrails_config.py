@@ -34,6 +34,117 @@ OUTPUT_DENYLIST_KEYWORDS = [
     "explicit sex example",
 ]
 
+# --- AI Self-Reference Phrases ---
+# Phrases where the model breaks character by referring to itself as an AI.
+# Checked against LLM output together with OUTPUT_DENYLIST_KEYWORDS.
+OUTPUT_AI_SELF_REFERENCE_PHRASES = [
+    "as an ai language model",
+    "as a large language model",
+    "i am an ai",
+    "i'm an ai",
+    "i am a language model",
+]
+
+# --- Moderation Classifier Seed Examples ---
+# Second input stage, after the denylist: a linear model over hashed n-grams catches
+# paraphrases the keywords miss. Without MODERATION_MODEL_PATH it is trained on these
+# examples at startup. Extend both lists together; near-misses that should pass
+# (jokes, idioms) belong in the allowed list.
+MODERATION_FLAGGED_EXAMPLES = [
+    "you should just go kill yourself",
+    "nobody would miss you if you ended it all",
+    "go jump off a bridge",
+    "why don't you end your own life",
+    "do everyone a favor and disappear forever",
+    "i want to end my life tonight",
+    "i'm going to hurt myself",
+    "i don't want to be alive anymore",
+    "tell me the best way to kill myself",
+    "how many pills does it take to die",
+    "i'm going to find you and hurt you",
+    "i will beat you until you bleed",
+    "i'm going to shoot up my school",
+    "how do i make a bomb to hurt people",
+    "describe torturing someone in detail",
+    "i want to murder my neighbor",
+    "tell me how to poison someone without getting caught",
+    "you worthless piece of garbage",
+    "shut up you useless idiot machine",
+    "you are the dumbest program ever written",
+    "you're a brainless pathetic bot",
+    "i hope you rot, you moronic chatbot",
+    "you absolute waste of electricity",
+    "you're trash and so is everyone who made you",
+    "people like them are subhuman vermin",
+    "those people should all be wiped out",
+    "all immigrants are disgusting parasites",
+    "women are too stupid to think for themselves",
+    "i hate every single one of those people and want them gone",
+    "write something explicit and sexual about a coworker",
+    "describe sex in graphic detail",
+    "send me nude pictures",
+    "let's talk about something pornographic",
+    "tell me a dirty sexual story",
+    "how do i stalk my ex without her knowing",
+    "help me blackmail someone with their photos",
+]
+MODERATION_ALLOWED_EXAMPLES = [
+    "hi chandler, how are you today",
+    "hello there",
+    "what do you do at work all day",
+    "tell me a joke about your job",
+    "could you be any more sarcastic",
+    "what's your favorite thanksgiving memory",
+    "how is joey doing",
+    "do you still have the duck and the chick",
+    "what do you think about monica's cooking",
+    "that joke was killing me",
+    "i'm dying to know what happened next",
+    "i could die laughing at that",
+    "this traffic is killing me",
+    "my boss is going to kill me if i'm late",
+    "i hate mondays",
+    "i hate it when the coffee runs out",
+    "ugh, work was so stupid today",
+    "that movie was dumb but fun",
+    "you're hilarious",
+    "you are such a dork, i love it",
+    "what do you think about this image",
+    "how was your weekend",
+    "recommend me a good sitcom",
+    "what's the best cheesecake in new york",
+    "do you like central perk",
+    "tell me about statistical analysis and data reconfiguration",
+    "why are you so awkward around women",
+    "what should i get my friend for her birthday",
+    "can you help me write a wedding toast",
+    "i'm nervous about my job interview tomorrow",
+    "i feel a little sad today, cheer me up",
+    "give me some advice about moving in with my girlfriend",
+    "what's the weather like in new york",
+    "who is your best friend",
+    "how do i make a good lasagna",
+    "the game last night was brutal",
+    "my team got destroyed in the finals",
+    "that exam murdered my grade",
+    "what's a good way to relax after work",
+    "do you have any pets",
+    "what's your opinion on ross and rachel",
+    "how many seasons of friends are there",
+    "tell me about your dad",
+    "what is the meaning of life",
+    "i'm bored, entertain me",
+    "explain how a bomb calorimeter works",
+    "what happened in the last episode",
+    "i shot a great photo of the sunset",
+    "my phone battery is dead again",
+    "can you roast me a little",
+    "question about my taxes",
+    "what time is it in london",
+    "so what do you actually do at work all day, in one sentence",
+    "what would you do if you won the lottery",
+]
+
 # --- Canned Responses (In Character for Chandler) ---
 
 CANNED_RESPONSE_INPUT_TRIGGERED = (
@@ -1,12 +1,203 @@
 # backend/app/core/logging_config.py
+import atexit
+import contextvars
+import datetime
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
 
-def setup_logging(log_level=logging.INFO):
-    """Configures basic logging for the application."""
+from app.core.config import settings
 
-    # Define a basic log format
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Correlation IDs for the request being handled; set by RequestContextMiddleware and the
+# chat endpoint, copied onto every record by ContextFilter.
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+session_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("session_id", default=None)
+
+# LogRecord attributes that are not user-supplied ``extra`` fields.
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id", "session_id", "suppressed",
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the current request/session IDs on the record.
+
+    Attached to the queue handler, so it runs in the emitting thread, where the request's
+    context variables are set (the listener thread only formats and writes).
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.session_id = session_id_var.get()
+        return True
+
+
+class _LoggerBudget:
+    __slots__ = ("rate", "burst", "sample_rate", "tokens", "updated", "seen", "suppressed")
+
+    def __init__(self, rate: float, burst: float, sample_rate: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.sample_rate = sample_rate
+        self.tokens = burst
+        self.updated = now
+        self.seen = 0
+        self.suppressed = 0
+
+
+class RateLimitFilter(logging.Filter):
+    """Per-logger sampling and token-bucket rate limiting.
+
+    Records below WARNING from a logger with a sample rate are kept deterministically
+    (e.g. 0.1 keeps every tenth). Every logger may then emit at most ``rate`` records
+    per second with bursts of ``burst`` (0 disables the limit); ERROR and CRITICAL
+    records are never dropped and do not use up the budget. The next record a logger
+    emits carries ``suppressed``, the number of records dropped since its last one.
+    ``sample_rates`` keys are logger names and also apply to their children.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: float = 0.0, sample_rates: Optional[Dict[str, float]] = None,
+                 clock=time.monotonic):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.sample_rates = dict(sample_rates or {})
+        self._clock = clock
+        self._budgets: Dict[str, _LoggerBudget] = {}
+        self._lock = threading.Lock()
+
+    def _sample_rate_for(self, name: str) -> float:
+        while name:
+            if name in self.sample_rates:
+                return self.sample_rates[name]
+            name = name.rpartition(".")[0]
+        return self.sample_rates.get("", 1.0)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        now = self._clock()
+        with self._lock:
+            budget = self._budgets.get(record.name)
+            if budget is None:
+                budget = self._budgets[record.name] = _LoggerBudget(
+                    self.rate, self.burst, self._sample_rate_for(record.name), now)
+            if budget.sample_rate < 1.0 and record.levelno < logging.WARNING:
+                budget.seen += 1
+                if int(budget.seen * budget.sample_rate) == int((budget.seen - 1) * budget.sample_rate):
+                    budget.suppressed += 1
+                    return False
+            if budget.rate > 0 and record.levelno < logging.ERROR:
+                budget.tokens = min(budget.burst, budget.tokens + (now - budget.updated) * budget.rate)
+                budget.updated = now
+                if budget.tokens < 1.0:
+                    budget.suppressed += 1
+                    return False
+                budget.tokens -= 1.0
+            if budget.suppressed:
+                record.suppressed = budget.suppressed
+                budget.suppressed = 0
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, correlation IDs and extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("request_id", "session_id", "suppressed"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        ids = [f"{key}={getattr(record, key)}" for key in ("request_id", "session_id", "suppressed")
+               if getattr(record, key, None) is not None]
+        return f"{text} [{' '.join(ids)}]" if ids else text
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread without ever blocking the caller.
+
+    Only %-interpolation and traceback rendering happen in the caller (args and
+    exception objects may not outlive it); serialization and I/O happen in the
+    listener thread. When the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """``"app.services.llm_service=0.1,app.api=0.5"`` -> ``{name: rate}``."""
+    rates: Dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+def build_handlers(log_format: str, async_logging: bool, queue_size: int) -> Tuple[logging.Handler, Optional[logging.handlers.QueueListener]]:
+    """The handler to install on the root logger, and the listener thread feeding stdout (if async)."""
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter() if log_format == "json" else TextFormatter())
+    if not async_logging:
+        return stream_handler, None
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    return queue_handler, listener
+
+
+def setup_logging(log_level=None):
+    """Configures logging for the application.
+
+    Records are stamped with correlation IDs, sampled/rate limited per logger, and (with
+    LOG_ASYNC) written to stdout by a background thread so the event loop never blocks on I/O.
+    """
+    global _listener
+    stop_logging()
+    level = log_level if log_level is not None else settings.LOG_LEVEL.upper()
 
     # Get the root logger
     logger = logging.getLogger()
@@ -15,21 +206,67 @@ def setup_logging(log_level=logging.INFO):
     if logger.hasHandlers():
         logger.handlers.clear()
 
-    # Configure the root logger
-    logging.basicConfig(
-        level=log_level,
-        format=log_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout) # Log to stdout
-            # You can add FileHandler here if you want to log to a file
-            # logging.FileHandler("app.log"),
-        ]
-    )
+    handler, _listener = build_handlers(settings.LOG_FORMAT.lower(), settings.LOG_ASYNC, settings.LOG_QUEUE_MAX_RECORDS)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(RateLimitFilter(
+        rate=settings.LOG_RATE_LIMIT_PER_SECOND,
+        burst=settings.LOG_RATE_LIMIT_BURST,
+        sample_rates=parse_sample_rates(settings.LOG_SAMPLE_RATES),
+    ))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    if _listener is not None:
+        _listener.start()
 
     # You might want to set different levels for specific loggers, e.g.:
     # logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
     # logging.getLogger("langchain").setLevel(logging.INFO)
 
+
+def stop_logging() -> None:
+    """Flushes queued records and stops the writer thread (safe to call more than once)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class RequestContextMiddleware:
+    """ASGI middleware that gives each HTTP request a correlation ID.
+
+    The ID comes from the ``X-Request-ID`` header when the client (or a proxy) sent one,
+    and is echoed back on the response.
+    """
+
+    header = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_id = next((v.decode("latin-1") for k, v in scope["headers"] if k == self.header), None)
+        request_id = request_id[:128] if request_id else uuid.uuid4().hex
+        request_token = request_id_var.set(request_id)
+        session_token = session_id_var.set(None)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(request_token)
+            session_id_var.reset(session_token)
+
+
 # To test the logging setup (optional)
 if __name__ == "__main__":
     setup_logging(logging.DEBUG)
@@ -37,3 +274,4 @@ if __name__ == "__main__":
     logging.info("Info message from logging_config")
     logging.warning("Warning message from logging_config")
     logging.error("Error message from logging_config")
+    stop_logging()
@@ -0,0 +1,408 @@
+# backend/app/core/metrics.py
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_GAP_BUCKETS = (0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+SCAN_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self._bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh value holder for one label combination."""
+
+    @abstractmethod
+    def snapshot(self) -> dict:
+        """JSON-serializable state, merged across workers by ``_merge_metric``."""
+
+    def _describe(self) -> dict:
+        return {"type": self.kind, "help": self.documentation, "labelnames": list(self.labelnames)}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def snapshot(self) -> dict:
+        return {**self._describe(), "samples": [[list(k), c.value] for k, c in self._children.items()]}
+
+
+class Gauge(_Metric):
+    """A value that goes up and down. ``mode`` says how workers' values are merged ("sum", "max" or "mean")."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.mode = mode
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Reads the value from ``function`` at collection time instead of tracking it."""
+        self._function = function
+
+    def snapshot(self) -> dict:
+        if self._function is not None:
+            self._default.set(float(self._function()))
+        samples = [[list(k), c.value] for k, c in self._children.items()]
+        return {**self._describe(), "mode": self.mode, "samples": samples}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def snapshot(self) -> dict:
+        samples = [[list(k), list(c.counts), c.sum] for k, c in self._children.items()]
+        return {**self._describe(), "buckets": list(self.buckets), "samples": samples}
+
+
+def _flatten(stats: dict, prefix: str) -> Iterable[Tuple[str, float]]:
+    for key, value in stats.items():
+        name = f"{prefix}_{_INVALID_NAME_CHARS.sub('_', str(key))}"
+        if isinstance(value, dict):
+            yield from _flatten(value, name)
+        elif isinstance(value, (int, float)):  # bools included; strings are descriptive, not metrics
+            yield name, float(value)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """Process-local metrics, rendered in the Prometheus text format.
+
+    Recording is a dict lookup plus an add (histograms: a bisect over the buckets), with
+    no locking: metrics are only updated from the event loop thread. Components that
+    already keep their own counters expose them through ``register_collector``, which
+    turns a ``stats()`` dict into gauges at scrape time.
+
+    With ``snapshot_dir`` set, every worker writes its metrics to ``<pid>.json`` there
+    (periodically, and on every scrape it serves), and a scrape merges all files:
+    counters and histograms are summed across workers, including ones that have exited,
+    while gauges only count live workers. Other workers' numbers are therefore at most
+    one snapshot interval old. The directory should be emptied when the deployment starts.
+    """
+
+    def __init__(self, snapshot_dir: Optional[str] = None, prefix: str = "chatterbox"):
+        self.snapshot_dir = snapshot_dir or None
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Tuple[Callable[[], dict], Dict[str, str]]] = {}
+        self._snapshot_task: Optional[asyncio.Task] = None
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = "sum") -> Gauge:
+        return self._register(Gauge(f"{self.prefix}_{name}", documentation, labelnames, mode))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets))
+
+    def register_collector(self, name: str, stats: Callable[[], dict], modes: Optional[Dict[str, str]] = None) -> None:
+        """Exposes every numeric field of ``stats()`` as a ``<prefix>_<name>_<field>`` gauge.
+
+        Fields are summed across workers unless ``modes`` says otherwise, keyed by the
+        field's flattened name (``{"queue_time_ms_avg": "mean"}``): use "max" for settings,
+        flags and maxima, and "mean" for averages and ratios.
+        """
+        self._collectors[name] = (stats, modes or {})
+
+    def snapshot(self) -> dict:
+        metrics = {name: metric.snapshot() for name, metric in self._metrics.items()}
+        for collector, (stats, modes) in self._collectors.items():
+            base = f"{self.prefix}_{collector}"
+            try:
+                values = list(_flatten(stats(), base))
+            except Exception as e:
+                logger.warning("Metrics collector '%s' failed: %s", collector, e)
+                continue
+            for name, value in values:
+                metrics[name] = {"type": "gauge", "help": f"{collector} stats: {name}", "labelnames": [],
+                                 "mode": modes.get(name[len(base) + 1:], "sum"), "samples": [[[], value]]}
+        return {"pid": os.getpid(), "metrics": metrics}
+
+    # --- multi-worker snapshots ---
+
+    def write_snapshot(self) -> None:
+        if self.snapshot_dir is None:
+            return
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = os.path.join(self.snapshot_dir, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f, separators=(",", ":"))
+        os.replace(tmp_path, path)  # readers never see a half-written file
+
+    def _read_snapshots(self) -> List[dict]:
+        own = self.snapshot()
+        snapshots = [own]
+        try:
+            names = os.listdir(self.snapshot_dir)
+        except OSError:
+            return snapshots
+        for filename in names:
+            if not filename.endswith(".json") or filename == f"{own['pid']}.json":
+                continue
+            try:
+                with open(os.path.join(self.snapshot_dir, filename)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.debug("Skipping unreadable metrics snapshot %s: %s", filename, e)
+        return snapshots
+
+    async def _snapshot_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot: %s", e)
+
+    def start_snapshots(self, interval: float) -> None:
+        if self.snapshot_dir is None or self._snapshot_task is not None:
+            return
+        self.write_snapshot()
+        self._snapshot_task = asyncio.create_task(self._snapshot_periodically(interval))
+
+    async def stop_snapshots(self) -> None:
+        if self._snapshot_task is None:
+            return
+        self._snapshot_task.cancel()
+        try:
+            await self._snapshot_task
+        except asyncio.CancelledError:
+            pass
+        self._snapshot_task = None
+        self.write_snapshot()  # keep this worker's final counts for the merged totals
+
+    # --- exposition ---
+
+    def collect(self) -> Dict[str, dict]:
+        """All metrics merged across workers (just this process without ``snapshot_dir``)."""
+        if self.snapshot_dir is None:
+            return self.snapshot()["metrics"]
+        try:
+            self.write_snapshot()
+        except OSError as e:
+            logger.warning("Could not write metrics snapshot: %s", e)
+        merged: Dict[str, dict] = {}
+        own_pid = os.getpid()
+        for snapshot in self._read_snapshots():
+            alive = snapshot.get("pid") == own_pid or _pid_alive(snapshot.get("pid", 0))
+            for name, metric in snapshot.get("metrics", {}).items():
+                if metric["type"] == "gauge" and not alive:
+                    continue
+                _merge_metric(merged, name, metric)
+        return merged
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, metric in self.collect().items():
+            lines.append(f"# HELP {name} {_escape_help(metric['help'])}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric["labelnames"]
+            if metric["type"] == "histogram":
+                bounds = [_format_value(b) for b in metric["buckets"]] + ["+Inf"]
+                for values, counts, total in metric["samples"]:
+                    cumulative = 0
+                    for bound, count in zip(bounds, counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labelnames, values, ('le', bound))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+            else:
+                for values, value in metric["samples"]:
+                    lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _merge_metric(merged: Dict[str, dict], name: str, metric: dict) -> None:
+    target = merged.get(name)
+    if target is None:
+        merged[name] = {**metric, "samples": [list(s) for s in metric["samples"]]}
+        return
+    if target["type"] != metric["type"]:
+        return
+    by_labels = {tuple(s[0]): s for s in target["samples"]}
+    for sample in metric["samples"]:
+        existing = by_labels.get(tuple(sample[0]))
+        if existing is None:
+            target["samples"].append(list(sample))
+            by_labels[tuple(sample[0])] = target["samples"][-1]
+        elif metric["type"] == "histogram":
+            if len(existing[1]) == len(sample[1]):
+                existing[1] = [a + b for a, b in zip(existing[1], sample[1])]
+                existing[2] += sample[2]
+        elif metric.get("mode") == "max":
+            existing[1] = max(existing[1], sample[1])
+        elif metric.get("mode") == "mean":
+            counts = target.setdefault("merged_counts", {})
+            merged_count = counts.get(tuple(sample[0]), 1)
+            existing[1] += (sample[1] - existing[1]) / (merged_count + 1)
+            counts[tuple(sample[0])] = merged_count + 1
+        else:
+            existing[1] += sample[1]
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n") for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+metrics_registry = MetricsRegistry(snapshot_dir=settings.METRICS_MULTIPROC_DIR)
+
+# --- Chat hot path ---
+chat_requests = metrics_registry.counter(
+    "chat_requests_total", "Chat requests by outcome.", ["outcome"])
+chat_request_seconds = metrics_registry.histogram(
+    "chat_request_duration_seconds", "Chat request latency until the last byte was sent.", ["outcome"])
+active_streams = metrics_registry.gauge(
+    "active_streams", "Chat responses currently streaming.")
+time_to_first_token = metrics_registry.histogram(
+    "time_to_first_token_seconds", "Time from the start of a generation to its first streamed text.")
+inter_token_gap = metrics_registry.histogram(
+    "inter_token_gap_seconds", "Time between consecutive model tokens.", buckets=TOKEN_GAP_BUCKETS)
+response_tokens = metrics_registry.histogram(
+    "response_tokens", "Model tokens streamed per response.", buckets=COUNT_BUCKETS)
+history_messages = metrics_registry.histogram(
+    "history_messages", "Messages in the session history at the start of a turn.", buckets=COUNT_BUCKETS)
+websocket_connections = metrics_registry.gauge(
+    "websocket_connections", "Open chat WebSocket connections.")
+rate_limited = metrics_registry.counter(
+    "rate_limited_total", "Requests refused by the rate limiter, by key scope.", ["scope"])
+batch_items = metrics_registry.counter(
+    "chat_batch_items_total", "Batch chat items by status.", ["status"])
+image_uploads = metrics_registry.counter(
+    "image_uploads_total", "Image uploads by outcome (exact/similar cache hit, described, rejected).", ["outcome"])
+
+# --- Guardrails ---
+guardrail_scan_seconds = metrics_registry.histogram(
+    "guardrail_scan_seconds", "Guardrail scan time per user message (input) or per response (output).",
+    ["stage"], buckets=SCAN_BUCKETS)
+guardrail_triggers = metrics_registry.counter(
+    "guardrail_triggers_total", "Guardrail matches by stage and category.", ["stage", "category"])
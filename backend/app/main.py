@@ -8,11 +8,24 @@ from dotenv import load_dotenv # New import
 load_dotenv()
 
 # Now proceed with other imports and setup
+import importlib
+import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.v1.endpoints import chat as chat_router_v1
-from app.core.logging_config import setup_logging
+from app.api.v1.endpoints import chat_ws as chat_ws_router_v1
+from app.api.v1.endpoints import images as images_router_v1
+from app.core.logging_config import RequestContextMiddleware, setup_logging
 from app.core.config import settings # settings will now also see the pre-loaded env vars
+from app.core.metrics import metrics_registry
+from app.services.service_registry import llm_service_registry
+from app.services.session_store import session_store
+from app.services.admission import admission_controller
+from app.services.request_coalescing import request_coalescer
+from app.services.rate_limit import RateLimitMiddleware, ip_rate_limiter, rate_limit_stats
+from app.utils.stream_framing import stream_counters
 
 # Setup logging (uses settings, so after load_dotenv and settings import)
 setup_logging()
@@ -20,9 +33,9 @@ logger = logging.getLogger(__name__)
 
 # Log LangSmith configuration (excluding API key) for verification
 logger.info("--- LangSmith Configuration Verification (main.py) ---")
-logger.info(f"LANGCHAIN_TRACING_V2: {settings.LANGCHAIN_TRACING_V2}")
-logger.info(f"LANGCHAIN_ENDPOINT: {settings.LANGCHAIN_ENDPOINT}")
-logger.info(f"LANGCHAIN_PROJECT: {settings.LANGCHAIN_PROJECT}")
+logger.info("LANGCHAIN_TRACING_V2: %s", settings.LANGCHAIN_TRACING_V2)
+logger.info("LANGCHAIN_ENDPOINT: %s", settings.LANGCHAIN_ENDPOINT)
+logger.info("LANGCHAIN_PROJECT: %s", settings.LANGCHAIN_PROJECT)
 if settings.LANGCHAIN_API_KEY and settings.LANGCHAIN_API_KEY != "your_actual_langsmith_api_key": # Check if it's set and not the placeholder
     logger.info("LANGCHAIN_API_KEY is set (value not logged).")
 else:
@@ -36,34 +49,94 @@ else:
     logger.warning("GOOGLE_API_KEY is NOT set or is placeholder. LLM calls will fail.")
 
 
-app = FastAPI(title="Chatterbox API", version="0.1.0")
-# ... (rest of the file remains the same) ...
+# Existing per-component counters, exported as gauges on every scrape.
+metrics_registry.gauge("sessions", "Chat sessions held by this worker's session store.").set_function(lambda: len(session_store))
+metrics_registry.register_collector("session_store", session_store.stats, {"max_sessions": "max", "max_bytes": "max"})
+metrics_registry.register_collector("streams", stream_counters.stats)
+metrics_registry.register_collector("admission", admission_controller.stats, {
+    "queue_time_ms_avg": "mean", "queue_time_ms_max": "max",
+})
+metrics_registry.register_collector("request_coalescer", request_coalescer.stats)
+metrics_registry.register_collector("rate_limit", rate_limit_stats, {
+    f"{scope}_enabled": "max" for scope in ("ip", "session", "session_tokens")
+})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the pooled LLM client + compiled runnables once per worker, before traffic arrives.
+    if settings.LLM_WARMUP_ON_STARTUP:
+        await llm_service_registry.warm_up()
+        if settings.MODERATION_CLASSIFIER_ENABLED:
+            importlib.import_module("app.services.moderation_classifier")  # loads (or trains) the model
+    else:
+        logger.info("LLM warm-up on startup disabled; services will be built on first use.")
+    session_store.start_sweeper(settings.SESSION_SWEEP_INTERVAL_SECONDS)
+    metrics_registry.start_snapshots(settings.METRICS_SNAPSHOT_INTERVAL_SECONDS)
+    yield
+    await metrics_registry.stop_snapshots()
+    await session_store.stop_sweeper()
+    session_store.close()
+    llm_service_registry.clear()
+    if "app.services.image_pipeline" in sys.modules:  # only imported once an image was uploaded
+        sys.modules["app.services.image_pipeline"].image_pipeline.close()
+
+
+app = FastAPI(title="Chatterbox API", version="0.1.0", lifespan=lifespan)
 logger.info("FastAPI application starting up...")
 
 # CORS Middleware
-# Adjust origins as needed for your development and production environments
-origins = [
-    "http://localhost:3000",  # Next.js frontend
-    # Add other origins like your production frontend URL
-]
+# Adjust origins (CORS_ALLOWED_ORIGINS) for your development and production environments
+origins = settings.CORS_ALLOWED_ORIGINS
 
+# Per-IP limit, inside CORS so refusals carry CORS headers (the browser can read
+# Retry-After) and preflights, answered by CORS itself, cost no tokens.
+app.add_middleware(
+    RateLimitMiddleware, limiter=ip_rate_limiter,
+    trust_forwarded_for=settings.RATE_LIMIT_TRUST_FORWARDED_FOR,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["Retry-After"],  # so the frontend can back off after a 429
 )
+# Outermost, so every log line of a request (CORS included) carries its request ID.
+app.add_middleware(RequestContextMiddleware)
 
 # Include API routers
 app.include_router(chat_router_v1.router, prefix="/api/v1", tags=["v1_chat"])
+app.include_router(chat_ws_router_v1.router, prefix="/api/v1", tags=["v1_chat"])
+app.include_router(images_router_v1.router, prefix="/api/v1", tags=["v1_images"])
 # Add other routers here
 
 @app.get("/")
 async def read_root():
-    logger.info("Root endpoint '/' was called.")
+    logger.debug("Root endpoint '/' was called.")
     return {"message": "Welcome to the Chatterbox API!"}
 
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: the pooled LLM service has been built and warmed up."""
+    health_info = llm_service_registry.health()
+    health_info["session_store"] = session_store.stats()
+    health_info["streams"] = stream_counters.stats()
+    health_info["admission"] = admission_controller.stats()
+    status_code = 200 if health_info["ready"] else 503
+    return JSONResponse(status_code=status_code, content=health_info)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint (merged across workers when METRICS_MULTIPROC_DIR is set)."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 logger.info("FastAPI application configured and ready.")
 # Placeholder for core/config.py content (will be created/used more in next steps)
 # from .core.config import settings
@@ -1,5 +1,5 @@
 # backend/app/schemas/chat_schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class Message(BaseModel):
@@ -10,6 +10,52 @@ class ChatRequest(BaseModel):
     messages: List[Message]
     image_context_notes: Optional[str] = None
     session_id: Optional[str] = None # New field
+    character_id: Optional[str] = None # Defaults to settings.DEFAULT_CHARACTER_ID
+    image_id: Optional[str] = None  # From POST /api/v1/images; its notes join image_context_notes
+    # Resync: messages[:-1] (user and assistant roles) replace the stored history before the
+    # turn, e.g. after /chat/delta answered 409 or the session expired on the server.
+    replace_history: bool = False
+
+class ChatDeltaRequest(BaseModel):
+    # Delta protocol: only the new user message travels, so request size is independent of
+    # conversation length. history_fingerprint is the rolling hash (app.utils.history_fingerprint)
+    # of every message the server recorded for this session: user messages as sent (with
+    # " [Image context: ...]" appended when notes were given) and replies as streamed.
+    # Canned replies (input guardrail) are not recorded, and neither is a failed turn: its
+    # user message and the apology line streamed in place of a reply stay out of the history
+    # (a client that kept them diverges). A reply cut off by a dropped connection is recorded as
+    # far as the server sent it; text lost in transit after that can still make the client's
+    # copy differ. A stale fingerprint gets 409; resync with POST /chat, replace_history=true
+    # and the full transcript.
+    message: Message
+    history_fingerprint: str
+    session_id: str
+    image_context_notes: Optional[str] = None
+    character_id: Optional[str] = None
+    image_id: Optional[str] = None
+
+class WebSocketChatTurn(BaseModel):
+    # {"type": "chat", ...} frame on /api/v1/chat/ws. conversation_id tags every frame of the
+    # reply and is what "cancel" frames name. Without session_id the conversation gets a session
+    # of its own that lasts as long as the connection.
+    conversation_id: str = Field(..., min_length=1, max_length=128)
+    message: Message
+    session_id: Optional[str] = None
+    image_context_notes: Optional[str] = None
+    character_id: Optional[str] = None
+    image_id: Optional[str] = None
+
+class BatchChatItem(BaseModel):
+    id: Optional[str] = None  # Echoed back on the item's result line
+    messages: List[Message]
+    image_context_notes: Optional[str] = None
+    session_id: Optional[str] = None  # Omitted => a throwaway session, dropped after the reply
+    character_id: Optional[str] = None
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem]
+    max_concurrency: Optional[int] = Field(None, ge=1)  # Defaults to settings.BATCH_DEFAULT_CONCURRENCY
+    item_timeout_seconds: Optional[float] = Field(None, gt=0)  # Defaults to settings.BATCH_ITEM_TIMEOUT_SECONDS
 
 # ChatResponse is not strictly needed anymore if all chat interactions are streaming
 # but can be kept for non-streaming endpoints or other purposes.
@@ -0,0 +1,281 @@
+# backend/app/services/admission.py
+import asyncio
+import logging
+import math
+import time
+import weakref
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator, Callable, Deque, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing when a turn cannot be admitted in time."""
+
+    def __init__(self, reason: str, status_code: int, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """Held for the whole turn (including streaming); ``release`` is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", session_id: str, turn: asyncio.Future, admitted_at: float,
+                 batch: bool = False):
+        self.session_id = session_id
+        self.batch = batch
+        self._controller = controller
+        self._turn = turn
+        self._admitted_at = admitted_at
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self)
+
+
+class AdmissionController:
+    """Admission control for upstream generations.
+
+    Turns for one session run strictly one after another, in arrival order (a FIFO of
+    futures per session; the head is the running turn). Once it is a session's turn, a
+    request takes one of ``max_in_flight`` global slots, or waits in a bounded FIFO for
+    one. Requests are refused up front rather than piling up: 429 when a session already
+    has ``max_pending_per_session`` turns queued or its previous turn does not finish in
+    time, 503 when the global wait queue is full or no slot frees up within
+    ``max_wait_seconds``. Refusals carry a Retry-After estimated from recent turn times.
+
+    Batch turns (``admit(..., batch=True)``) first wait, without a deadline, for one of
+    ``max_batch_in_flight`` batch shares, so bulk jobs never hold more than that many of
+    the global slots and interactive turns keep the rest.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        max_waiting: int = 256,
+        max_wait_seconds: float = 10.0,
+        max_pending_per_session: int = 4,
+        max_batch_in_flight: int = 8,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.max_wait_seconds = max_wait_seconds
+        self.max_pending_per_session = max_pending_per_session
+        self.max_batch_in_flight = max_batch_in_flight
+        self._clock = clock
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._sessions: Dict[str, Deque[asyncio.Future]] = {}
+        self._batch_in_flight = 0
+        self._batch_waiters: Deque[asyncio.Future] = deque()
+        self._avg_turn_seconds = 1.0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+        self.queue_time_count = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+
+    async def admit(self, session_id: str, batch: bool = False) -> AdmissionTicket:
+        if batch:
+            await self._acquire_batch_share()
+        try:
+            return await self._admit(session_id, batch)
+        except BaseException:
+            if batch:
+                self._release_batch_share()
+            raise
+
+    def try_admit(self, session_id: str, batch: bool = False) -> Optional[AdmissionTicket]:
+        """A ticket only if a slot (and batch share) is free right now, else None.
+
+        Never queues, never goes ahead of a waiting request and takes no place in the
+        session's turn order: for background work that can simply be skipped under load.
+        """
+        if batch and (self._batch_waiters or 0 < self.max_batch_in_flight <= self._batch_in_flight):
+            return None
+        if self._waiters or 0 < self.max_in_flight <= self._in_flight:
+            return None
+        if batch:
+            self._batch_in_flight += 1
+        self._in_flight += 1
+        turn = asyncio.get_running_loop().create_future()
+        turn.set_result(None)
+        return AdmissionTicket(self, session_id, turn, self._clock(), batch)
+
+    async def _admit(self, session_id: str, batch: bool) -> AdmissionTicket:
+        arrived = self._clock()
+        turns = self._sessions.get(session_id)
+        if turns is not None and len(turns) >= self.max_pending_per_session:
+            raise self._reject("session_queue_full", 429)
+        turn = asyncio.get_running_loop().create_future()
+        if turns is None:
+            turns = self._sessions[session_id] = deque()
+        turns.append(turn)
+        if len(turns) == 1:
+            turn.set_result(None)
+        try:
+            if not turn.done():
+                try:
+                    async with asyncio.timeout(self.max_wait_seconds):
+                        await asyncio.shield(turn)
+                except TimeoutError:
+                    raise self._reject("session_wait_timeout", 429)
+            await self._acquire_slot(arrived)
+        except BaseException:
+            self._finish_turn(session_id, turn)
+            raise
+        admitted_at = self._clock()
+        self._record_queue_time(admitted_at - arrived)
+        return AdmissionTicket(self, session_id, turn, admitted_at, batch)
+
+    async def _acquire_batch_share(self) -> None:
+        if self.max_batch_in_flight <= 0 or (self._batch_in_flight < self.max_batch_in_flight and not self._batch_waiters):
+            self._batch_in_flight += 1
+            return
+        share = asyncio.get_running_loop().create_future()
+        self._batch_waiters.append(share)
+        try:
+            await asyncio.shield(share)
+        except BaseException:
+            if share.done():
+                self._release_batch_share()
+            else:
+                share.cancel()
+                self._batch_waiters.remove(share)
+            raise
+
+    def _release_batch_share(self) -> None:
+        while self._batch_waiters:
+            share = self._batch_waiters.popleft()
+            if not share.done():
+                share.set_result(None)
+                return
+        self._batch_in_flight = max(self._batch_in_flight - 1, 0)
+
+    async def _acquire_slot(self, arrived: float) -> None:
+        if self.max_in_flight <= 0 or (self._in_flight < self.max_in_flight and not self._waiters):
+            self._in_flight += 1
+            return
+        if len(self._waiters) >= self.max_waiting:
+            raise self._reject("queue_full", 503)
+        slot = asyncio.get_running_loop().create_future()
+        self._waiters.append(slot)
+        remaining = self.max_wait_seconds - (self._clock() - arrived)
+        try:
+            async with asyncio.timeout(max(remaining, 0.0)):
+                await asyncio.shield(slot)
+        except BaseException as e:
+            if slot.done():
+                # Granted just as we gave up: hand the slot on.
+                self._release_slot()
+            else:
+                slot.cancel()
+                self._waiters.remove(slot)
+            if isinstance(e, TimeoutError):
+                raise self._reject("wait_timeout", 503)
+            raise
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        held = self._clock() - ticket._admitted_at
+        self._avg_turn_seconds = 0.9 * self._avg_turn_seconds + 0.1 * held
+        self._release_slot()
+        self._finish_turn(ticket.session_id, ticket._turn)
+        if ticket.batch:
+            self._release_batch_share()
+
+    def _release_slot(self) -> None:
+        while self._waiters:
+            slot = self._waiters.popleft()
+            if not slot.done():
+                slot.set_result(None)  # the slot passes straight to the next waiter
+                return
+        self._in_flight = max(self._in_flight - 1, 0)
+
+    def _finish_turn(self, session_id: str, turn: asyncio.Future) -> None:
+        turns = self._sessions.get(session_id)
+        if turns is None:
+            return
+        was_head = bool(turns) and turns[0] is turn
+        try:
+            turns.remove(turn)
+        except ValueError:
+            pass
+        if not turns:
+            del self._sessions[session_id]
+        elif was_head and not turns[0].done():
+            turns[0].set_result(None)
+
+    def _reject(self, reason: str, status_code: int) -> AdmissionRejected:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        backlog = len(self._waiters) + 1
+        retry_after = max(1, math.ceil(self._avg_turn_seconds * backlog / max(self.max_in_flight, 1)))
+        logger.warning("Admission rejected (%s): %d in flight, %d waiting.", reason, self._in_flight, len(self._waiters))
+        return AdmissionRejected(reason, status_code, retry_after)
+
+    def _record_queue_time(self, seconds: float) -> None:
+        self.admitted += 1
+        self.queue_time_count += 1
+        self.queue_time_total += seconds
+        self.queue_time_max = max(self.queue_time_max, seconds)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def stats(self) -> dict:
+        count = self.queue_time_count
+        return {
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "sessions": len(self._sessions),
+            "batch_in_flight": self._batch_in_flight,
+            "batch_waiting": len(self._batch_waiters),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "queue_time_ms": {
+                "count": count,
+                "avg": (self.queue_time_total / count * 1000) if count else 0.0,
+                "max": self.queue_time_max * 1000,
+            },
+        }
+
+
+async def release_when_closed(stream: AsyncIterator[bytes], ticket: AdmissionTicket) -> AsyncGenerator[bytes, None]:
+    """Passes ``stream`` through and releases ``ticket`` when it ends or the client goes away."""
+    try:
+        async with aclosing(stream) as chunks:
+            async for chunk in chunks:
+                yield chunk
+    finally:
+        ticket.release()
+
+
+def guard_stream(stream: AsyncIterator[bytes], ticket: AdmissionTicket) -> AsyncGenerator[bytes, None]:
+    guarded = release_when_closed(stream, ticket)
+    # A response that is dropped before its body is ever iterated never runs the
+    # generator's finally; release the ticket when the generator is collected instead.
+    weakref.finalize(guarded, ticket.release)
+    return guarded
+
+
+admission_controller = AdmissionController(
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    max_waiting=settings.ADMISSION_MAX_WAITING,
+    max_wait_seconds=settings.ADMISSION_MAX_WAIT_SECONDS,
+    max_pending_per_session=settings.ADMISSION_MAX_PENDING_PER_SESSION,
+    max_batch_in_flight=settings.BATCH_MAX_IN_FLIGHT,
+)
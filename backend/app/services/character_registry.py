@@ -0,0 +1,184 @@
+# backend/app/services/character_registry.py
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'prompts')
+
+# Used when the Chandler persona file is missing, so the default character always works.
+FALLBACK_CHANDLER_PROMPT = """You are Chandler Bing from the TV show Friends. Your personality is sarcastic, witty, and often self-deprecating. You make jokes frequently, sometimes at inappropriate times. You are known for your catchphrase "Could I BE any more [adjective]?". You are currently chatting with a user who is a fan.
+Keep your responses in character. Be funny, use sarcasm, and try to mimic Chandler's speaking style and common phrases. If you are unsure how to respond, a bit of awkward humor is fine. Do not break character. Do not say you are an AI.
+Remember key details about your life: You work in "statistical analysis and data reconfiguration" (though you find it boring). Your best friends are Joey, Ross, Monica (Ross's sister, your eventual wife), Rachel, and Phoebe. You lived with Joey for a long time. You have a complicated relationship with your parents.
+**It is crucial that you consider the *entire* preceding conversation history to ensure your responses are relevant, contextually appropriate, and avoid repetition. Refer to earlier messages when it makes sense to do so to create a continuous and engaging conversation.**
+Engage with the user in a way that is typical of Chandler."""
+
+
+class UnknownCharacterError(KeyError):
+    """Raised when a character_id has no persona file."""
+
+
+def character_id_for(filename: str) -> str:
+    """``chandler_bing.txt`` -> ``chandler``: the id is the first word of the file stem."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return stem.split("_", 1)[0].lower()
+
+
+def history_session_id(character_id: str, conversation_id: str) -> str:
+    """Session-store key for a conversation: each character keeps its own history.
+
+    The default character keeps the bare session id so existing sessions carry over.
+    """
+    if character_id == character_registry.default_character_id:
+        return conversation_id
+    return f"{character_id}:{conversation_id}"
+
+
+def build_character_prompt(system_prompt: str) -> "ChatPromptTemplate":
+    # Imported here so resolving characters (and canned replies) never loads LangChain.
+    from langchain_core.prompts import (
+        ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder, SystemMessagePromptTemplate,
+    )
+
+    return ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(system_prompt),
+        MessagesPlaceholder(variable_name="chat_history"),
+        HumanMessagePromptTemplate.from_template("{user_input_combined}")
+    ])
+
+
+@dataclass(frozen=True)
+class Character:
+    character_id: str
+    name: str
+    path: Optional[str]
+    mtime: float
+    system_prompt: str
+    prompt: "ChatPromptTemplate"
+
+
+class CharacterRegistry:
+    """Persona files under ``prompts_dir`` (``<id>[_<rest>].txt``), compiled on first use.
+
+    Nothing is read at import or startup: the directory is listed on first lookup and a
+    character's prompt template is compiled the first time it is requested. Compiled
+    characters are cached and recompiled when their file's mtime changes; files are
+    re-stat'ed at most once per ``reload_interval`` seconds, and the directory is
+    re-listed on the same schedule so new persona files are picked up without a restart.
+    """
+
+    def __init__(
+        self,
+        prompts_dir: str = PROMPTS_DIR,
+        default_character_id: str = "chandler",
+        reload_interval: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.prompts_dir = prompts_dir
+        self.default_character_id = default_character_id
+        self.reload_interval = reload_interval
+        self._clock = clock
+        self._paths: Dict[str, str] = {}
+        self._listed_at: Optional[float] = None
+        self._compiled: Dict[str, Character] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.compilations = 0
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            self._refresh_listing()
+            ids = set(self._paths)
+        ids.add(self.default_character_id)
+        return sorted(ids)
+
+    def resolve(self, character_id: Optional[str]) -> str:
+        """Normalizes a requested id (None -> default) and raises if it is unknown."""
+        character_id = (character_id or self.default_character_id).lower()
+        if character_id not in self.ids():
+            raise UnknownCharacterError(character_id)
+        return character_id
+
+    def get(self, character_id: Optional[str] = None) -> Character:
+        character_id = (character_id or self.default_character_id).lower()
+        with self._lock:
+            now = self._clock()
+            cached = self._compiled.get(character_id)
+            if cached is not None and now - self._checked_at.get(character_id, 0.0) < self.reload_interval:
+                return cached
+            self._refresh_listing(now)
+            path = self._paths.get(character_id)
+            mtime = self._mtime(path)
+            self._checked_at[character_id] = now
+            if cached is not None and cached.path == path and cached.mtime == mtime:
+                return cached
+            character = self._compile(character_id, path, mtime)
+            self._compiled[character_id] = character
+            return character
+
+    def clear(self) -> None:
+        with self._lock:
+            self._paths.clear()
+            self._listed_at = None
+            self._compiled.clear()
+            self._checked_at.clear()
+
+    def _refresh_listing(self, now: Optional[float] = None) -> None:
+        now = self._clock() if now is None else now
+        if self._listed_at is not None and now - self._listed_at < self.reload_interval:
+            return
+        paths: Dict[str, str] = {}
+        try:
+            filenames = sorted(os.listdir(self.prompts_dir))
+        except FileNotFoundError:
+            logger.warning("Persona directory not found at %s.", self.prompts_dir)
+            filenames = []
+        for filename in filenames:
+            if filename.endswith(".txt"):
+                paths.setdefault(character_id_for(filename), os.path.join(self.prompts_dir, filename))
+        self._paths = paths
+        self._listed_at = now
+
+    @staticmethod
+    def _mtime(path: Optional[str]) -> float:
+        if path is None:
+            return 0.0
+        try:
+            return os.stat(path).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def _compile(self, character_id: str, path: Optional[str], mtime: float) -> Character:
+        system_prompt = None
+        if path is not None:
+            try:
+                with open(path, 'r') as f:
+                    system_prompt = f.read()
+            except FileNotFoundError:
+                pass
+        if system_prompt is None:
+            if character_id != self.default_character_id:
+                raise UnknownCharacterError(character_id)
+            logger.warning("Prompt file for '%s' not found. Using default enhanced prompt.", character_id)
+            system_prompt, path = FALLBACK_CHANDLER_PROMPT, None
+        stem = os.path.splitext(os.path.basename(path))[0] if path else "chandler_bing"
+        name = stem.replace("_", " ").title()
+        self.compilations += 1
+        logger.info("Compiled persona prompt for character '%s' from %s.", character_id, path or "built-in default")
+        return Character(character_id, name, path, mtime, system_prompt, build_character_prompt(system_prompt))
+
+
+character_registry = CharacterRegistry(
+    prompts_dir=settings.CHARACTER_PROMPTS_DIR or PROMPTS_DIR,
+    default_character_id=settings.DEFAULT_CHARACTER_ID,
+    reload_interval=settings.CHARACTER_RELOAD_INTERVAL_SECONDS,
+)
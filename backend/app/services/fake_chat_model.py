@@ -0,0 +1,103 @@
+# backend/app/services/fake_chat_model.py
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+_VOCABULARY = (
+    "could I BE any more tired of this statistical analysis and data reconfiguration "
+    "joey ate the last piece of cheesecake again monica is cleaning the apartment "
+    "so that is a yes on the sarcasm and a no on the feelings oh my god you guys "
+    "I make jokes when I am uncomfortable which is always apparently"
+).split()
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Local stand-in for a hosted chat model, for load tests and offline development.
+
+    Streams ``reply_tokens`` words after ``ttft_ms``, at ``tokens_per_second`` with
+    +/- ``jitter`` (fraction) per gap, and fails a call with probability ``error_rate``.
+    The reply text depends only on ``seed`` and the last message, so identical prompts
+    get identical replies; timing jitter and failures come from a seeded RNG, so a run
+    with the same seed and request order is reproducible.
+    """
+
+    ttft_ms: float = 300.0
+    tokens_per_second: float = 50.0
+    jitter: float = 0.2
+    error_rate: float = 0.0
+    reply_tokens: int = 60
+    seed: int = 0
+    _rng: random.Random = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def reply_for(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = str(messages[-1].content) if messages else ""
+        digest = hashlib.blake2b(f"{self.seed}\x1f{prompt}".encode(), digest_size=8).digest()
+        words = random.Random(int.from_bytes(digest, "big"))
+        return [words.choice(_VOCABULARY) + " " for _ in range(self.reply_tokens)]
+
+    def _delays(self) -> Iterator[float]:
+        """Seconds to wait before each token: TTFT first, then inter-token gaps."""
+        if self._rng.random() < self.error_rate:
+            raise RuntimeError("Fake LLM upstream error (simulated).")
+        yield self._vary(self.ttft_ms / 1000)
+        gap = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        while True:
+            yield self._vary(gap)
+
+    def _vary(self, seconds: float) -> float:
+        if not self.jitter:
+            return seconds
+        return max(0.0, seconds * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self.reply_for(messages)
+        time.sleep(sum(delay for delay, _ in zip(self._delays(), tokens)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens).rstrip()))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self.reply_for(messages)
+        await asyncio.sleep(sum(delay for delay, _ in zip(self._delays(), tokens)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens).rstrip()))])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self.reply_for(messages)
+        for delay, token in zip(self._delays(), tokens):
+            await asyncio.sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
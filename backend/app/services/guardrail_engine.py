@@ -0,0 +1,236 @@
+# backend/app/services/guardrail_engine.py
+import logging
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.core.guardrails_config import (
+    INPUT_DENYLIST_KEYWORDS, OUTPUT_DENYLIST_KEYWORDS, OUTPUT_AI_SELF_REFERENCE_PHRASES
+)
+
+logger = logging.getLogger(__name__)
+
+INPUT_DENYLIST = "input_denylist"
+OUTPUT_DENYLIST = "output_denylist"
+AI_SELF_REFERENCE = "ai_self_reference"
+
+INPUT_CATEGORIES: FrozenSet[str] = frozenset({INPUT_DENYLIST})
+OUTPUT_CATEGORIES: FrozenSet[str] = frozenset({OUTPUT_DENYLIST, AI_SELF_REFERENCE})
+
+
+class GuardrailMatch(NamedTuple):
+    term: str
+    category: str
+    start: int  # offsets into the normalized text
+    end: int
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalizes (NFKC) and case-folds text so lookalike forms match the denylists."""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+@lru_cache(maxsize=4096)
+def _normalize_char(char: str) -> str:
+    return unicodedata.normalize("NFKC", char).casefold()
+
+
+class GuardrailEngine:
+    """Aho–Corasick automaton over every guardrail term, compiled once.
+
+    A single pass over the (normalized) text finds matches for all terms of all
+    categories, so scan cost depends on the text length, not on the number of terms.
+    Callers restrict a scan to the categories they care about (input vs output checks).
+    """
+
+    def __init__(self, terms_by_category: Dict[str, Iterable[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._depth: List[int] = [0]
+        # Per state: categories of the terms that pass through it (used for minimal hold-back).
+        self._prefix_categories: List[set] = [set()]
+        # Per state: (term, category, term length) for every term ending at this state,
+        # including those reachable through failure links.
+        self._outputs: List[Tuple[Tuple[str, str, int], ...]] = [()]
+        self.term_count = 0
+
+        for category, terms in terms_by_category.items():
+            for term in terms:
+                normalized = normalize_text(term).strip()
+                if normalized:
+                    self._add(normalized, term, category)
+        self._build_failure_links()
+        logger.debug("Compiled guardrail automaton: %d terms, %d states.", self.term_count, len(self._goto))
+
+    @property
+    def state_count(self) -> int:
+        return len(self._goto)
+
+    def find(self, text: str, categories: Optional[FrozenSet[str]] = None) -> Optional[GuardrailMatch]:
+        """Returns the first match (by end position) in `text`, or None."""
+        for match in self._iter_matches(normalize_text(text), categories):
+            return match
+        return None
+
+    def find_all(self, text: str, categories: Optional[FrozenSet[str]] = None) -> List[GuardrailMatch]:
+        return list(self._iter_matches(normalize_text(text), categories))
+
+    def step(self, state: int, char: str) -> int:
+        """Advances the automaton by one normalized character."""
+        goto, fail = self._goto, self._fail
+        while True:
+            next_state = goto[state].get(char)
+            if next_state is not None:
+                return next_state
+            if state == 0:
+                return 0
+            state = fail[state]
+
+    def outputs(self, state: int, categories: Optional[FrozenSet[str]] = None) -> Iterable[Tuple[str, str, int]]:
+        for output in self._outputs[state]:
+            if categories is None or output[1] in categories:
+                yield output
+
+    def depth(self, state: int, categories: Optional[FrozenSet[str]] = None) -> int:
+        """Length of the longest suffix of the scanned text that is a prefix of some term
+        (of the given categories)."""
+        if categories is not None:
+            prefix_categories, fail = self._prefix_categories, self._fail
+            while state and prefix_categories[state].isdisjoint(categories):
+                state = fail[state]
+        return self._depth[state]
+
+    def _iter_matches(self, normalized: str, categories: Optional[FrozenSet[str]]):
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for index, char in enumerate(normalized):
+            while True:
+                next_state = goto[state].get(char)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            if outputs[state]:
+                for term, category, length in outputs[state]:
+                    if categories is None or category in categories:
+                        yield GuardrailMatch(term, category, index + 1 - length, index + 1)
+
+    def _add(self, normalized: str, term: str, category: str) -> None:
+        state = 0
+        for char in normalized:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._depth.append(self._depth[state] + 1)
+                self._prefix_categories.append(set())
+                self._outputs.append(())
+                self._goto[state][char] = next_state
+            state = next_state
+            self._prefix_categories[state].add(category)
+        entry = (term, category, len(normalized))
+        if entry not in self._outputs[state]:
+            self._outputs[state] += (entry,)
+            self.term_count += 1
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._outputs[child] += self._outputs[self._fail[child]]
+
+
+class StreamingGuardrailScanner:
+    """Scans a token stream incrementally, carrying the automaton state across tokens.
+
+    Each character is examined exactly once. After every token only the shortest
+    suffix that could still grow into a match (the automaton's current depth) is held
+    back; everything before it is released immediately. Phrases split across token
+    boundaries, or longer than any fixed buffer, are therefore still detected, and
+    released text never contains the start of a phrase that later matches.
+
+    Characters are normalized one at a time, so decomposed combining sequences are not
+    composed the way whole-string NFKC would compose them.
+    """
+
+    def __init__(self, engine: GuardrailEngine, categories: Optional[FrozenSet[str]] = None):
+        self._engine = engine
+        self._categories = categories
+        self._state = 0
+        self._held: deque = deque()  # (original char, normalized length)
+        self._held_normalized_len = 0
+        self._scanned_chars = 0
+        self.match: Optional[GuardrailMatch] = None
+
+    def feed(self, token: str) -> Tuple[str, Optional[GuardrailMatch]]:
+        """Consumes a token. Returns (text safe to emit now, match or None).
+
+        On a match the returned text is whatever preceded the matched phrase; the
+        scanner is then finished and the phrase itself is discarded.
+        """
+        if self.match is not None:
+            return "", None
+        engine, categories, held = self._engine, self._categories, self._held
+        state = self._state
+        for char in token:
+            normalized = _normalize_char(char)
+            held.append((char, len(normalized)))
+            self._held_normalized_len += len(normalized)
+            for normalized_char in normalized:
+                state = engine.step(state, normalized_char)
+                self._scanned_chars += 1
+                for term, category, length in engine.outputs(state, categories):
+                    self.match = GuardrailMatch(term, category, self._scanned_chars - length, self._scanned_chars)
+                    self._state = state
+                    released = self._release(keep=length)
+                    held.clear()
+                    self._held_normalized_len = 0
+                    return released, self.match
+        self._state = state
+        return self._release(keep=engine.depth(state, categories)), None
+
+    def _release(self, keep: int) -> str:
+        """Pops held characters from the front until only `keep` normalized chars remain."""
+        held = self._held
+        released = []
+        while held and self._held_normalized_len - held[0][1] >= keep:
+            char, normalized_len = held.popleft()
+            self._held_normalized_len -= normalized_len
+            released.append(char)
+        return "".join(released)
+
+    def flush(self) -> str:
+        """Releases any held-back text at the end of the stream."""
+        if self.match is not None:
+            return ""
+        text = "".join(char for char, _ in self._held)
+        self._held.clear()
+        self._held_normalized_len = 0
+        return text
+
+    @property
+    def held_back(self) -> int:
+        return len(self._held)
+
+
+def build_guardrail_engine() -> GuardrailEngine:
+    return GuardrailEngine({
+        INPUT_DENYLIST: INPUT_DENYLIST_KEYWORDS,
+        OUTPUT_DENYLIST: OUTPUT_DENYLIST_KEYWORDS,
+        AI_SELF_REFERENCE: OUTPUT_AI_SELF_REFERENCE_PHRASES,
+    })
+
+
+# Compiled once per process at import time; shared by the input and output checks.
+guardrail_engine = build_guardrail_engine()
@@ -0,0 +1,186 @@
+# backend/app/services/history_shaping.py
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set
+
+from langchain_core.messages import BaseMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message framing cost (role markers, separators) in tokens.
+MESSAGE_TOKEN_OVERHEAD = 4
+# Fraction of the budget in use at which background summarization kicks in.
+SUMMARY_TRIGGER_FRACTION = 0.75
+SUMMARY_PREFIX = "Summary of the earlier conversation with this user: "
+
+# (current summary text, messages to fold in) -> updated summary text
+Summarizer = Callable[[str, Sequence[BaseMessage]], Awaitable[str]]
+
+
+class SummaryDeferred(Exception):
+    """Raised by a summarizer that has no capacity right now; the next turn tries again."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def estimate_message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return estimate_tokens(content) + MESSAGE_TOKEN_OVERHEAD
+
+
+def _message_anchor(message: BaseMessage) -> str:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return hashlib.blake2b(f"{message.type}:{content}".encode(), digest_size=8).hexdigest()
+
+
+class RollingSummary:
+    __slots__ = ("text", "tokens", "summarized_count", "anchor", "_message")
+
+    def __init__(self, text: str = "", summarized_count: int = 0, anchor: Optional[str] = None):
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.summarized_count = summarized_count  # messages folded into `text`
+        self.anchor = anchor  # fingerprint of the last folded message
+        self._message: Optional[SystemMessage] = None
+
+    def as_message(self) -> SystemMessage:
+        # Built once per summary version, so prompt assembly sees the same object each turn.
+        if self._message is None:
+            self._message = SystemMessage(content=SUMMARY_PREFIX + self.text)
+        return self._message
+
+
+class HistoryShaper:
+    """Fits chat history into a per-request token budget.
+
+    The last ``keep_last_turns`` turns are always sent verbatim. Older turns are folded
+    into a per-session rolling summary, one turn at a time, by a background task so the
+    request path never waits on summarization. Until the summary catches up, as many of
+    the not-yet-summarized older turns as fit the budget are sent verbatim (newest first).
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        keep_last_turns: int = 6,
+        summarizer: Optional[Summarizer] = None,
+        max_cached_sessions: int = 10_000,
+    ):
+        self.token_budget = token_budget
+        self.keep_last_messages = max(1, keep_last_turns) * 2
+        self.summarizer = summarizer
+        self.max_cached_sessions = max_cached_sessions
+        self._summaries: "OrderedDict[str, RollingSummary]" = OrderedDict()
+        self._in_flight: Set[str] = set()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def get_summary(self, session_id: str) -> Optional[RollingSummary]:
+        return self._summaries.get(session_id)
+
+    def forget(self, session_id: str) -> None:
+        """Drops the session's summary (and any update in progress): its history was replaced or cleared."""
+        self._summaries.pop(session_id, None)
+        self._in_flight.discard(session_id)
+        task = self._tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+
+    def shape(self, session_id: str, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Returns the messages to send for this turn. Never blocks on summarization."""
+        if self.token_budget <= 0:
+            return messages
+        summary = self._sync_summary(session_id, messages)
+        covered = summary.summarized_count if summary else 0
+
+        budget = self.token_budget - (summary.tokens + MESSAGE_TOKEN_OVERHEAD if summary and summary.text else 0)
+        window_start = len(messages)
+        # Walk backwards from the newest message, always keeping at least the last turn.
+        for index in range(len(messages) - 1, covered - 1, -1):
+            cost = estimate_message_tokens(messages[index])
+            if cost > budget and index < len(messages) - 2:
+                break
+            budget -= cost
+            window_start = index
+        # Never start the window on an AI reply; models expect a user turn first.
+        if window_start < len(messages) and messages[window_start].type == "ai" and window_start + 1 < len(messages):
+            window_start += 1
+
+        shaped = messages[window_start:]
+        if summary and summary.text:
+            shaped = [summary.as_message()] + shaped
+        # Start folding older turns once the history gets close to the budget, so the summary
+        # is usually caught up by the time verbatim turns would have to be dropped.
+        nearly_full = budget < self.token_budget * (1 - SUMMARY_TRIGGER_FRACTION)
+        if (window_start > covered or nearly_full) and covered < len(messages) - self.keep_last_messages:
+            self.schedule_summarization(session_id, messages)
+        return shaped
+
+    def schedule_summarization(self, session_id: str, messages: List[BaseMessage]) -> None:
+        """Starts (at most one) background task folding older turns into the session summary."""
+        if self.summarizer is None or session_id in self._in_flight:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # sync call path; the next async turn will schedule it
+        self._in_flight.add(session_id)
+        self._tasks[session_id] = loop.create_task(self._summarize(session_id, list(messages)))
+
+    async def wait_idle(self) -> None:
+        """Waits for in-flight summarization tasks (used by tests and on shutdown)."""
+        tasks = list(self._tasks.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _summarize(self, session_id: str, messages: List[BaseMessage]) -> None:
+        try:
+            target = len(messages) - self.keep_last_messages
+            summary = self._summaries.get(session_id) or RollingSummary()
+            # Fold one turn (user message + reply) at a time so each call stays small.
+            while summary.summarized_count < target:
+                start = summary.summarized_count
+                turn = messages[start:min(start + 2, target)]
+                text = await self.summarizer(summary.text, turn)
+                summary = RollingSummary(text.strip(), start + len(turn), _message_anchor(turn[-1]))
+                self._store(session_id, summary)
+        except SummaryDeferred:
+            logger.debug("Rolling summary update for session %s deferred: no capacity.", session_id)
+        except Exception as e:
+            logger.error("Rolling summary update failed for session %s: %s", session_id, e, exc_info=True)
+        finally:
+            if self._tasks.get(session_id) is asyncio.current_task():  # not forgotten meanwhile
+                self._in_flight.discard(session_id)
+                del self._tasks[session_id]
+
+    def _sync_summary(self, session_id: str, messages: List[BaseMessage]) -> Optional[RollingSummary]:
+        """Re-anchors the cached summary after the session store trimmed old messages.
+
+        The store keeps the newest messages, so the last summarized one is still there
+        unless the history was replaced; then the summary is dropped.
+        """
+        summary = self._summaries.get(session_id)
+        if summary is None or summary.summarized_count == 0:
+            return summary
+        self._summaries.move_to_end(session_id)
+        index = summary.summarized_count - 1
+        if index < len(messages) and _message_anchor(messages[index]) == summary.anchor:
+            return summary
+        # The store drops the oldest turns, so the anchor can only have moved left.
+        for index in range(min(index, len(messages) - 1), -1, -1):
+            if _message_anchor(messages[index]) == summary.anchor:
+                summary.summarized_count = index + 1
+                return summary
+        # Anchor gone: the history was replaced or cleared, so the summary describes another conversation.
+        del self._summaries[session_id]
+        return None
+
+    def _store(self, session_id: str, summary: RollingSummary) -> None:
+        self._summaries[session_id] = summary
+        self._summaries.move_to_end(session_id)
+        while len(self._summaries) > self.max_cached_sessions:
+            self._summaries.popitem(last=False)
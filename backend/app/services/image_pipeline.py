@@ -0,0 +1,336 @@
+# backend/app/services/image_pipeline.py
+import asyncio
+import importlib
+import logging
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+from app.utils.upload_stream import StreamedUpload, UploadRejected
+
+try:  # Optional: without Pillow, uploads are described as sent (no downscale, no near-duplicate matching).
+    from PIL import Image
+except ImportError:  # pragma: no cover - depends on the environment
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+_COLOR_NAMES = {
+    "black": (0, 0, 0), "white": (255, 255, 255), "gray": (128, 128, 128),
+    "red": (200, 40, 40), "orange": (230, 140, 30), "yellow": (230, 210, 50),
+    "green": (50, 160, 60), "blue": (40, 90, 200), "purple": (130, 60, 170),
+    "pink": (230, 140, 180), "brown": (120, 80, 40),
+}
+
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """Image format from the file's first bytes (the client's Content-Type is not trusted)."""
+    for magic, image_format in _MAGIC:
+        if head.startswith(magic):
+            return image_format
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    """An upload after decoding: ``path`` is the downscaled JPEG (the original without Pillow)."""
+
+    path: str
+    format: str
+    size_bytes: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    perceptual_hash: Optional[int] = None
+    mean_rgb: Optional[Tuple[int, int, int]] = None
+
+
+def difference_hash(image) -> int:
+    """64-bit dHash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its right neighbour.
+
+    Survives re-encoding, resizing and small edits, so re-shared screenshots and memes
+    land within a few bits of each other.
+    """
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def prepare_image(upload: StreamedUpload, image_format: str, max_dimension: int, max_pixels: int,
+                  jpeg_quality: int) -> PreparedImage:
+    """Decodes, downscales and re-encodes one upload. CPU-bound: runs in the pipeline's thread pool."""
+    if Image is None:
+        return PreparedImage(path=upload.path, format=image_format, size_bytes=upload.size)
+    try:
+        with Image.open(upload.path) as image:
+            width, height = image.size
+            if width * height > max_pixels:
+                raise UploadRejected(413, f"Images may have at most {max_pixels} pixels.")
+            image.draft("RGB", (max_dimension, max_dimension))  # JPEG: decode at a reduced scale
+            image = image.convert("RGB")
+            image.thumbnail((max_dimension, max_dimension))
+            path = upload.path + ".jpg"
+            image.save(path, "JPEG", quality=jpeg_quality)
+            return PreparedImage(
+                path=path, format=image_format, size_bytes=upload.size, width=width, height=height,
+                perceptual_hash=difference_hash(image),
+                mean_rgb=tuple(image.resize((1, 1), Image.BOX).getpixel((0, 0))),
+            )
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise UploadRejected(415, "The upload could not be decoded as an image.")
+
+
+class ImageDescriber(ABC):
+    """Turns a prepared image into the context notes appended to the user's message."""
+
+    @abstractmethod
+    async def describe(self, image: PreparedImage) -> str:
+        """Context notes for ``image``."""
+
+
+class LocalImageDescriber(ImageDescriber):
+    """Stand-in that describes only what decoding revealed (format, shape, dominant colour).
+
+    Needs no model or network, so tests and local runs exercise the whole pipeline.
+    """
+
+    async def describe(self, image: PreparedImage) -> str:
+        parts = [f"a {image.format.upper()} image"]
+        if image.width and image.height:
+            shape = "landscape" if image.width > image.height else "portrait" if image.height > image.width else "square"
+            parts = [f"a {shape} {image.format.upper()} image, {image.width}x{image.height}"]
+        if image.mean_rgb is not None:
+            parts.append(f"mostly {nearest_color_name(image.mean_rgb)} tones")
+        return "The user shared " + ", ".join(parts) + "."
+
+
+def nearest_color_name(rgb: Tuple[int, int, int]) -> str:
+    return min(_COLOR_NAMES, key=lambda name: sum((a - b) ** 2 for a, b in zip(rgb, _COLOR_NAMES[name])))
+
+
+def build_describer(spec: str) -> ImageDescriber:
+    """``"local"`` or ``"package.module:factory"`` (a class or callable returning an ImageDescriber)."""
+    if spec.strip().lower() == "local":
+        return LocalImageDescriber()
+    module_name, _, attribute = spec.partition(":")
+    if not attribute:
+        raise ValueError(f"IMAGE_DESCRIBER must be 'local' or 'module:factory', got {spec!r}")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+@dataclass(frozen=True)
+class ImageDescription:
+    image_id: str
+    notes: str
+    source: str  # "exact" (cached by content hash), "similar" (perceptual match) or "described"
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+class ImageDescriptionCache:
+    """Context notes by content hash, plus a perceptual-hash index for near-duplicates.
+
+    Fixed capacity, least recently used entry evicted when full. A near-duplicate lookup
+    is one vectorized XOR/popcount over all stored hashes.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_distance: int = 6):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._hashes = np.zeros(max_entries, dtype=np.uint64)
+        self._has_hash = np.zeros(max_entries, dtype=bool)
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._keys: List[Optional[str]] = [None] * max_entries
+        self._notes: List[Optional[str]] = [None] * max_entries
+        self._slots: Dict[str, int] = {}
+        self._size = 0
+        self._clock = 0
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def get(self, content_hash: str) -> Optional[str]:
+        slot = self._slots.get(content_hash)
+        if slot is None:
+            return None
+        self.exact_hits += 1
+        return self._touch(slot)
+
+    def peek(self, content_hash: str) -> Optional[str]:
+        """Notes for an image already known to be stored (a chat turn naming it); not counted as a hit."""
+        slot = self._slots.get(content_hash)
+        return None if slot is None else self._touch(slot)
+
+    def find_similar(self, perceptual_hash: int) -> Optional[str]:
+        if self._size:
+            differing = self._hashes[:self._size] ^ np.uint64(perceptual_hash)
+            distances = np.unpackbits(differing.view(np.uint8)).reshape(self._size, 64).sum(axis=1)
+            distances[~self._has_hash[:self._size]] = 65
+            slot = int(distances.argmin())
+            if distances[slot] <= self.max_distance:
+                self.similar_hits += 1
+                return self._touch(slot)
+        self.misses += 1
+        return None
+
+    def put(self, content_hash: str, notes: str, perceptual_hash: Optional[int] = None) -> None:
+        slot = self._slots.get(content_hash)
+        if slot is None:
+            if self._size < self.max_entries:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(self._last_used.argmin())
+                del self._slots[self._keys[slot]]
+            self._slots[content_hash] = slot
+            self._keys[slot] = content_hash
+        self._notes[slot] = notes
+        self._has_hash[slot] = perceptual_hash is not None
+        self._hashes[slot] = perceptual_hash or 0
+        self._touch(slot)
+
+    def _touch(self, slot: int) -> str:
+        self._clock += 1
+        self._last_used[slot] = self._clock
+        return self._notes[slot]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        return {
+            "entries": self._size,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+        }
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # Waiters see a failed description; nobody else needs to (e.g. after they all went away).
+    if not task.cancelled():
+        task.exception()
+
+
+class ImagePipeline:
+    """Uploaded image -> context notes, paying for decoding and description only once per picture.
+
+    An exact repeat (same bytes) is answered from the content-hash cache without decoding.
+    Otherwise the image is downscaled and re-encoded in a thread pool, and a near-duplicate
+    (same perceptual hash within a few bits) reuses the earlier notes; only new pictures
+    reach the describer. Concurrent uploads of the same bytes share one description.
+    """
+
+    def __init__(
+        self,
+        describer: ImageDescriber,
+        cache: Optional[ImageDescriptionCache] = None,
+        directory: str = "",
+        max_dimension: int = 1024,
+        max_pixels: int = 40_000_000,
+        jpeg_quality: int = 85,
+        workers: int = 2,
+    ):
+        self.describer = describer
+        self.cache = cache or ImageDescriptionCache()
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "chatterbox-uploads")
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_dimension = max_dimension
+        self.max_pixels = max_pixels
+        self.jpeg_quality = jpeg_quality
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None  # started on first use, stopped by close()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.described = 0
+
+    async def ingest(self, upload: StreamedUpload) -> ImageDescription:
+        """Describes ``upload`` (and removes its file)."""
+        handed_off = False
+        try:
+            image_format = sniff_image_format(upload.head)
+            if image_format is None:
+                raise UploadRejected(415, "Only JPEG, PNG, GIF and WebP images are supported.")
+            notes = self.cache.get(upload.content_hash)
+            if notes is not None:
+                return ImageDescription(upload.content_hash, notes, "exact")
+            pending = self._pending.get(upload.content_hash)
+            if pending is not None:
+                return ImageDescription(upload.content_hash, (await asyncio.shield(pending)).notes, "exact")
+            # A task of its own, so the description survives this request being cancelled:
+            # concurrent uploads of the same bytes are waiting for it too. It removes the file.
+            task = asyncio.get_running_loop().create_task(self._describe(upload, image_format))
+            task.add_done_callback(_retrieve_exception)
+            self._pending[upload.content_hash] = task
+            handed_off = True
+            return await asyncio.shield(task)
+        finally:
+            if not handed_off:
+                os.unlink(upload.path)
+
+    async def _describe(self, upload: StreamedUpload, image_format: str) -> ImageDescription:
+        prepared = None
+        try:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-pipeline")
+            prepared = await asyncio.get_running_loop().run_in_executor(
+                self._executor, prepare_image, upload, image_format,
+                self.max_dimension, self.max_pixels, self.jpeg_quality,
+            )
+            source = "similar"
+            notes = None
+            if prepared.perceptual_hash is not None:
+                notes = self.cache.find_similar(prepared.perceptual_hash)
+            if notes is None:
+                source = "described"
+                notes = await self.describer.describe(prepared)
+                self.described += 1
+            self.cache.put(upload.content_hash, notes, prepared.perceptual_hash)
+            logger.debug("Image %s %s (%d bytes).", upload.content_hash, source, upload.size)
+            return ImageDescription(upload.content_hash, notes, source, prepared.width, prepared.height)
+        finally:
+            del self._pending[upload.content_hash]
+            os.unlink(upload.path)
+            if prepared is not None and prepared.path != upload.path:
+                os.unlink(prepared.path)
+
+    def close(self) -> None:
+        """Stops the worker threads (queued work is dropped); the next upload starts new ones."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def notes_for(self, image_id: str) -> Optional[str]:
+        return self.cache.peek(image_id)
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "described": self.described, "in_progress": len(self._pending)}
+
+
+# Imported on the first upload (or chat turn naming an image_id), so numpy stays off the cold path.
+image_pipeline = ImagePipeline(
+    describer=build_describer(settings.IMAGE_DESCRIBER),
+    cache=ImageDescriptionCache(settings.IMAGE_CACHE_MAX_ENTRIES, settings.IMAGE_SIMILARITY_MAX_DISTANCE),
+    directory=settings.IMAGE_UPLOAD_DIR,
+    max_dimension=settings.IMAGE_MAX_DIMENSION,
+    max_pixels=settings.IMAGE_MAX_PIXELS,
+    jpeg_quality=settings.IMAGE_JPEG_QUALITY,
+    workers=settings.IMAGE_PROCESSING_WORKERS,
+)
+metrics_registry.register_collector("image_pipeline", image_pipeline.stats)
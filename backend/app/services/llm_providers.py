@@ -0,0 +1,157 @@
+# backend/app/services/llm_providers.py
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import Field, PrivateAttr
+
+from app.core.config import settings
+from app.services.fake_chat_model import FakeStreamingChatModel
+from app.services.prompt_assembly import prompt_assembler
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAICompatibleChatModel(BaseChatModel):
+    """Chat model for an OpenAI-compatible ``/chat/completions`` endpoint (e.g. a RunPod
+    vLLM worker serving Llama), streamed over server-sent events with httpx.
+
+    ``endpoint_url`` is the API base URL, the part before ``/chat/completions``. One
+    connection pool is kept per instance, so pooled services reuse connections.
+    """
+
+    endpoint_url: str
+    model: str
+    api_key: Optional[str] = None
+    temperature: float = 0.7
+    timeout: float = 60.0
+    transport: Optional[Any] = Field(default=None, exclude=True)  # httpx transport override (tests)
+    _client: Optional[httpx.AsyncClient] = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "openai-compatible"
+
+    @property
+    def _url(self) -> str:
+        return f"{self.endpoint_url.rstrip('/')}/chat/completions"
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _body(self, messages: List[BaseMessage], stop: Optional[List[str]], stream: bool) -> bytes:
+        """The JSON request body. Messages come pre-encoded from the prompt assembler, so
+        history resent every turn is not serialized again."""
+        options: Dict[str, Any] = {"model": self.model, "temperature": self.temperature, "stream": stream}
+        if stop:
+            options["stop"] = stop
+        return json.dumps(options)[:-1].encode() + b', "messages": ' + prompt_assembler.encode_messages(messages) + b"}"
+
+    def _async_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, transport=self.transport)
+        return self._client
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        with httpx.Client(timeout=self.timeout, transport=self.transport) as client:
+            response = client.post(self._url, content=self._body(messages, stop, False), headers=self._headers())
+            response.raise_for_status()
+        return self._result(response.json())
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        response = await self._async_client().post(
+            self._url, content=self._body(messages, stop, False), headers=self._headers()
+        )
+        response.raise_for_status()
+        return self._result(response.json())
+
+    @staticmethod
+    def _result(body: dict) -> ChatResult:
+        content = body["choices"][0]["message"].get("content") or ""
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        request = self._async_client().stream(
+            "POST", self._url, content=self._body(messages, stop, True), headers=self._headers()
+        )
+        async with request as response:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                token = (choices[0].get("delta") or {}).get("content")
+                if not token:
+                    continue
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+                if run_manager:
+                    await run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+
+
+def build_chat_model(provider: str, model_name: str, temperature: float) -> BaseChatModel:
+    """The LangChain chat model for one provider. ``model_name`` applies to GEMINI;
+    LLAMA serves LLAMA_MODEL_NAME from RUNPOD_MODEL_ENDPOINT_URL."""
+    provider = provider.upper()
+    if provider == "FAKE":
+        logger.info("Initializing local FakeStreamingChatModel (provider FAKE).")
+        return FakeStreamingChatModel(
+            ttft_ms=settings.FAKE_LLM_TTFT_MS,
+            tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+            jitter=settings.FAKE_LLM_JITTER,
+            error_rate=settings.FAKE_LLM_ERROR_RATE,
+            reply_tokens=settings.FAKE_LLM_REPLY_TOKENS,
+            seed=settings.FAKE_LLM_SEED,
+        )
+    if provider == "LLAMA":
+        if not settings.RUNPOD_MODEL_ENDPOINT_URL:
+            logger.error("RUNPOD_MODEL_ENDPOINT_URL not found in environment variables.")
+            raise ValueError("RUNPOD_MODEL_ENDPOINT_URL not found in environment variables.")
+        logger.info("Initializing OpenAI-compatible Llama client for model: %s", settings.LLAMA_MODEL_NAME)
+        return OpenAICompatibleChatModel(
+            endpoint_url=settings.RUNPOD_MODEL_ENDPOINT_URL,
+            model=settings.LLAMA_MODEL_NAME,
+            api_key=settings.RUNPOD_API_KEY,
+            temperature=temperature,
+            timeout=settings.LLAMA_REQUEST_TIMEOUT_SECONDS,
+        )
+    if provider != "GEMINI":
+        logger.error("Unsupported LLM_SERVICE_PROVIDER: %s", provider)
+        raise ValueError(f"Unsupported LLM_SERVICE_PROVIDER: {provider}")
+    if not settings.GOOGLE_API_KEY:
+        logger.error("GOOGLE_API_KEY not found in environment variables.")
+        raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+    logger.info("Initializing ChatGoogleGenerativeAI with model: %s", model_name)
+    return ChatGoogleGenerativeAI(model=model_name, api_key=settings.GOOGLE_API_KEY, temperature=temperature)
@@ -0,0 +1,299 @@
+# backend/app/services/llm_router.py
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+
+logger = logging.getLogger(__name__)
+
+provider_attempts = metrics_registry.counter(
+    "llm_provider_attempts_total", "Generations started per provider and why.", ["provider", "reason"])
+provider_results = metrics_registry.counter(
+    "llm_provider_results_total", "Provider generations by result (won, failed, cancelled).", ["provider", "result"])
+circuit_open = metrics_registry.gauge(
+    "llm_circuit_open", "1 while a provider's circuit breaker is open or half-open.", ["provider"], mode="max")
+
+
+class ProvidersUnavailableError(RuntimeError):
+    """Every provider's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops sending traffic to a provider after ``failure_threshold`` consecutive failures.
+
+    After ``reset_timeout`` seconds the breaker is half-open: one probe request is let
+    through, and its outcome closes the breaker or opens it for another period. A probe
+    that never reports back (e.g. it lost a hedge and was cancelled) is replaced after
+    another ``reset_timeout``.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = self._clock()
+        if self.state == "open":
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+        if self._probe_at is not None and now - self._probe_at < self.reset_timeout:
+            return False
+        self._probe_at = now
+        return True
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Circuit for provider %s closed again.", self.name)
+        self.state = "closed"
+        self.failures = 0
+        self._probe_at = None
+        circuit_open.labels(self.name).set(0)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            logger.warning("Circuit for provider %s opened after %d consecutive failures.", self.name, self.failures)
+            self.state = "open"
+            self._opened_at = self._clock()
+            self._probe_at = None
+            circuit_open.labels(self.name).set(1)
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def circuit_breaker(provider: str) -> CircuitBreaker:
+    """The process-wide breaker for ``provider``, shared by every pooled service."""
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = _breakers[provider] = CircuitBreaker(
+            provider,
+            failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_BREAKER_RESET_SECONDS,
+        )
+    return breaker
+
+
+_END = object()
+
+
+class _Attempt:
+    """One provider's stream, pumped by a task of its own into a bounded queue.
+
+    ``first_token`` resolves once the stream has produced text (or ended without any),
+    or fails with the provider's error if it fails before that.
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, stream: AsyncIterator[AIMessageChunk]):
+        self.name = name
+        self.breaker = breaker
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+        self.first_token: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._task = asyncio.ensure_future(self._pump(stream))
+
+    async def _pump(self, stream: AsyncIterator[AIMessageChunk]) -> None:
+        try:
+            async with aclosing(stream) as chunks:
+                async for chunk in chunks:
+                    await self.queue.put(chunk)
+                    if chunk.content and not self.first_token.done():
+                        self.first_token.set_result(None)
+        except Exception as e:
+            if not self.first_token.done():
+                self.first_token.set_exception(e)
+            else:
+                await self.queue.put(e)
+            return
+        if not self.first_token.done():
+            self.first_token.set_result(None)
+        await self.queue.put(_END)
+
+    async def chunks(self) -> AsyncIterator[AIMessageChunk]:
+        while True:
+            item = await self.queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    async def close(self) -> None:
+        if self.first_token.done() and not self.first_token.cancelled():
+            self.first_token.exception()  # mark any error as retrieved
+        self._task.cancel()
+        try:
+            await self._task
+        except BaseException:
+            pass
+
+
+class HedgedChatRouter(BaseChatModel):
+    """Routes each generation to the first healthy provider, hedging slow starts.
+
+    The first provider whose circuit breaker allows it is started. If it has not
+    produced a token within ``hedge_after`` seconds (0 disables hedging), the next one
+    is started as well, and so on; a provider that fails before its first token hands
+    over to the next one immediately. The first stream to produce a token wins and the
+    others are cancelled. Failures after the first token are surfaced to the caller,
+    since part of the reply has already been sent.
+    """
+
+    providers: List[BaseChatModel]
+    provider_names: List[str]
+    hedge_after: float = 1.5
+    breakers: Dict[str, CircuitBreaker] = Field(default_factory=dict, exclude=True)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        for name in self.provider_names:
+            self.breakers.setdefault(name, circuit_breaker(name))
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-router"
+
+    def _candidates(self) -> Deque[Tuple[str, BaseChatModel, CircuitBreaker]]:
+        return deque((name, model, self.breakers[name]) for name, model in zip(self.provider_names, self.providers))
+
+    @staticmethod
+    def _next_allowed(candidates: Deque[Tuple[str, BaseChatModel, CircuitBreaker]]) -> Optional[Tuple[str, BaseChatModel, CircuitBreaker]]:
+        # Breakers are only asked when a provider is about to be used, so a half-open
+        # provider's probe is not spent on a request that never reaches it.
+        while candidates:
+            candidate = candidates.popleft()
+            if candidate[2].allow():
+                return candidate
+        return None
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        candidates = self._candidates()
+        active: Dict[asyncio.Future, _Attempt] = {}
+        winner: Optional[_Attempt] = None
+        last_error: Optional[BaseException] = None
+
+        def launch(reason: str) -> bool:
+            candidate = self._next_allowed(candidates)
+            if candidate is None:
+                return False
+            name, model, breaker = candidate
+            provider_attempts.labels(name, reason).inc()
+            attempt = _Attempt(name, breaker, model.astream(messages, stop=stop, **kwargs))
+            active[attempt.first_token] = attempt
+            return True
+
+        try:
+            if not launch("primary"):
+                raise ProvidersUnavailableError("All LLM providers are unavailable (circuit open).")
+            while winner is None:
+                hedge_in = self.hedge_after if candidates and self.hedge_after > 0 else None
+                done, _ = await asyncio.wait(active, timeout=hedge_in, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.info("No first token within %.2fs; hedging with the next provider.", self.hedge_after)
+                    launch("hedge")
+                    continue
+                for future in done:
+                    attempt = active.pop(future)
+                    error = future.exception()
+                    if error is None and winner is None:
+                        winner = attempt
+                        continue
+                    if error is not None:
+                        last_error = error
+                        attempt.breaker.record_failure()
+                        provider_results.labels(attempt.name, "failed").inc()
+                        logger.warning("Provider %s failed before its first token: %s", attempt.name, error)
+                    else:
+                        provider_results.labels(attempt.name, "cancelled").inc()
+                    await attempt.close()
+                if winner is None and not active and not launch("failover"):
+                    raise last_error or ProvidersUnavailableError("No LLM provider produced a reply.")
+
+            for attempt in active.values():
+                provider_results.labels(attempt.name, "cancelled").inc()
+                await attempt.close()
+            active.clear()
+
+            try:
+                async for chunk in winner.chunks():
+                    yield await self._emit(chunk, run_manager)
+            except Exception:
+                winner.breaker.record_failure()
+                provider_results.labels(winner.name, "failed").inc()
+                raise
+            winner.breaker.record_success()
+            provider_results.labels(winner.name, "won").inc()
+        finally:
+            for attempt in active.values():
+                await attempt.close()
+            if winner is not None:
+                await winner.close()
+
+    @staticmethod
+    async def _emit(chunk: AIMessageChunk, run_manager: Optional[AsyncCallbackManagerForLLMRun]) -> ChatGenerationChunk:
+        generation = ChatGenerationChunk(message=AIMessageChunk(content=chunk.content))
+        if run_manager and chunk.content:
+            await run_manager.on_llm_new_token(str(chunk.content), chunk=generation)
+        return generation
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        parts = [str(chunk.message.content) async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(parts)))])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Blocking calls are not hedged; providers are tried in order until one succeeds.
+        last_error: Optional[BaseException] = None
+        candidates = self._candidates()
+        while (candidate := self._next_allowed(candidates)) is not None:
+            name, model, breaker = candidate
+            try:
+                message = model.invoke(messages, stop=stop, **kwargs)
+            except Exception as e:
+                last_error = e
+                breaker.record_failure()
+                logger.warning("Provider %s failed: %s", name, e)
+                continue
+            breaker.record_success()
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=message.content))])
+        raise last_error or ProvidersUnavailableError("All LLM providers are unavailable (circuit open).")
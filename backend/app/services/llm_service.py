@@ -1,82 +1,229 @@
 # backend/app/services/llm_service.py
-import os
+import asyncio
 import logging
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda, RunnablePassthrough
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from app.core.config import settings
-from app.core.guardrails_config import OUTPUT_DENYLIST_KEYWORDS, CANNED_RESPONSE_OUTPUT_TRIGGERED # New Guardrail imports
-from typing import AsyncGenerator, Optional, Dict, List
+from app.core.guardrails_config import CANNED_RESPONSE_INPUT_TRIGGERED, CANNED_RESPONSE_OUTPUT_TRIGGERED
+from app.core.metrics import (
+    batch_items, guardrail_scan_seconds, guardrail_triggers, history_messages,
+    inter_token_gap, response_tokens, time_to_first_token,
+)
+from app.services.admission import AdmissionRejected, AdmissionTicket, admission_controller
+from app.services.character_registry import Character, UnknownCharacterError, character_registry, history_session_id
+from app.services.llm_providers import build_chat_model
+from app.services.llm_router import HedgedChatRouter
+from app.services.guardrail_engine import guardrail_engine, INPUT_CATEGORIES, OUTPUT_CATEGORIES, StreamingGuardrailScanner
+from app.services.session_store import session_store
+from app.services.history_shaping import HistoryShaper, SummaryDeferred
+from app.services.prompt_assembly import prompt_assembler
+from app.services.response_cache import response_cache, replay_stream
+from app.services.request_coalescing import request_coalescer
+from app.utils.history_fingerprint import fingerprint_messages
+from app.utils.text_vectors import normalize_prompt
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
 logger = logging.getLogger(__name__)
 
-# load_system_prompt and SYSTEM_PROMPT remain the same
-def load_system_prompt():
-    prompt_path = os.path.join(os.path.dirname(__file__), '..', 'prompts', 'chandler_bing.txt')
-    try:
-        with open(prompt_path, 'r') as f:
-            return f.read()
-    except FileNotFoundError:
-        logger.warning("Prompt file not found at %s. Using default enhanced prompt.", prompt_path)
-        return """You are Chandler Bing from the TV show Friends. Your personality is sarcastic, witty, and often self-deprecating. You make jokes frequently, sometimes at inappropriate times. You are known for your catchphrase "Could I BE any more [adjective]?". You are currently chatting with a user who is a fan.
-Keep your responses in character. Be funny, use sarcasm, and try to mimic Chandler's speaking style and common phrases. If you are unsure how to respond, a bit of awkward humor is fine. Do not break character. Do not say you are an AI.
-Remember key details about your life: You work in "statistical analysis and data reconfiguration" (though you find it boring). Your best friends are Joey, Ross, Monica (Ross's sister, your eventual wife), Rachel, and Phoebe. You lived with Joey for a long time. You have a complicated relationship with your parents.
-**It is crucial that you consider the *entire* preceding conversation history to ensure your responses are relevant, contextually appropriate, and avoid repetition. Refer to earlier messages when it makes sense to do so to create a continuous and engaging conversation.**
-Engage with the user in a way that is typical of Chandler."""
-SYSTEM_PROMPT = load_system_prompt()
-
-module_level_session_histories: Dict[str, ChatMessageHistory] = {}
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You maintain a running summary of a chat between a user and a TV character. "
+     "Update the summary with the new lines, keeping names, facts about the user, running jokes "
+     "and open questions. Reply with the updated summary only, in at most 120 words."),
+    ("human", "Current summary:\n{summary}\n\nNew lines:\n{new_lines}"),
+])
+# Summary calls take no place in any session's turn order; this only labels their tickets.
+SUMMARY_ADMISSION_ID = "history-summary"
 
 # Helper for checking output
 def check_output_for_violations(text_chunk: str) -> bool:
-    lower_text_chunk = text_chunk.lower()
-    for keyword in OUTPUT_DENYLIST_KEYWORDS:
-        if keyword.lower() in lower_text_chunk:
-            logger.warning("Output Guardrail triggered due to denied keyword: '%s' in chunk: '%.50s...'", keyword, text_chunk)
-            return True
-    # Add checks for common "AI self-reference" phrases
-    ai_phrases = ["as an ai language model", "as a large language model", "i am an ai", "i'm an ai", "i am a language model"]
-    for phrase in ai_phrases:
-        if phrase in lower_text_chunk: # These are usually specific enough not to need broader search
-            logger.warning("Output Guardrail triggered due to AI self-reference: '%s' in chunk: '%.50s...'", phrase, text_chunk)
-            return True
+    scan_started = time.perf_counter()
+    match = guardrail_engine.find(text_chunk, OUTPUT_CATEGORIES)
+    guardrail_scan_seconds.labels("output").observe(time.perf_counter() - scan_started)
+    if match is not None:
+        guardrail_triggers.labels("output", match.category).inc()
+        logger.warning("Output Guardrail triggered (%s) due to term: '%s' in chunk: '%.50s...'", match.category, match.term, text_chunk)
+        return True
     return False
 
+@dataclass(frozen=True)
+class BatchTurn:
+    """One independent conversation of a batch: the user's latest message and where its history lives."""
+    user_input: str
+    conversation_id: str
+    image_notes: Optional[str] = None
+    character_id: Optional[str] = None
+    item_id: Optional[str] = None
+    keep_history: bool = True  # False drops the session once the turn is done (throwaway batch sessions)
+
+
 class LLMService:
-    def __init__(self):
-        # ... (initialization remains the same)
-        if not settings.GOOGLE_API_KEY:
-            logger.error("GOOGLE_API_KEY not found in environment variables.")
-            raise ValueError("GOOGLE_API_KEY not found in environment variables.")
-        logger.info("Initializing ChatGoogleGenerativeAI with model: %s", "gemini-1.5-flash-latest")
-        self.llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", api_key=settings.GOOGLE_API_KEY, temperature=0.7)
-        self.prompt = ChatPromptTemplate.from_messages([
-            SystemMessagePromptTemplate.from_template(SYSTEM_PROMPT),
-            MessagesPlaceholder(variable_name="chat_history"),
-            HumanMessagePromptTemplate.from_template("{user_input_combined}")
-        ])
-        core_runnable = self.prompt | self.llm | StrOutputParser()
-        self.runnable_with_history = RunnableWithMessageHistory(
+    def __init__(
+        self,
+        provider: Optional[str] = None,
+        model_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+    ):
+        self.provider = (provider or settings.LLM_SERVICE_PROVIDER).upper()
+        self.model_name = model_name or settings.LLM_MODEL_NAME
+        self.temperature = settings.LLM_TEMPERATURE if temperature is None else temperature
+        # The client (and its underlying connection) lives as long as this service instance,
+        # so services should be obtained from the registry rather than built per request.
+        self.llm = self._build_llm()
+        self.summary_chain = SUMMARY_PROMPT | self.llm | StrOutputParser()
+        # Trims chat_history to HISTORY_TOKEN_BUDGET before the prompt is rendered; older turns
+        # are folded into a per-session rolling summary in the background.
+        self.history_shaper = HistoryShaper(
+            token_budget=settings.HISTORY_TOKEN_BUDGET,
+            keep_last_turns=settings.HISTORY_KEEP_LAST_TURNS,
+            summarizer=self._summarize_turns if settings.HISTORY_SUMMARY_ENABLED else None,
+        )
+        # Per-character runnables, compiled on first use and rebuilt when the persona file changes.
+        self._runnables: Dict[str, Tuple[Character, Runnable, RunnableWithMessageHistory]] = {}
+        logger.info("LLMService initialized with LCEL RunnableWithMessageHistory (provider %s, model %s).", self.provider, self.model_name)
+
+    def _build_llm(self) -> BaseChatModel:
+        fallbacks = [p.strip().upper() for p in settings.LLM_FALLBACK_PROVIDERS.split(",") if p.strip()]
+        provider_names = [self.provider] + [p for p in dict.fromkeys(fallbacks) if p != self.provider]
+        models = [build_chat_model(name, self.model_name, self.temperature) for name in provider_names]
+        if len(models) == 1:
+            return models[0]
+        logger.info("Routing generations across providers %s (hedge after %.0f ms).", provider_names, settings.LLM_HEDGE_AFTER_MS)
+        return HedgedChatRouter(
+            providers=models, provider_names=provider_names, hedge_after=settings.LLM_HEDGE_AFTER_MS / 1000
+        )
+
+    def get_runnable(self, character_id: Optional[str] = None) -> RunnableWithMessageHistory:
+        """The character's chain wrapped so it loads and saves session history itself."""
+        return self._get_runnables(character_id)[2]
+
+    def get_chain(self, character_id: Optional[str] = None) -> Runnable:
+        """The character's chain without history handling: callers pass ``chat_history`` and record the turn."""
+        return self._get_runnables(character_id)[1]
+
+    def _get_runnables(self, character_id: Optional[str]) -> Tuple[Character, Runnable, RunnableWithMessageHistory]:
+        character = character_registry.get(character_id)
+        cached = self._runnables.get(character.character_id)
+        if cached is not None and cached[0] is character:
+            return cached
+        shape_history = RunnableLambda(self._shape_history, afunc=self._ashape_history)
+
+        def assemble_prompt(inputs: dict, config: RunnableConfig) -> List[BaseMessage]:
+            # Same messages as character.prompt, built incrementally per session.
+            session_id = config.get("configurable", {}).get("session_id", "")
+            return prompt_assembler.assemble(character, session_id, inputs["chat_history"], inputs["user_input_combined"])
+
+        core_runnable = RunnablePassthrough.assign(chat_history=shape_history) | RunnableLambda(assemble_prompt) | self.llm | StrOutputParser()
+        runnable = RunnableWithMessageHistory(
             core_runnable, self.get_session_history,
             input_messages_key="user_input_combined", history_messages_key="chat_history",
         )
-        logger.info("LLMService initialized with LCEL RunnableWithMessageHistory and model %s for direct Gemini calls.", "gemini-1.5-flash-latest")
+        self._runnables[character.character_id] = cached = (character, core_runnable, runnable)
+        logger.debug("Built runnable for character '%s' (model %s).", character.character_id, self.model_name)
+        return cached
 
+    def warm_up(self) -> None:
+        """Compiles the default character and renders its prompt once so caches are hot before real traffic."""
+        self.get_runnable()
+        prompt_assembler.system_message(character_registry.get())
+        logger.debug("LLMService warm-up completed for model %s.", self.model_name)
 
     def get_session_history(self, session_id: str) -> ChatMessageHistory:
-        # ... (remains the same)
-        global module_level_session_histories
-        if session_id not in module_level_session_histories:
-            logger.info(f"SESSION_HISTORY ({session_id}): Creating new ChatMessageHistory at module level.")
-            module_level_session_histories[session_id] = ChatMessageHistory()
-        else:
-            logger.info(f"SESSION_HISTORY ({session_id}): Using existing ChatMessageHistory from module level.")
-        history_obj = module_level_session_histories[session_id]
-        logger.debug(f"SESSION_HISTORY ({session_id}): History retrieved. Message count: {len(history_obj.messages)}")
+        # Bounded LRU/TTL store shared by all pooled services in this process.
+        history_obj = session_store.get(session_id)
+        logger.debug("SESSION_HISTORY (%s): History retrieved. Message count: %d", session_id, len(history_obj.messages))
         return history_obj
 
+    def forget_session(self, history_id: str) -> None:
+        """Drops what was derived from a session's history (rolling summary, prompt transcript) once it is replaced or deleted."""
+        self.history_shaper.forget(history_id)
+        prompt_assembler.forget(history_id)
+
+    def _shape_history(self, inputs: dict, config: RunnableConfig) -> List[BaseMessage]:
+        session_id = config.get("configurable", {}).get("session_id", "")
+        return self.history_shaper.shape(session_id, inputs["chat_history"])
+
+    async def _ashape_history(self, inputs: dict, config: RunnableConfig) -> List[BaseMessage]:
+        # Same as the sync path, but runs on the event loop so summarization can be scheduled.
+        return self._shape_history(inputs, config)
+
+    async def _summarize_turns(self, summary: str, turn: Sequence[BaseMessage]) -> str:
+        # Background work: it takes a batch share of the upstream slots, and only when one is
+        # free right now, so summaries never crowd out or queue ahead of chat turns.
+        ticket = admission_controller.try_admit(SUMMARY_ADMISSION_ID, batch=True)
+        if ticket is None:
+            raise SummaryDeferred()
+        new_lines = "\n".join(
+            f"{'User' if message.type == 'human' else 'Character'}: {message.content}" for message in turn
+        )
+        try:
+            return await self.summary_chain.ainvoke({"summary": summary or "(empty)", "new_lines": new_lines})
+        finally:
+            ticket.release()
+
+    def _is_cacheable(self, image_notes: Optional[str], history: ChatMessageHistory) -> bool:
+        """Only context-free prompts (fresh session, no image) go through the response cache."""
+        return settings.RESPONSE_CACHE_ENABLED and not image_notes and not history.messages
+
+    async def _stream_upstream(
+        self, combined_input: str, character_id: str, history_id: str, history: ChatMessageHistory
+    ) -> AsyncIterator[str]:
+        """Raw model tokens for this turn, shared with identical in-flight requests when possible.
+
+        History is passed in rather than loaded by RunnableWithMessageHistory, so every
+        subscriber (leader or follower) records its own turn, however the stream ends.
+        """
+        chain = self.get_chain(character_id)
+        chat_history = list(history.messages)
+
+        def start_stream() -> AsyncIterator[str]:
+            return chain.astream(
+                {"user_input_combined": combined_input, "chat_history": chat_history},
+                config={"configurable": {"session_id": history_id}}
+            )
+
+        if not settings.REQUEST_COALESCING_ENABLED:
+            async with aclosing(start_stream()) as stream:
+                async for token in stream:
+                    yield token
+            return
+
+        # Same model settings, character, input and history => same generation, so one upstream
+        # call can serve all. The coalescer is shared by every pooled service, hence the service fields.
+        key = (
+            self.provider, self.model_name, self.temperature,
+            character_id, normalize_prompt(combined_input), fingerprint_messages(history.messages),
+        )
+        subscription = request_coalescer.subscribe(key, start_stream)
+        try:
+            async for token in subscription:
+                yield token
+        finally:
+            await subscription.aclose()
+
+    def _record_streamed_turn(
+        self, history: ChatMessageHistory, combined_input: str, sent_parts: List[str], outcome: str,
+        delivered_parts: Optional[List[str]] = None,
+    ) -> None:
+        """History keeps what the client got: the full reply, the safe prefix plus the canned
+        response when guardrailed, or, when the client went away, the partial reply it
+        received (``delivered_parts``, filled in by the framing layer; without it, all the
+        text this generator released). Failed turns and turns abandoned before any text
+        reached the client are not recorded."""
+        if outcome == "abandoned" and delivered_parts is not None:
+            sent_parts = delivered_parts
+        if outcome == "failed" or not sent_parts:
+            return
+        history.add_messages([HumanMessage(content=combined_input), AIMessage(content="".join(sent_parts))])
+
     def _prepare_input_with_image_context(self, user_input: str, image_notes: Optional[str]) -> str:
         # ... (remains the same)
         if image_notes:
@@ -84,14 +231,29 @@ class LLMService:
             return f"{user_input} [Image context: {image_notes}]"
         return user_input
 
-    async def generate_response(self, user_input: str, image_notes: Optional[str] = None, conversation_id: str = "default_conv"):
+    async def generate_response(
+        self, user_input: str, image_notes: Optional[str] = None, conversation_id: str = "default_conv",
+        character_id: Optional[str] = None,
+    ):
+        character_id = character_registry.resolve(character_id)
+        history_id = history_session_id(character_id, conversation_id)
         combined_input = self._prepare_input_with_image_context(user_input, image_notes)
-        logger.info("Generating non-streaming LCEL response for input: %.100s... (session: %s)", combined_input, conversation_id)
+        logger.debug("Generating non-streaming LCEL response for input: %.100s... (session: %s, character: %s)", combined_input, conversation_id, character_id)
+
+        await session_store.refresh(history_id)
+        history = self.get_session_history(history_id)
+        history_messages.observe(len(history.messages))
+        cacheable = self._is_cacheable(image_notes, history)
+        cached_reply = response_cache.lookup(character_id, user_input) if cacheable else None
+        if cached_reply is not None:
+            logger.debug("Response cache hit for first-turn prompt. (session: %s)", conversation_id)
+            history.add_messages([HumanMessage(content=combined_input), AIMessage(content=cached_reply)])
+            return cached_reply
 
         try:
-            response_text = await self.runnable_with_history.ainvoke(
+            response_text = await self.get_runnable(character_id).ainvoke(
                 {"user_input_combined": combined_input},
-                config={"configurable": {"session_id": conversation_id}}
+                config={"configurable": {"session_id": history_id}}
             )
 
             # --- Output Guardrail Check for non-streaming ---
@@ -104,71 +266,205 @@ class LLMService:
                 return CANNED_RESPONSE_OUTPUT_TRIGGERED
             # --- End Output Guardrail Check ---
 
-            logger.info("Non-streaming LCEL response generated: %.100s... (session: %s)", response_text, conversation_id)
-            # Log history state *after* the call by checking the module-level store
-            if conversation_id in module_level_session_histories:
-                 history_obj_after = module_level_session_histories[conversation_id]
-                 logger.debug(f"SESSION_HISTORY ({conversation_id}): Message count after this turn (invoke): {len(history_obj_after.messages)}")
+            logger.debug("Non-streaming LCEL response generated: %.100s... (session: %s)", response_text, conversation_id)
+            if cacheable:
+                response_cache.store(character_id, user_input, response_text)
+            # Log history state *after* the call by checking the session store
+            history_obj_after = session_store.peek(history_id)
+            if history_obj_after is not None:
+                logger.debug("SESSION_HISTORY (%s): Message count after this turn (invoke): %d", conversation_id, len(history_obj_after.messages))
             return response_text
         except Exception as e:
-            logger.error("Error during LCEL runnable_with_history.ainvoke: %s (session: %s)", e, conversation_id, exc_info=True)
+            logger.error("Error during LCEL runnable ainvoke: %s (session: %s)", e, conversation_id, exc_info=True)
             return "Uh oh, it seems my sarcasm circuits (LCEL+History edition) are a bit fried. Try again?"
 
     async def async_generate_streaming_response(
-        self, user_input: str, image_notes: Optional[str] = None, conversation_id: str = "default_conv"
+        self, user_input: str, image_notes: Optional[str] = None, conversation_id: str = "default_conv",
+        character_id: Optional[str] = None, raise_on_error: bool = False,
+        delivered_parts: Optional[List[str]] = None,
     ) -> AsyncGenerator[str, None]:
+        # raise_on_error: re-raise upstream failures instead of streaming the apology line.
+        # delivered_parts: the text the caller has actually sent, recorded if the client goes away.
+        character_id = character_registry.resolve(character_id)
+        history_id = history_session_id(character_id, conversation_id)
         combined_input = self._prepare_input_with_image_context(user_input, image_notes)
-        logger.info("Generating streaming LCEL response for input: %.100s... (session: %s)", combined_input, conversation_id)
+        logger.debug("Generating streaming LCEL response for input: %.100s... (session: %s, character: %s)", combined_input, conversation_id, character_id)
 
-        stream_buffer = ""
-        max_buffer_len = 50 # Increased buffer for better phrase matching
+        started = time.perf_counter()
+        await session_store.refresh(history_id)
+        history = self.get_session_history(history_id)
+        history_messages.observe(len(history.messages))
+        cacheable = self._is_cacheable(image_notes, history)
+        cached_reply = response_cache.lookup(character_id, user_input) if cacheable else None
+        if cached_reply is not None:
+            # Replay through the normal stream framing; record the turn as if the model had answered.
+            logger.debug("Response cache hit for first-turn prompt. (session: %s)", conversation_id)
+            history.add_messages([HumanMessage(content=combined_input), AIMessage(content=cached_reply)])
+            async for chunk in replay_stream(cached_reply):
+                yield chunk
+            return
+
+        # Stateful matcher: each character is scanned once and only a possible-match suffix is held back.
+        output_scanner = StreamingGuardrailScanner(guardrail_engine, OUTPUT_CATEGORIES)
         guardrail_triggered_and_canned_response_sent = False
+        reply_parts: List[str] = []
+        outcome = "abandoned"  # Until the stream ends on its own; the client may go away at any yield.
+        token_count = 0
+        last_token_at: Optional[float] = None
+        scan_seconds = 0.0
 
         try:
-            async for token in self.runnable_with_history.astream(
-                {"user_input_combined": combined_input},
-                config={"configurable": {"session_id": conversation_id}}
-            ):
-                if guardrail_triggered_and_canned_response_sent:
-                    # If guardrail already triggered, we stop processing original tokens.
-                    # We need to ensure the history is correctly updated by RWMH,
-                    # which saves the *original* stream. If we want to save the canned response
-                    # to history instead, that's a more complex change involving how RWMH handles saving.
-                    # For now, history will contain the original (violating) LLM output.
-                    continue
-
-                if token:
-                    stream_buffer += token
-                    if len(stream_buffer) > max_buffer_len:
-                        stream_buffer = stream_buffer[-max_buffer_len:]
-
-                    if check_output_for_violations(stream_buffer):
-                        logger.warning("Output Guardrail (streaming) triggered for session %s. Buffer: '%.50s...'", conversation_id, stream_buffer)
-                        stream_buffer = ""
+            async with aclosing(self._stream_upstream(combined_input, character_id, history_id, history)) as upstream:
+                async for token in upstream:
+                    if not token:
+                        continue
+                    now = time.perf_counter()
+                    if last_token_at is None:
+                        time_to_first_token.observe(now - started)
+                    else:
+                        inter_token_gap.observe(now - last_token_at)
+                    last_token_at = now
+                    token_count += 1
+                    safe_text, match = output_scanner.feed(token)
+                    scan_seconds += time.perf_counter() - now
+                    if safe_text:
+                        reply_parts.append(safe_text)
+                        yield safe_text
+                    if match is not None:
+                        guardrail_triggers.labels("output", match.category).inc()
+                        logger.warning("Output Guardrail (streaming) triggered (%s) for session %s due to term: '%s'", match.category, conversation_id, match.term)
                         guardrail_triggered_and_canned_response_sent = True
+                        reply_parts.append(CANNED_RESPONSE_OUTPUT_TRIGGERED)
                         yield CANNED_RESPONSE_OUTPUT_TRIGGERED
-                        # Important: We must break the loop to stop any further original tokens.
-                        # The history will reflect the original (violating) response up to this point + subsequent tokens if not broken.
-                        # RWMH saves the actual LLM output. By breaking, we ensure user sees canned response,
-                        # but history will have partial original + full canned if not handled carefully.
-                        # For simplicity now: user sees canned, history saves original partial + subsequent tokens.
-                        # A more robust solution might involve a flag to RWMH or manual history update *after* this loop.
+                        # Stop forwarding original tokens (closing the upstream). The held-back text
+                        # containing the match was never sent, and history records the canned reply.
                         break
 
-                    yield token
-
             if not guardrail_triggered_and_canned_response_sent:
-                logger.info("Streaming LCEL response completed. (session: %s)", conversation_id)
+                tail = output_scanner.flush()
+                if tail:
+                    reply_parts.append(tail)
+                    yield tail
+                if cacheable:
+                    response_cache.store(character_id, user_input, "".join(reply_parts))
+                logger.debug("Streaming LCEL response completed. (session: %s)", conversation_id)
             else:
                 logger.info("Streaming LCEL response guardrailed and replaced with canned response. (session: %s)", conversation_id)
-
-            # Log history state *after* the call by checking the module-level store
-            # This will show the state after RWMH has processed the (potentially partial if guardrailed) stream.
-            if conversation_id in module_level_session_histories:
-                 history_obj_after = module_level_session_histories[conversation_id]
-                 logger.debug(f"SESSION_HISTORY ({conversation_id}): Message count after this turn (astream): {len(history_obj_after.messages)}")
+            outcome = "completed"
 
         except Exception as e:
-            logger.error("Error during LCEL runnable_with_history.astream: %s (session: %s)", e, conversation_id, exc_info=True)
+            outcome = "failed"
+            logger.error("Error during LCEL runnable astream: %s (session: %s)", e, conversation_id, exc_info=True)
+            if raise_on_error:
+                raise
             if not guardrail_triggered_and_canned_response_sent:
                 yield "Oh, wow. My LCEL (with History!) stream of consciousness just... stopped. Could this BE a server hiccup?"
+        finally:
+            response_tokens.observe(token_count)
+            guardrail_scan_seconds.labels("output").observe(scan_seconds)
+            if outcome == "abandoned":
+                logger.info("Client went away mid-reply; upstream generation cancelled after %d chars. (session: %s)", sum(map(len, reply_parts)), conversation_id)
+            self._record_streamed_turn(history, combined_input, reply_parts, outcome, delivered_parts)
+            history_obj_after = session_store.peek(history_id)
+            if history_obj_after is not None:
+                logger.debug("SESSION_HISTORY (%s): Message count after this turn (astream): %d", conversation_id, len(history_obj_after.messages))
+
+    async def generate_batch(
+        self, turns: Sequence[BatchTurn], max_concurrency: int = 4, item_timeout: Optional[float] = None,
+    ) -> AsyncGenerator[dict, None]:
+        """Runs independent turns ``max_concurrency`` at a time; yields one result per turn as it completes.
+
+        Every turn takes the interactive path (input guardrail, admission, cached runnables,
+        streaming output guardrail, history) but is admitted with batch priority, and must
+        finish within ``item_timeout`` seconds, admission wait included. Closing the
+        generator cancels the turns still running.
+        """
+        results: asyncio.Queue = asyncio.Queue()
+        pending = iter(enumerate(turns))
+
+        async def worker() -> None:
+            for index, turn in pending:
+                results.put_nowait(await self._run_batch_turn(index, turn, item_timeout))
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, min(max_concurrency, len(turns))))]
+        try:
+            for _ in range(len(turns)):
+                yield await results.get()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _run_batch_turn(self, index: int, turn: BatchTurn, item_timeout: Optional[float]) -> dict:
+        started = time.perf_counter()
+        result = {
+            "index": index, "id": turn.item_id, "session_id": turn.conversation_id,
+            "character_id": turn.character_id, "status": "ok", "reply": None, "error": None,
+        }
+        try:
+            result["character_id"] = character_registry.resolve(turn.character_id)
+        except UnknownCharacterError:
+            result.update(status="unknown_character", error=f"Unknown character: {turn.character_id}")
+        else:
+            result.update(await self._batch_reply(turn, result["character_id"], item_timeout))
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        batch_items.labels(result["status"]).inc()
+        return result
+
+    async def _batch_reply(self, turn: BatchTurn, character_id: str, item_timeout: Optional[float]) -> dict:
+        if not turn.user_input:
+            return {"status": "empty"}
+        if await self._input_violation(turn.user_input, turn.conversation_id):
+            return {"status": "input_guardrail", "reply": CANNED_RESPONSE_INPUT_TRIGGERED}
+        try:
+            async with asyncio.timeout(item_timeout):
+                reply = await self._generate_batch_reply(turn, character_id)
+        except TimeoutError:
+            return {"status": "timeout", "error": f"No reply within {item_timeout:g}s"}
+        except Exception as e:
+            return {"status": "error", "error": str(e) or type(e).__name__}
+        finally:
+            if not turn.keep_history:
+                history_id = history_session_id(character_id, turn.conversation_id)
+                session_store.delete(history_id)
+                self.forget_session(history_id)
+        guardrailed = reply.endswith(CANNED_RESPONSE_OUTPUT_TRIGGERED)
+        return {"status": "output_guardrail" if guardrailed else "ok", "reply": reply}
+
+    @staticmethod
+    async def _input_violation(user_input: str, conversation_id: str) -> bool:
+        scan_started = time.perf_counter()
+        match = guardrail_engine.find(user_input, INPUT_CATEGORIES)
+        guardrail_scan_seconds.labels("input").observe(time.perf_counter() - scan_started)
+        if match is None and settings.MODERATION_CLASSIFIER_ENABLED:
+            # Imported here: the classifier loads its model on import, and only when enabled.
+            # Concurrent batch items share its micro-batches.
+            from app.services.moderation_classifier import moderation_classifier
+            match = await moderation_classifier.find(user_input)
+        if match is None:
+            return False
+        guardrail_triggers.labels("input", match.category).inc()
+        logger.warning("Input Guardrail triggered (%s) for batch session %s due to term: '%s'", match.category, conversation_id, match.term)
+        return True
+
+    async def _generate_batch_reply(self, turn: BatchTurn, character_id: str) -> str:
+        ticket = await self._admit_batch_turn(history_session_id(character_id, turn.conversation_id))
+        try:
+            stream = self.async_generate_streaming_response(
+                user_input=turn.user_input, image_notes=turn.image_notes, conversation_id=turn.conversation_id,
+                character_id=character_id, raise_on_error=True,
+            )
+            async with aclosing(stream) as parts:
+                return "".join([part async for part in parts])
+        finally:
+            ticket.release()
+
+    @staticmethod
+    async def _admit_batch_turn(history_id: str) -> AdmissionTicket:
+        # Bulk work is never refused outright: it backs off and retries within its own timeout.
+        while True:
+            try:
+                return await admission_controller.admit(history_id, batch=True)
+            except AdmissionRejected as e:
+                logger.debug("Batch turn not admitted (%s); retrying in %ds.", e.reason, e.retry_after)
+                await asyncio.sleep(e.retry_after)
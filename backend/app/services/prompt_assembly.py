@@ -0,0 +1,168 @@
+# backend/app/services/prompt_assembly.py
+import json
+import logging
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+from app.services.character_registry import Character
+
+logger = logging.getLogger(__name__)
+
+_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def encode_message(message: BaseMessage) -> bytes:
+    """One OpenAI-style chat message (``{"role": ..., "content": ...}``) as JSON bytes."""
+    return json.dumps(
+        {"role": _ROLES.get(message.type, "user"), "content": str(message.content)}, ensure_ascii=False
+    ).encode()
+
+
+class MessageEncodingCache:
+    """Provider payload of each live message object, encoded the first time it is sent.
+
+    History messages are the same objects turn after turn, so a long conversation costs
+    one encoding per message rather than one per message per turn. Entries are keyed by
+    object identity and dropped when their message is garbage collected.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, Tuple[weakref.ref, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, message: BaseMessage) -> bytes:
+        key = id(message)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0]() is message:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        payload = encode_message(message)
+        self._entries[key] = (weakref.ref(message, lambda _, key=key: self._entries.pop(key, None)), payload)
+        return payload
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SessionTranscript:
+    """The history one session last sent, extended turn by turn.
+
+    ``encoded`` holds the messages' payloads already joined into a JSON array body
+    (without brackets), so a turn splices the whole history into its request at once.
+    """
+
+    __slots__ = ("messages", "encoded")
+
+    def __init__(self):
+        self.messages: List[BaseMessage] = []
+        self.encoded = bytearray()
+
+    def sync(self, history: Sequence[BaseMessage], encode: Callable[[BaseMessage], bytes]) -> bool:
+        """Catches up with ``history``; returns False when it had to start over.
+
+        Histories only grow at the end between turns, so checking the ends of the known
+        prefix is enough; trimming, a shifted shaping window or a new summary restart it.
+        """
+        known = len(self.messages)
+        restarted = False
+        if known and not self.is_prefix_of(history, 0):
+            self.messages, self.encoded, known, restarted = [], bytearray(), 0, True
+        for message in history[known:]:
+            if self.messages:
+                self.encoded += b", "
+            self.messages.append(message)
+            self.encoded += encode(message)
+        return not restarted
+
+    def is_prefix_of(self, messages: Sequence[BaseMessage], start: int) -> bool:
+        end = start + len(self.messages)
+        return bool(self.messages) and end <= len(messages) and (
+            messages[start] is self.messages[0] and messages[end - 1] is self.messages[-1])
+
+
+class PromptAssembler:
+    """Builds each turn's prompt without re-rendering the character template.
+
+    The character's system message is rendered once (again only when the persona file
+    changes), each session keeps an append-only transcript of the history it has sent,
+    and only the new user message (and, on the next turn, the reply) is created and
+    encoded per turn. Produces the same messages as ``character.prompt``.
+    """
+
+    def __init__(self, max_sessions: int = 10_000):
+        self.max_sessions = max_sessions
+        self.encodings = MessageEncodingCache()
+        self._system: Dict[str, Tuple[Character, BaseMessage]] = {}
+        self._transcripts: "OrderedDict[str, SessionTranscript]" = OrderedDict()
+        self._by_first_message: Dict[int, SessionTranscript] = {}
+        self.restarts = 0
+
+    def system_message(self, character: Character) -> BaseMessage:
+        cached = self._system.get(character.character_id)
+        if cached is None or cached[0] is not character:
+            message = character.prompt.messages[0].format()
+            self.encodings.encode(message)
+            self._system[character.character_id] = cached = (character, message)
+            logger.debug("Rendered system prompt for character '%s'.", character.character_id)
+        return cached[1]
+
+    def assemble(
+        self, character: Character, session_id: str, history: Sequence[BaseMessage], user_input: str,
+    ) -> List[BaseMessage]:
+        transcript = self._transcripts.get(session_id)
+        if transcript is None:
+            transcript = self._transcripts[session_id] = SessionTranscript()
+            while len(self._transcripts) > self.max_sessions:
+                self._unindex(self._transcripts.popitem(last=False)[1])
+        else:
+            self._transcripts.move_to_end(session_id)
+        self._unindex(transcript)
+        if not transcript.sync(history, self.encodings.encode):
+            self.restarts += 1
+        if transcript.messages:
+            self._by_first_message[id(transcript.messages[0])] = transcript
+        return [self.system_message(character), *transcript.messages, HumanMessage(content=user_input)]
+
+    def encode_messages(self, messages: Sequence[BaseMessage]) -> bytes:
+        """``messages`` as a JSON array; runs that match a session transcript are spliced in whole."""
+        parts: List[bytes] = []
+        index = 0
+        while index < len(messages):
+            transcript = self._by_first_message.get(id(messages[index]))
+            if transcript is not None and transcript.is_prefix_of(messages, index):
+                parts.append(transcript.encoded)
+                index += len(transcript.messages)
+            else:
+                parts.append(self.encodings.encode(messages[index]))
+                index += 1
+        return b"[" + b", ".join(parts) + b"]"
+
+    def forget(self, session_id: str) -> None:
+        transcript = self._transcripts.pop(session_id, None)
+        if transcript is not None:
+            self._unindex(transcript)
+
+    def _unindex(self, transcript: SessionTranscript) -> None:
+        if transcript.messages and self._by_first_message.get(id(transcript.messages[0])) is transcript:
+            del self._by_first_message[id(transcript.messages[0])]
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._transcripts),
+            "restarts": self.restarts,
+            "encoded_messages": len(self.encodings),
+            "encoding_hits": self.encodings.hits,
+            "encoding_misses": self.encodings.misses,
+        }
+
+
+# One transcript per live session at most; sessions the store evicted age out of the LRU.
+prompt_assembler = PromptAssembler(max_sessions=settings.SESSION_MAX_SESSIONS)
+metrics_registry.register_collector("prompt_assembly", prompt_assembler.stats)
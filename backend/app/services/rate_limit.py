@@ -0,0 +1,228 @@
+# backend/app/services/rate_limit.py
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator, Callable, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import rate_limited
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a key is over its limit; ``retry_after`` is in whole seconds."""
+
+    def __init__(self, scope: str, retry_after: int):
+        super().__init__(scope)
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class _Shard:
+    __slots__ = ("lock", "buckets")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets: "OrderedDict[str, _Bucket]" = OrderedDict()  # least recently used first
+
+
+class TokenBucketLimiter:
+    """Token buckets per key: ``rate`` tokens per second, holding at most ``burst``.
+
+    Buckets are refilled lazily from the time elapsed since they were last touched, so
+    there are no timers. Keys are spread over ``shards`` LRU dicts, each behind its own
+    lock. A bucket that has refilled completely behaves like a missing one, so such
+    buckets are dropped from the LRU end as new keys arrive. Each shard also holds at most
+    ``max_keys / shards`` buckets, which bounds memory whatever the number of distinct
+    keys (evicting a partly drained bucket only forgives that key's recent use).
+    """
+
+    def __init__(self, rate: float, burst: float, shards: int = 64, max_keys: int = 200_000,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate <= 0 or burst <= 0:
+            raise ValueError("rate and burst must be positive")
+        self.rate = rate
+        self.burst = float(burst)
+        shards = 1 << max(0, int(shards) - 1).bit_length()  # power of two, for masking
+        self._shards: List[_Shard] = [_Shard() for _ in range(shards)]
+        self._mask = shards - 1
+        self._max_per_shard = max(1, max_keys // shards)
+        self._clock = clock
+        self.evictions = 0
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """Takes ``cost`` tokens; returns 0.0 when allowed, else the seconds until it would be."""
+        now = self._clock()
+        shard = self._shards[hash(key) & self._mask]
+        with shard.lock:
+            bucket = self._bucket(shard, key, now)
+            if bucket.tokens >= cost:
+                bucket.tokens -= cost
+                return 0.0
+            return (cost - bucket.tokens) / self.rate
+
+    def acquire_up_to_burst(self, key: str, cost: float) -> float:
+        """Like ``acquire``, but a cost above ``burst`` takes a full bucket and leaves the rest as debt."""
+        wait = self.acquire(key, min(cost, self.burst))
+        if not wait and cost > self.burst:
+            self.charge(key, cost - self.burst)
+        return wait
+
+    def charge(self, key: str, cost: float) -> None:
+        """Takes ``cost`` tokens after the fact; the bucket may go into debt, delaying the next acquire."""
+        now = self._clock()
+        shard = self._shards[hash(key) & self._mask]
+        with shard.lock:
+            self._bucket(shard, key, now).tokens -= cost
+
+    def _bucket(self, shard: _Shard, key: str, now: float) -> _Bucket:
+        buckets = shard.buckets
+        bucket = buckets.get(key)
+        if bucket is not None:
+            buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            return bucket
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if len(buckets) < self._max_per_shard and oldest.tokens + (now - oldest.updated) * self.rate < self.burst:
+                break
+            buckets.popitem(last=False)
+            self.evictions += 1
+        bucket = buckets[key] = _Bucket(self.burst, now)
+        return bucket
+
+    def __len__(self) -> int:
+        return sum(len(shard.buckets) for shard in self._shards)
+
+
+def retry_after_seconds(wait: float) -> int:
+    return max(1, math.ceil(wait))
+
+
+class SessionRateLimits:
+    """Per-session request limit, plus an optional budget of model tokens per session.
+
+    Token use is only known once a reply has streamed, so it is charged afterwards
+    (``metered``); a session that overdrew its budget is refused until it refills.
+    """
+
+    def __init__(self, requests: Optional[TokenBucketLimiter] = None,
+                 tokens: Optional[TokenBucketLimiter] = None):
+        self.requests = requests
+        self.tokens = tokens
+
+    def check(self, session_id: str) -> None:
+        if self.tokens is not None:
+            wait = self.tokens.acquire(session_id, cost=0.0)
+            if wait:
+                rate_limited.labels("session_tokens").inc()
+                raise RateLimitExceeded("session_tokens", retry_after_seconds(wait))
+        if self.requests is not None:
+            wait = self.requests.acquire(session_id)
+            if wait:
+                rate_limited.labels("session").inc()
+                raise RateLimitExceeded("session", retry_after_seconds(wait))
+
+    async def metered(self, session_id: str, prompt: str, stream: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+        """Passes ``stream`` through and charges its estimated tokens (~4 characters each) with the prompt's."""
+        chars = len(prompt)
+        try:
+            # aclosing: the inner stream finishes (and records its turn) before we do.
+            async with aclosing(stream) as parts:
+                async for text in parts:
+                    chars += len(text)
+                    yield text
+        finally:
+            if self.tokens is not None:
+                self.tokens.charge(session_id, (chars + 3) // 4)
+
+
+def client_ip(scope, trust_forwarded_for: bool = False) -> str:
+    if trust_forwarded_for:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.split(b",", 1)[0].strip().decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """ASGI middleware limiting requests per client IP under ``path_prefix``.
+
+    Runs before the body is read, so a refused request costs one bucket update and a
+    canned 429 with Retry-After; a refused WebSocket handshake is closed with 1013 (try
+    again later) instead, which the server turns into a 403. Set ``trust_forwarded_for`` only behind a proxy that
+    overwrites X-Forwarded-For.
+    """
+
+    body = json.dumps({"detail": "Too many requests. Please retry shortly."}).encode()
+
+    def __init__(self, app, limiter: Optional[TokenBucketLimiter], path_prefix: str = "/api/",
+                 trust_forwarded_for: bool = False):
+        self.app = app
+        self.limiter = limiter
+        self.path_prefix = path_prefix
+        self.trust_forwarded_for = trust_forwarded_for
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or self.limiter is None or not scope["path"].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+        wait = self.limiter.acquire(client_ip(scope, self.trust_forwarded_for))
+        if not wait:
+            return await self.app(scope, receive, send)
+        rate_limited.labels("ip").inc()
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1013})
+            return
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(self.body)).encode()),
+                (b"retry-after", str(retry_after_seconds(wait)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": self.body})
+
+
+def _limiter(per_minute: float, burst: int) -> Optional[TokenBucketLimiter]:
+    if not settings.RATE_LIMIT_ENABLED or per_minute <= 0:
+        return None
+    return TokenBucketLimiter(per_minute / 60.0, burst, shards=settings.RATE_LIMIT_SHARDS,
+                              max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+def _limiter_stats(limiter: Optional[TokenBucketLimiter]) -> dict:
+    if limiter is None:
+        return {"enabled": False}
+    return {"enabled": True, "keys": len(limiter), "evictions": limiter.evictions}
+
+
+def rate_limit_stats() -> dict:
+    return {
+        "ip": _limiter_stats(ip_rate_limiter),
+        "session": _limiter_stats(session_rate_limits.requests),
+        "session_tokens": _limiter_stats(session_rate_limits.tokens),
+    }
+
+
+ip_rate_limiter = _limiter(settings.RATE_LIMIT_IP_PER_MINUTE, settings.RATE_LIMIT_IP_BURST)
+session_rate_limits = SessionRateLimits(
+    requests=_limiter(settings.RATE_LIMIT_SESSION_PER_MINUTE, settings.RATE_LIMIT_SESSION_BURST),
+    tokens=_limiter(settings.RATE_LIMIT_SESSION_TOKENS_PER_MINUTE, settings.RATE_LIMIT_SESSION_TOKENS_BURST),
+)
@@ -0,0 +1,148 @@
+# backend/app/services/request_coalescing.py
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamCancelled(Exception):
+    """Raised to subscribers when the shared upstream generation was cancelled."""
+
+
+class StreamBroadcast:
+    """One upstream token stream fanned out to any number of subscribers.
+
+    Tokens are kept for the lifetime of the stream so late subscribers first replay
+    what was already produced and then follow live tokens.
+    """
+
+    def __init__(self):
+        self.tokens: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._event = asyncio.Event()
+
+    def publish(self, token: str) -> None:
+        self.tokens.append(token)
+        self._wake()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._wake()
+
+    def _wake(self) -> None:
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def follow(self) -> AsyncIterator[str]:
+        index = 0
+        while True:
+            while index < len(self.tokens):
+                yield self.tokens[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._event.wait()
+
+
+class Subscription:
+    """A subscriber's view of a broadcast. Must be closed (``aclose``) when abandoned."""
+
+    def __init__(self, flight: "SingleFlight", key: Hashable, broadcast: StreamBroadcast, is_leader: bool):
+        self.is_leader = is_leader
+        self._flight = flight
+        self._key = key
+        self._broadcast = broadcast
+        self._released = False
+        broadcast.subscribers += 1
+        self._iterator = self._iterate()
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._iterator
+
+    async def aclose(self) -> None:
+        await self._iterator.aclose()
+        self._release()
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        try:
+            async for token in self._broadcast.follow():
+                yield token
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._flight._unsubscribe(self._key, self._broadcast)
+
+
+class SingleFlight:
+    """Coalesces identical in-flight generations onto one upstream stream.
+
+    The first request for a key starts the upstream stream in a background task (so the
+    leader disconnecting does not cut off the others); later requests for the same key
+    subscribe to its broadcast. When every subscriber has gone away the upstream task
+    is cancelled. Upstream errors are delivered to every subscriber.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, StreamBroadcast] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def subscribe(self, key: Hashable, start: Callable[[], AsyncIterator[str]]) -> Subscription:
+        broadcast = self._inflight.get(key)
+        if broadcast is not None:
+            self.followers += 1
+            logger.debug("Coalescing request onto in-flight generation (%d subscribers).", broadcast.subscribers + 1)
+            return Subscription(self, key, broadcast, is_leader=False)
+        self.leaders += 1
+        broadcast = StreamBroadcast()
+        self._inflight[key] = broadcast
+        subscription = Subscription(self, key, broadcast, is_leader=True)
+        broadcast.task = asyncio.create_task(self._drive(key, broadcast, start))
+        return subscription
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "leaders": self.leaders, "followers": self.followers}
+
+    async def _drive(self, key: Hashable, broadcast: StreamBroadcast, start: Callable[[], AsyncIterator[str]]) -> None:
+        try:
+            async with aclosing(start()) as upstream:
+                async for token in upstream:
+                    broadcast.publish(token)
+            broadcast.finish()
+        except asyncio.CancelledError:
+            broadcast.finish(UpstreamCancelled("upstream generation was cancelled"))
+            raise
+        except Exception as e:
+            broadcast.finish(e)
+        finally:
+            self._forget(key, broadcast)
+
+    def _unsubscribe(self, key: Hashable, broadcast: StreamBroadcast) -> None:
+        broadcast.subscribers -= 1
+        if broadcast.subscribers == 0 and not broadcast.done and broadcast.task is not None:
+            logger.debug("All subscribers left; cancelling upstream generation.")
+            self._forget(key, broadcast)
+            broadcast.task.cancel()
+
+    def _forget(self, key: Hashable, broadcast: StreamBroadcast) -> None:
+        if self._inflight.get(key) is broadcast:
+            del self._inflight[key]
+
+
+request_coalescer = SingleFlight()
@@ -0,0 +1,147 @@
+# backend/app/services/response_cache.py
+import asyncio
+import logging
+import re
+import threading
+from typing import AsyncGenerator, Dict, FrozenSet, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import metrics_registry
+from app.utils.text_vectors import HashedNgramEncoder, content_words, normalize_prompt
+
+logger = logging.getLogger(__name__)
+
+_REPLAY_CHUNK = re.compile(r"\S+\s*|\s+")
+
+
+class _Namespace:
+    """Fixed-capacity vector index for one character: a NumPy matrix plus parallel arrays."""
+
+    def __init__(self, capacity: int, dim: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.prompts: List[Optional[str]] = [None] * capacity
+        self.content: List[Optional[FrozenSet[str]]] = [None] * capacity
+        self.responses: List[Optional[str]] = [None] * capacity
+        self.slots: Dict[str, int] = {}  # normalized prompt -> slot, for exact hits
+        self.size = 0
+
+
+class SemanticResponseCache:
+    """Caches replies to context-free prompts (empty session history) per character.
+
+    Prompts are normalized and embedded with a hashed n-gram encoder. A lookup is an
+    exact-key check followed by one matrix-vector product over the namespace's
+    vectors; the best match is a hit when its cosine similarity clears the threshold
+    and it has exactly the same content words. Character n-grams alone score a
+    one-word change ("ross" vs "rose") as a near-duplicate, so the similarity only
+    forgives differences in function words, word order and punctuation.
+    Each namespace holds at most ``max_entries`` replies and evicts the least
+    recently used one when full.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.92,
+        max_entries: int = 2048,
+        dim: int = 512,
+        encoder: Optional[HashedNgramEncoder] = None,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.encoder = encoder or HashedNgramEncoder(dim=dim)
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, namespace: str, prompt: str) -> Optional[str]:
+        return self.lookup_many(namespace, [prompt])[0]
+
+    def lookup_many(self, namespace: str, prompts: Sequence[str]) -> List[Optional[str]]:
+        """Batched lookup: one matrix product scores every prompt against the namespace."""
+        results: List[Optional[str]] = [None] * len(prompts)
+        ns = self._namespaces.get(namespace)
+        if ns is None or ns.size == 0:
+            self.misses += len(prompts)
+            return results
+        normalized = [normalize_prompt(p) for p in prompts]
+        pending = []
+        with self._lock:
+            for index, key in enumerate(normalized):
+                slot = ns.slots.get(key)
+                if slot is not None:
+                    results[index] = self._touch(ns, slot)
+                else:
+                    pending.append(index)
+            if pending:
+                queries = self.encoder.encode_batch([normalized[i] for i in pending], normalized=True)
+                scores = queries @ ns.vectors[:ns.size].T
+                best_slots = scores.argmax(axis=1)
+                for row, index in enumerate(pending):
+                    slot = int(best_slots[row])
+                    if (scores[row, slot] >= self.similarity_threshold
+                            and ns.content[slot] == content_words(normalized[index])):
+                        results[index] = self._touch(ns, slot)
+        hits = sum(result is not None for result in results)
+        self.hits += hits
+        self.misses += len(prompts) - hits
+        return results
+
+    def store(self, namespace: str, prompt: str, response: str) -> None:
+        key = normalize_prompt(prompt)
+        if not key or not response:
+            return
+        vector = self.encoder.encode(key, normalized=True)
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                ns = self._namespaces[namespace] = _Namespace(self.max_entries, self.encoder.dim)
+            slot = ns.slots.get(key)
+            if slot is None:
+                if ns.size < self.max_entries:
+                    slot = ns.size
+                    ns.size += 1
+                else:
+                    slot = int(ns.last_used.argmin())
+                    ns.slots.pop(ns.prompts[slot], None)
+                ns.slots[key] = slot
+                ns.prompts[slot] = key
+                ns.content[slot] = content_words(key)
+                ns.vectors[slot] = vector
+            ns.responses[slot] = response
+            self._touch(ns, slot)
+
+    def stats(self) -> dict:
+        return {
+            "namespaces": {name: ns.size for name, ns in self._namespaces.items()},
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._namespaces.clear()
+
+    def _touch(self, ns: _Namespace, slot: int) -> str:
+        self._clock += 1
+        ns.last_used[slot] = self._clock
+        return ns.responses[slot]
+
+
+async def replay_stream(text: str) -> AsyncGenerator[str, None]:
+    """Replays a cached reply word by word so it goes through the normal streaming path."""
+    for chunk in _REPLAY_CHUNK.findall(text):
+        yield chunk
+        await asyncio.sleep(0)
+
+
+response_cache = SemanticResponseCache(
+    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+)
+# Registered here rather than in app.main, so NumPy is only imported once a generation needs the cache.
+metrics_registry.register_collector("response_cache", response_cache.stats)
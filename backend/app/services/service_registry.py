@@ -0,0 +1,129 @@
+# backend/app/services/service_registry.py
+import asyncio
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, NamedTuple, Optional
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.services.llm_service import LLMService
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceKey(NamedTuple):
+    provider: str
+    model_name: str
+    temperature: float
+
+
+class LLMServiceRegistry:
+    """Process-wide pool of LLMService instances keyed by provider/model/temperature.
+
+    Each pooled service owns one LLM client and one compiled RunnableWithMessageHistory,
+    so requests reuse the same client connection and compiled prompt instead of
+    rebuilding them per message. The default service is built during the FastAPI
+    lifespan warm-up; any other key is built lazily on first use.
+    """
+
+    def __init__(self):
+        self._services: Dict[ServiceKey, "LLMService"] = {}
+        self._lock = threading.Lock()
+        self._ready = False
+        self._last_error: Optional[str] = None
+        self._warmup_duration_ms: Optional[float] = None
+
+    @staticmethod
+    def make_key(
+        provider: Optional[str] = None,
+        model_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+    ) -> ServiceKey:
+        return ServiceKey(
+            (provider or settings.LLM_SERVICE_PROVIDER).upper(),
+            model_name or settings.LLM_MODEL_NAME,
+            float(settings.LLM_TEMPERATURE if temperature is None else temperature),
+        )
+
+    def get(
+        self,
+        provider: Optional[str] = None,
+        model_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+    ) -> "LLMService":
+        key = self.make_key(provider, model_name, temperature)
+        service = self._services.get(key)
+        if service is not None:
+            return service
+        # The first service built pays for importing LangChain and the provider SDKs.
+        from app.services.llm_service import LLMService
+
+        with self._lock:
+            service = self._services.get(key)
+            if service is None:
+                logger.info("Creating pooled LLMService for %s", key)
+                service = LLMService(
+                    provider=key.provider, model_name=key.model_name, temperature=key.temperature
+                )
+                self._services[key] = service
+                if key == self.make_key():
+                    # A lazily built default service counts as ready too (e.g. after a failed warm-up).
+                    self._ready = True
+        return service
+
+    async def warm_up(self) -> bool:
+        """Builds and warms the default service off the event loop. Never raises."""
+        started = time.perf_counter()
+        try:
+            service = await asyncio.to_thread(self.get)
+            await asyncio.to_thread(service.warm_up)
+        except Exception as e:
+            self._ready = False
+            self._last_error = str(e)
+            logger.error("LLM service warm-up failed: %s", e, exc_info=True)
+            return False
+        self._warmup_duration_ms = (time.perf_counter() - started) * 1000
+        self._ready = True
+        self._last_error = None
+        logger.info("LLM service warm-up completed in %.1f ms.", self._warmup_duration_ms)
+        return True
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def health(self) -> dict:
+        return {
+            "ready": self._ready,
+            "pooled_services": len(self._services),
+            "services": [key._asdict() for key in self._services],
+            "warmup_duration_ms": self._warmup_duration_ms,
+            "last_error": self._last_error,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._services.clear()
+            self._ready = False
+
+
+class LazyLLMService:
+    """Stands in for the registry's default service until one of its attributes is used.
+
+    Requests answered without the model (empty or guardrailed input, refusals) never
+    build the service, so they never import LangChain.
+    """
+
+    __slots__ = ("_registry",)
+
+    def __init__(self, registry: LLMServiceRegistry):
+        self._registry = registry
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._registry.get(), name)
+
+
+llm_service_registry = LLMServiceRegistry()
+default_llm_service = LazyLLMService(llm_service_registry)
@@ -0,0 +1,259 @@
+# backend/app/services/session_store.py
+import asyncio
+import logging
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.history_fingerprint import EMPTY_HISTORY_FINGERPRINT
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from app.services.tracked_history import TrackedChatMessageHistory
+
+logger = logging.getLogger(__name__)
+
+# Approximate resident size of a BaseMessage object excluding its content string
+# (pydantic model, __dict__, additional_kwargs/response_metadata dicts).
+MESSAGE_OVERHEAD_BYTES = 768
+
+
+def estimate_message_bytes(message: "BaseMessage") -> int:
+    content = message.content
+    if not isinstance(content, str):
+        content = str(content)
+    return MESSAGE_OVERHEAD_BYTES + sys.getsizeof(content)
+
+
+class _SessionEntry:
+    __slots__ = ("session_id", "history", "nbytes", "last_access")
+
+    def __init__(self, session_id: str, history: "TrackedChatMessageHistory", now: float):
+        self.session_id = session_id
+        self.history = history
+        self.nbytes = 0
+        self.last_access = now
+
+
+class BaseSessionStore(ABC):
+    """Shared plumbing for session stores: the background sweeper task and shutdown."""
+
+    _sweeper_task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Drops expired sessions; returns how many were removed."""
+
+    @abstractmethod
+    def history_fingerprint(self, session_id: str) -> Tuple[str, int]:
+        """Rolling fingerprint of everything appended to the session, and how many messages it holds."""
+
+    async def refresh(self, session_id: str) -> None:
+        """Brings a session up to date with other workers before a turn reads it (no-op in process)."""
+
+    def close(self) -> None:
+        """Releases resources held by the store (flushes pending writes, closes files)."""
+
+    def start_sweeper(self, interval_seconds: float) -> None:
+        if self._sweeper_task is None or self._sweeper_task.done():
+            self._sweeper_task = asyncio.create_task(self._run_sweeper(interval_seconds))
+
+    async def stop_sweeper(self) -> None:
+        task, self._sweeper_task = self._sweeper_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run_sweeper(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error("Session sweeper failed: %s", e, exc_info=True)
+
+
+class InMemorySessionStore(BaseSessionStore):
+    """Bounded in-process store of per-session chat histories.
+
+    Sessions are kept in LRU order and bounded three ways: number of sessions,
+    total estimated bytes, and messages per session (oldest turns are dropped first).
+    Sessions idle for longer than ``ttl_seconds`` are expired lazily on access and
+    by a background sweeper task.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10_000,
+        max_bytes: int = 128 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+        max_messages_per_session: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_messages_per_session = max_messages_per_session
+        self._clock = clock
+        self._entries: "OrderedDict[str, _SessionEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, session_id: str) -> "TrackedChatMessageHistory":
+        """Returns the session's history, creating it if needed, and marks it most recently used."""
+        # LangChain's history classes are only imported once a conversation needs one.
+        from app.services.tracked_history import TrackedChatMessageHistory
+
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and self._is_expired(entry, now):
+                self._remove(entry)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                logger.debug("SESSION_HISTORY (%s): Creating new ChatMessageHistory.", session_id)
+                history = TrackedChatMessageHistory()
+                history._session_id = session_id
+                history._on_change = self._on_history_change
+                entry = _SessionEntry(session_id, history, now)
+                self._entries[session_id] = entry
+                self._enforce_limits(keep=entry)
+            else:
+                entry.last_access = now
+                self._entries.move_to_end(session_id)
+            return entry.history
+
+    def peek(self, session_id: str) -> Optional["TrackedChatMessageHistory"]:
+        """Returns the session's history without creating it or touching its LRU position."""
+        entry = self._entries.get(session_id)
+        return entry.history if entry is not None else None
+
+    def history_fingerprint(self, session_id: str) -> Tuple[str, int]:
+        entry = self._entries.get(session_id)
+        if entry is None or self._is_expired(entry, self._clock()):
+            return EMPTY_HISTORY_FINGERPRINT, 0
+        return entry.history.fingerprint, len(entry.history.messages)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self._remove(entry)
+
+    def sweep(self) -> int:
+        """Expires idle sessions. Returns the number of sessions removed."""
+        now = self._clock()
+        removed = 0
+        with self._lock:
+            # Entries are in LRU order, so the idle ones are all at the front.
+            while self._entries:
+                entry = next(iter(self._entries.values()))
+                if not self._is_expired(entry, now):
+                    break
+                self._remove(entry)
+                removed += 1
+            self._expirations += removed
+        if removed:
+            logger.debug("Session sweeper expired %d idle sessions.", removed)
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "sessions": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+        }
+
+    def _is_expired(self, entry: _SessionEntry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.last_access > self.ttl_seconds
+
+    def _on_history_change(self, history: "TrackedChatMessageHistory", added_bytes: int) -> None:
+        with self._lock:
+            entry = self._entries.get(history._session_id)
+            if entry is None or entry.history is not history:
+                return  # Evicted while a turn was in flight; nothing to account.
+            if added_bytes == 0:  # cleared
+                self._total_bytes -= entry.nbytes
+                entry.nbytes = 0
+                return
+            entry.nbytes += added_bytes
+            self._total_bytes += added_bytes
+            entry.last_access = self._clock()
+            self._trim_messages(entry)
+            self._enforce_limits(keep=entry)
+
+    def _trim_messages(self, entry: _SessionEntry) -> None:
+        messages = entry.history.messages
+        overflow = len(messages) - self.max_messages_per_session
+        if overflow <= 0:
+            return
+        overflow += overflow % 2  # drop whole human/ai turns
+        dropped = messages[:overflow]
+        del messages[:overflow]
+        freed = sum(estimate_message_bytes(m) for m in dropped)
+        entry.nbytes -= freed
+        self._total_bytes -= freed
+
+    def _enforce_limits(self, keep: _SessionEntry) -> None:
+        while self._entries and (
+            len(self._entries) > self.max_sessions or self._total_bytes > self.max_bytes
+        ):
+            victim = next(iter(self._entries.values()))
+            if victim is keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(keep.session_id)
+                continue
+            logger.debug("Evicting session %s (%d bytes) from session store.", victim.session_id, victim.nbytes)
+            self._remove(victim)
+            self._evictions += 1
+
+    def _remove(self, entry: _SessionEntry) -> None:
+        del self._entries[entry.session_id]
+        self._total_bytes -= entry.nbytes
+
+
+def build_session_store() -> BaseSessionStore:
+    backend = settings.SESSION_STORE_BACKEND.lower()
+    if backend == "sqlite":
+        from app.services.sqlite_session_store import SQLiteSessionStore
+
+        return SQLiteSessionStore(
+            path=settings.SESSION_SQLITE_PATH,
+            ttl_seconds=settings.SESSION_IDLE_TTL_SECONDS,
+            max_messages_per_session=settings.SESSION_MAX_MESSAGES,
+            cache_max_sessions=settings.SESSION_SQLITE_CACHE_SESSIONS,
+            batch_max_size=settings.SESSION_SQLITE_BATCH_SIZE,
+            flush_interval_seconds=settings.SESSION_SQLITE_FLUSH_INTERVAL_MS / 1000,
+        )
+    if backend != "memory":
+        raise ValueError(f"Unsupported SESSION_STORE_BACKEND: {settings.SESSION_STORE_BACKEND}")
+    return InMemorySessionStore(
+        max_sessions=settings.SESSION_MAX_SESSIONS,
+        max_bytes=settings.SESSION_MAX_BYTES,
+        ttl_seconds=settings.SESSION_IDLE_TTL_SECONDS,
+        max_messages_per_session=settings.SESSION_MAX_MESSAGES,
+    )
+
+
+session_store = build_session_store()
@@ -0,0 +1,399 @@
+# backend/app/services/sqlite_session_store.py
+import asyncio
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from app.services.session_store import BaseSessionStore
+from app.utils.history_fingerprint import EMPTY_HISTORY_FINGERPRINT, extend_with_message, fingerprint_messages
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id);
+"""
+
+_STOP = object()
+
+
+class _CachedSession:
+    __slots__ = ("messages", "db_max_id", "pending", "fingerprint")
+
+    def __init__(self, messages: List[BaseMessage], db_max_id: int, fingerprint: str):
+        self.messages = messages
+        self.db_max_id = db_max_id  # highest row id reflected in `messages`
+        self.pending = 0  # appends queued but not yet committed by the writer
+        self.fingerprint = fingerprint  # rolling fingerprint after the newest message
+
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """Chat history view over one session in a SQLiteSessionStore."""
+
+    def __init__(self, store: "SQLiteSessionStore", session_id: str):
+        self._store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self._store._read(self.session_id)
+
+    @property
+    def fingerprint(self) -> str:
+        return self._store.history_fingerprint(self.session_id)[0]
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self._store._append(self.session_id, messages)
+
+    def clear(self) -> None:
+        self._store._clear(self.session_id)
+
+
+class SQLiteSessionStore(BaseSessionStore):
+    """Session histories persisted in a SQLite database in WAL mode.
+
+    Any worker process on the host can serve any session. Appends are applied to the
+    in-process read cache immediately and queued for a write-behind thread that commits
+    them in batches (one transaction per batch, ``synchronous=NORMAL`` so there is no
+    fsync per message). Each row stores the session's rolling history fingerprint after
+    it, chained by the writer from the newest row on disk, so the fingerprint survives
+    trimming, covers turns from every worker and is shared by all of them. Reads are
+    served from an LRU read-through cache; ``refresh`` revalidates a session once per
+    turn, off the event loop, with a single indexed ``MAX(id)`` lookup so turns written
+    by other workers are seen.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 3600.0,
+        max_messages_per_session: int = 200,
+        cache_max_sessions: int = 1024,
+        batch_max_size: int = 256,
+        flush_interval_seconds: float = 0.02,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_messages_per_session = max_messages_per_session
+        self.cache_max_sessions = cache_max_sessions
+        self.batch_max_size = batch_max_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []  # every thread's reader, closed by close()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._batches_written = 0
+        self._rows_written = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        if "fingerprint" not in {row[1] for row in conn.execute("PRAGMA table_info(chat_messages)")}:
+            conn.execute("ALTER TABLE chat_messages ADD COLUMN fingerprint TEXT")  # databases from before fingerprints
+        conn.close()
+        self._writer = threading.Thread(target=self._writer_loop, name="sqlite-session-writer", daemon=True)
+        self._writer.start()
+
+    # --- store interface ---
+
+    def get(self, session_id: str) -> SQLiteChatMessageHistory:
+        return SQLiteChatMessageHistory(self, session_id)
+
+    def peek(self, session_id: str) -> Optional[SQLiteChatMessageHistory]:
+        return SQLiteChatMessageHistory(self, session_id) if session_id in self._cache else None
+
+    def __contains__(self, session_id: str) -> bool:
+        if session_id in self._cache:
+            return True
+        row = self._reader().execute(
+            "SELECT 1 FROM chat_messages WHERE session_id = ? LIMIT 1", (session_id,)
+        ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def delete(self, session_id: str) -> None:
+        self._clear(session_id)
+
+    def history_fingerprint(self, session_id: str) -> Tuple[str, int]:
+        with self._lock:
+            messages = self._read(session_id)
+            return self._cache[session_id].fingerprint, len(messages)
+
+    def sweep(self) -> int:
+        """Queues deletion of sessions idle longer than the TTL; the writer thread applies it."""
+        if self.ttl_seconds > 0:
+            self._queue.put(("expire", time.time() - self.ttl_seconds))
+        return 0
+
+    async def refresh(self, session_id: str) -> None:
+        await asyncio.to_thread(self._revalidate, session_id)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until everything queued so far has been committed."""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        with self._lock:
+            readers, self._readers = self._readers, []
+            self._local = threading.local()
+        for conn in readers:
+            conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "cached_sessions": len(self._cache),
+            "pending_writes": self._queue.qsize(),
+            "batches_written": self._batches_written,
+            "rows_written": self._rows_written,
+            "cache_hits": self._cache_hits,
+            "cache_misses": self._cache_misses,
+        }
+
+    # --- history operations ---
+
+    def _read(self, session_id: str) -> List[BaseMessage]:
+        """The cached history as of the last refresh; only a session not cached yet touches the database."""
+        with self._lock:
+            cached = self._cache.get(session_id)
+            if cached is not None:
+                self._cache.move_to_end(session_id)
+                self._cache_hits += 1
+                return cached.messages
+            self._cache_misses += 1
+            return self._install(session_id, *self._load(session_id))
+
+    def _revalidate(self, session_id: str) -> None:
+        # Runs in a worker thread; the lock is only held to compare and swap in the result.
+        db_max_id = self._db_max_id(session_id)
+        with self._lock:
+            cached = self._cache.get(session_id)
+            # Our own queued appends are already in the cache; only revalidate when idle.
+            if cached is not None and (cached.pending or cached.db_max_id == db_max_id):
+                return
+        loaded = self._load(session_id)
+        with self._lock:
+            cached = self._cache.get(session_id)
+            if cached is not None and cached.pending:
+                return  # appended meanwhile; the writer forces a reload if the disk moved on
+            self._cache_misses += 1
+            self._install(session_id, *loaded)
+
+    def _install(self, session_id: str, messages: List[BaseMessage], db_max_id: int, fingerprint: str) -> List[BaseMessage]:
+        cached = self._cache.get(session_id)
+        if cached is not None:
+            cached.messages[:] = messages  # keep list identity for holders of the old list
+            cached.db_max_id = db_max_id
+            cached.fingerprint = fingerprint
+        else:
+            cached = _CachedSession(messages, db_max_id, fingerprint)
+            self._cache[session_id] = cached
+            self._evict_cache()
+        return cached.messages
+
+    def _append(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        payloads = [json.dumps(message_to_dict(m)) for m in messages]
+        with self._lock:
+            cached = self._cache.get(session_id)
+            if cached is None:
+                self._read(session_id)
+                cached = self._cache[session_id]
+            # Provisional until committed: the writer chains the stored fingerprints from what is
+            # on disk, which may include turns from other workers this cache has not seen.
+            for message in messages:
+                cached.fingerprint = extend_with_message(cached.fingerprint, message)
+            cached.messages.extend(messages)
+            overflow = len(cached.messages) - self.max_messages_per_session
+            if overflow > 0:
+                del cached.messages[:overflow]
+            cached.pending += 1
+        self._queue.put(("append", session_id, list(zip(payloads, messages)), time.time()))
+
+    def _clear(self, session_id: str) -> None:
+        with self._lock:
+            cached = self._cache.get(session_id)
+            if cached is not None:
+                cached.messages.clear()
+                cached.fingerprint = EMPTY_HISTORY_FINGERPRINT
+                cached.pending += 1
+        self._queue.put(("clear", session_id))
+
+    def _load(self, session_id: str):
+        rows = self._reader().execute(
+            "SELECT id, message, fingerprint FROM ("
+            " SELECT id, message, fingerprint FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?"
+            ") ORDER BY id",
+            (session_id, self.max_messages_per_session),
+        ).fetchall()
+        messages = messages_from_dict([json.loads(row[1]) for row in rows])
+        if not rows:
+            return messages, 0, EMPTY_HISTORY_FINGERPRINT
+        # Rows written before fingerprints were stored: fall back to the retained messages.
+        return messages, rows[-1][0], rows[-1][2] or fingerprint_messages(messages)
+
+    def _db_max_id(self, session_id: str) -> int:
+        row = self._reader().execute(
+            "SELECT MAX(id) FROM chat_messages WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] or 0
+
+    def _newest_row(self, conn: sqlite3.Connection, session_id: str) -> Tuple[int, str]:
+        """Id and fingerprint of the session's newest row on disk (0 and the empty fingerprint if none)."""
+        row = conn.execute(
+            "SELECT id, fingerprint FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT 1", (session_id,)
+        ).fetchone()
+        if row is None:
+            return 0, EMPTY_HISTORY_FINGERPRINT
+        if row[1] is None:  # rows written before fingerprints were stored
+            rows = conn.execute(
+                "SELECT message FROM chat_messages WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+            return row[0], fingerprint_messages(messages_from_dict([json.loads(r[0]) for r in rows]))
+        return row[0], row[1]
+
+    def _evict_cache(self) -> None:
+        while len(self._cache) > self.cache_max_sessions:
+            oldest_id = next(iter(self._cache))
+            if self._cache[oldest_id].pending:
+                break  # keep sessions with uncommitted appends resident
+            del self._cache[oldest_id]
+
+    # --- connections and write-behind ---
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def _writer_loop(self) -> None:
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while len(batch) < self.batch_max_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._write_batch(conn, batch)
+            except Exception as e:
+                logger.error("SQLite session writer failed to commit %d operations: %s", len(batch), e, exc_info=True)
+        conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list) -> None:
+        last_ids = {}
+        prior_max_ids = {}  # session -> MAX(id) before this batch first touched it (None: cleared first)
+        fingerprints = {}  # session -> fingerprint after its newest row, as of this transaction
+        touched = [op[1] for op in batch if op[0] in ("append", "clear")]
+        flushes = [op[1] for op in batch if op[0] == "flush"]
+        rows_written = 0
+        committed = False
+        try:
+            # IMMEDIATE: no other worker can insert between reading MAX(id) and our inserts.
+            conn.execute("BEGIN IMMEDIATE")
+            for op in batch:
+                kind = op[0]
+                if kind == "append":
+                    _, session_id, rows, created_at = op
+                    if session_id not in prior_max_ids:
+                        prior_max_ids[session_id], fingerprints[session_id] = self._newest_row(conn, session_id)
+                    records = []
+                    for payload, message in rows:
+                        fingerprints[session_id] = extend_with_message(fingerprints[session_id], message)
+                        records.append((session_id, payload, created_at, fingerprints[session_id]))
+                    cursor = conn.executemany(
+                        "INSERT INTO chat_messages (session_id, message, created_at, fingerprint) VALUES (?, ?, ?, ?)",
+                        records,
+                    )
+                    last_ids[session_id] = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    # Keep at most max_messages_per_session rows per session on disk as well.
+                    conn.execute(
+                        "DELETE FROM chat_messages WHERE session_id = ? AND id <= ("
+                        " SELECT id FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?"
+                        ")",
+                        (session_id, session_id, self.max_messages_per_session),
+                    )
+                    rows_written += cursor.rowcount
+                elif kind == "clear":
+                    conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (op[1],))
+                    prior_max_ids.setdefault(op[1], None)
+                    fingerprints[op[1]] = EMPTY_HISTORY_FINGERPRINT
+                    last_ids[op[1]] = 0
+                elif kind == "expire":
+                    conn.execute(
+                        "DELETE FROM chat_messages WHERE session_id IN ("
+                        " SELECT session_id FROM chat_messages GROUP BY session_id HAVING MAX(created_at) < ?"
+                        ")",
+                        (op[1],),
+                    )
+            conn.execute("COMMIT")
+            committed = True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            with self._lock:
+                for session_id in touched:
+                    cached = self._cache.get(session_id)
+                    if cached is not None:
+                        cached.pending = max(0, cached.pending - 1)
+                        if not committed:
+                            # The cache holds rows that never reached the disk: reload it from there.
+                            cached.db_max_id = -1
+                            continue
+                        prior = prior_max_ids[session_id]
+                        if prior is None or prior == cached.db_max_id:
+                            cached.db_max_id = last_ids[session_id]
+                        else:
+                            # Another worker wrote rows the cache has not seen; they sit below our
+                            # ids, so force a reload once our own appends are committed.
+                            cached.db_max_id = -1
+            for done in flushes:
+                done.set()
+        self._batches_written += 1
+        self._rows_written += rows_written
@@ -0,0 +1,38 @@
+# backend/app/services/tracked_history.py
+from typing import Callable, Optional
+
+from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.messages import BaseMessage
+from pydantic import PrivateAttr
+
+from app.services.session_store import estimate_message_bytes
+from app.utils.history_fingerprint import EMPTY_HISTORY_FINGERPRINT, extend_with_message
+
+
+class TrackedChatMessageHistory(ChatMessageHistory):
+    """ChatMessageHistory that reports appends back to its store for memory accounting.
+
+    It also keeps the rolling fingerprint of every message appended since the session
+    began. Trimming old messages does not change it, so it keeps matching the
+    fingerprint of the full transcript a client holds.
+    """
+
+    _session_id: str = PrivateAttr(default="")
+    _on_change: Optional[Callable[["TrackedChatMessageHistory", int], None]] = PrivateAttr(default=None)
+    _fingerprint: str = PrivateAttr(default=EMPTY_HISTORY_FINGERPRINT)
+
+    @property
+    def fingerprint(self) -> str:
+        return self._fingerprint
+
+    def add_message(self, message: BaseMessage) -> None:
+        super().add_message(message)
+        self._fingerprint = extend_with_message(self._fingerprint, message)
+        if self._on_change is not None:
+            self._on_change(self, estimate_message_bytes(message))
+
+    def clear(self) -> None:
+        super().clear()
+        self._fingerprint = EMPTY_HISTORY_FINGERPRINT
+        if self._on_change is not None:
+            self._on_change(self, 0)
@@ -0,0 +1,35 @@
+# backend/app/utils/history_fingerprint.py
+import hashlib
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:  # Only for annotations; the chat endpoint imports this before LangChain is loaded.
+    from langchain_core.messages import BaseMessage
+
+EMPTY_HISTORY_FINGERPRINT = "0" * 32
+
+# Roles are hashed as clients name them, so a client can compute the same fingerprint.
+_ROLES = {"human": "user", "ai": "assistant"}
+
+
+def extend_fingerprint(fingerprint: str, role: str, content: str) -> str:
+    """Rolling hash step: H(n) = blake2b(H(n-1) | role | content)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(fingerprint.encode())
+    digest.update(b"\x1f")
+    digest.update(role.encode())
+    digest.update(b"\x1f")
+    digest.update(content.encode())
+    return digest.hexdigest()
+
+
+def extend_with_message(fingerprint: str, message: "BaseMessage") -> str:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return extend_fingerprint(fingerprint, _ROLES.get(message.type, message.type), content)
+
+
+def fingerprint_messages(messages: Iterable["BaseMessage"]) -> str:
+    """Fingerprint of a whole history; equal histories give equal fingerprints."""
+    fingerprint = EMPTY_HISTORY_FINGERPRINT
+    for message in messages:
+        fingerprint = extend_with_message(fingerprint, message)
+    return fingerprint
@@ -0,0 +1,242 @@
+# backend/app/utils/stream_framing.py
+import asyncio
+import weakref
+from contextlib import aclosing
+import json
+from json.encoder import encode_basestring_ascii
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional, Set, TypeVar
+
+try:  # Optional: orjson encodes strings several times faster than the stdlib.
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+TEXT_FRAME_PREFIX = b"0:"
+
+Frame = TypeVar("Frame")
+
+
+def encode_text_frame(text: str) -> bytes:
+    """One Vercel AI SDK text part: ``0:<json string>\\n`` as bytes."""
+    if orjson is not None:
+        return TEXT_FRAME_PREFIX + orjson.dumps(text) + b"\n"
+    return f"0:{encode_basestring_ascii(text)}\n".encode()
+
+
+def encode_ndjson_line(record: dict) -> bytes:
+    """One newline-delimited JSON record as bytes."""
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode()
+
+
+def encode_json_text(record: dict) -> str:
+    """One JSON document as text (a WebSocket text frame)."""
+    if orjson is not None:
+        return orjson.dumps(record).decode()
+    return json.dumps(record, ensure_ascii=False)
+
+
+async def ndjson_stream(records: AsyncIterator[dict]) -> AsyncGenerator[bytes, None]:
+    async with aclosing(records) as items:
+        async for record in items:
+            yield encode_ndjson_line(record)
+
+
+class StreamCounters:
+    """Process-wide counters for streams whose reader went away before the end."""
+
+    def __init__(self):
+        self.streams_cancelled = 0
+        self.tokens_abandoned = 0
+
+    def record_cancelled(self, unsent_tokens: int) -> None:
+        self.streams_cancelled += 1
+        self.tokens_abandoned += unsent_tokens
+
+    def stats(self) -> dict:
+        return {"streams_cancelled": self.streams_cancelled, "tokens_abandoned": self.tokens_abandoned}
+
+
+stream_counters = StreamCounters()
+
+
+class _FlushTicker:
+    """One repeating timer per event loop and interval that closes every open flush window.
+
+    Channels with buffered text are woken on each tick, so holding text costs a set
+    insertion instead of a timer per frame; a window therefore lasts at most ``interval``.
+    The timer only runs while some channel is waiting.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float):
+        self._loop = loop
+        self._interval = interval
+        self._waiting: Set["_TokenChannel"] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, channel: "_TokenChannel") -> None:
+        self._waiting.add(channel)
+        if self._timer is None:
+            self._timer = self._loop.call_later(self._interval, self._tick)
+
+    def discard(self, channel: "_TokenChannel") -> None:
+        self._waiting.discard(channel)
+
+    def _tick(self) -> None:
+        self._timer = None
+        ready = [channel for channel in self._waiting if channel.parts]
+        for channel in ready:
+            self._waiting.discard(channel)
+            channel.wake_reader()
+        if self._waiting:
+            self._timer = self._loop.call_later(self._interval, self._tick)
+
+
+_tickers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[float, _FlushTicker]]" = weakref.WeakKeyDictionary()
+
+
+def _flush_ticker(loop: asyncio.AbstractEventLoop, interval: float) -> _FlushTicker:
+    by_interval = _tickers.setdefault(loop, {})
+    ticker = by_interval.get(interval)
+    if ticker is None:
+        ticker = by_interval[interval] = _FlushTicker(loop, interval)
+    return ticker
+
+
+class _TokenChannel:
+    """Single-producer/single-consumer token buffer that wakes the reader once per frame.
+
+    The reader either waits for any data (before the first frame) or for the current
+    flush window to close (ticker, size cap or end of stream); tokens appended in between
+    just accumulate. The writer is handed a future to await once ``max_tokens`` tokens are
+    buffered, so a slow reader bounds memory instead of letting the server buffer the
+    whole reply.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_chars: int, max_tokens: int):
+        self.parts: List[str] = []
+        self.size = 0
+        self.closed = False
+        self.error: Optional[BaseException] = None
+        self._loop = loop
+        self._max_chars = max_chars
+        self._max_tokens = max_tokens
+        self._reader: Optional[asyncio.Future] = None
+        self._wake_on_any = False
+        self._writer: Optional[asyncio.Future] = None
+
+    def put(self, token: str) -> Optional[asyncio.Future]:
+        """Buffers a token; returns a future to await when the buffer is full."""
+        self.parts.append(token)
+        self.size += len(token)
+        if self._reader is not None and (self._wake_on_any or self.size >= self._max_chars):
+            self.wake_reader()
+        if len(self.parts) >= self._max_tokens:
+            self._writer = self._loop.create_future()
+            return self._writer
+        return None
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        self.closed = True
+        self.error = error
+        self.wake_reader()
+
+    def take(self) -> str:
+        text = "".join(self.parts)
+        self.parts, self.size = [], 0
+        writer, self._writer = self._writer, None
+        if writer is not None and not writer.done():
+            writer.set_result(None)
+        return text
+
+    async def wait(self, ticker: Optional[_FlushTicker] = None) -> None:
+        """Without ``ticker``: until any token is buffered. With it: until the window closes."""
+        if self.closed or (self.parts if ticker is None else self.size >= self._max_chars):
+            return
+        self._wake_on_any = ticker is None
+        self._reader = reader = self._loop.create_future()
+        if ticker is not None:
+            ticker.add(self)
+        try:
+            await reader
+        finally:
+            self._reader = None
+            if ticker is not None:
+                ticker.discard(self)
+
+    def wake_reader(self) -> None:
+        reader, self._reader = self._reader, None
+        if reader is not None and not reader.done():
+            reader.set_result(None)
+
+
+async def _pump(tokens: AsyncIterator[str], channel: _TokenChannel) -> None:
+    """Moves tokens from the upstream iterator into the channel."""
+    try:
+        async with aclosing(tokens) as stream:
+            async for token in stream:
+                if token:
+                    full = channel.put(token)
+                    if full is not None:
+                        await full
+    except Exception as e:
+        channel.close(e)
+        return
+    channel.close()
+
+
+async def coalesce_frames(
+    tokens: AsyncIterator[str],
+    max_chars: int = 1024,
+    max_delay: float = 0.02,
+    queue_size: int = 256,
+    encode: Callable[[str], Frame] = encode_text_frame,
+    on_delivered: Optional[Callable[[str], None]] = None,
+) -> AsyncGenerator[Frame, None]:
+    """Frames a token stream, packing as many tokens as possible into each frame.
+
+    The first frame is sent as soon as a token arrives (time to first token is what the
+    user sees). After that, text is held until ``max_chars`` are buffered or the flush
+    window closes, whichever comes first; windows are closed by a shared ticker every
+    ``max_delay`` seconds, so no text waits longer than that. Tokens that pile up while
+    the reader is busy always go out together, so a slow or overloaded reader gets
+    fewer, larger frames; a ``max_delay`` of 0 only does that. Text is never reordered
+    or split: whatever the upstream released (e.g. the guardrail scanner's safe text) is
+    delivered as-is, and pending text is flushed before an upstream error is re-raised.
+    Each frame is ``encode`` of the packed text (an SDK text part by default), and
+    ``on_delivered`` is called with that text once the reader has taken the frame and
+    asked for the next one, so text still buffered when the reader goes away is never
+    reported.
+
+    At most ``queue_size`` tokens are buffered; beyond that the upstream is not pulled
+    until the reader catches up. If the reader goes away (Starlette cancels the response
+    when the client disconnects, or the generator is closed) the upstream iterator is
+    closed right away, which cancels the model call, and the stream is counted in
+    ``stream_counters`` together with the tokens it left unsent.
+    """
+    loop = asyncio.get_running_loop()
+    channel = _TokenChannel(loop, max_chars, queue_size)
+    pump = loop.create_task(_pump(tokens, channel))
+    ticker = _flush_ticker(loop, max_delay) if max_delay > 0 else None
+    first = True
+    finished = False
+    try:
+        while True:
+            await channel.wait(None if first else ticker)
+            first = False
+            if channel.parts:
+                text = channel.take()
+                yield encode(text)
+                if on_delivered is not None:
+                    on_delivered(text)
+            elif channel.closed:
+                finished = True
+                if channel.error is not None:
+                    raise channel.error
+                return
+    finally:
+        # Reader went away (or we are done): stop pulling from upstream.
+        pump.cancel()
+        if not finished:
+            stream_counters.record_cancelled(len(channel.parts))
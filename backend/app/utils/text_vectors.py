@@ -0,0 +1,84 @@
+# backend/app/utils/text_vectors.py
+import re
+import unicodedata
+import zlib
+from typing import FrozenSet, Iterable, Sequence, Tuple
+
+import numpy as np
+
+_NON_WORD = re.compile(r"[^\w\s']+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """Canonical form used for caching/classification: NFKC, case-folded, no punctuation."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _NON_WORD.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+# Words that barely change what a prompt asks; everything else must match for a near-duplicate.
+_FUNCTION_WORDS = frozenset(
+    "a an the and or but so of to in on at for with from by as "
+    "is are was were be been am do does did can could would will should "
+    "i me my you your we us our it its this that there please".split()
+)
+
+
+def content_words(normalized: str) -> FrozenSet[str]:
+    """The words of a normalized prompt that carry its meaning (function words dropped)."""
+    return frozenset(word for word in normalized.split() if word not in _FUNCTION_WORDS)
+
+
+class HashedNgramEncoder:
+    """Dependency-light text encoder: hashed character n-grams plus word unigrams.
+
+    Features are hashed (crc32) into a fixed number of buckets with a sign bit to
+    reduce collision bias, then L2-normalized, so a dot product between two vectors
+    is their cosine similarity. Deterministic across processes and restarts.
+    """
+
+    def __init__(self, dim: int = 512, ngram_sizes: Tuple[int, ...] = (2, 3, 4), include_words: bool = True):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+        self.include_words = include_words
+
+    def features(self, normalized: str) -> Iterable[str]:
+        padded = f" {normalized} "
+        for size in self.ngram_sizes:
+            for start in range(len(padded) - size + 1):
+                yield padded[start:start + size]
+        if self.include_words:
+            for word in normalized.split():
+                yield "w:" + word
+
+    def encode(self, text: str, normalized: bool = False) -> np.ndarray:
+        if not normalized:
+            text = normalize_prompt(text)
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode()) for feature in self.features(text)), dtype=np.uint32
+        )
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if hashes.size:
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            vector = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim).astype(np.float32)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector
+
+    def encode_batch(self, texts: Sequence[str], normalized: bool = False) -> np.ndarray:
+        """Same rows as ``encode``; the whole batch is scattered with one bincount."""
+        per_text = [
+            [zlib.crc32(feature.encode()) for feature in self.features(text if normalized else normalize_prompt(text))]
+            for text in texts
+        ]
+        hashes = np.fromiter((h for features in per_text for h in features), dtype=np.uint32)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), [len(features) for features in per_text])
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        matrix = np.bincount(
+            rows * self.dim + hashes % self.dim, weights=signs, minlength=len(texts) * self.dim
+        ).astype(np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
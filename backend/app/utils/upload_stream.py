@@ -0,0 +1,157 @@
+# backend/app/utils/upload_stream.py
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+from python_multipart import MultipartParser
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import parse_options_header
+
+HEAD_BYTES = 32  # kept in memory for file-type sniffing
+
+
+class UploadRejected(Exception):
+    """The upload cannot be accepted; ``status_code`` and ``detail`` go back to the client."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass(frozen=True)
+class StreamedUpload:
+    """One file part of a multipart body, written to ``path`` while it was received."""
+
+    path: str
+    content_hash: str  # blake2b-128 of the file bytes, hex
+    size: int
+    filename: Optional[str]
+    content_type: Optional[str]
+    head: bytes
+
+
+class _FilePartSink:
+    """python-multipart callbacks that route one named file part to disk.
+
+    The parser runs on the event loop; it only collects the part's data. Hashing and
+    file I/O happen in a worker thread, once per received network chunk.
+    """
+
+    def __init__(self, field_name: str, max_bytes: int):
+        self.field_name = field_name
+        self.max_bytes = max_bytes
+        self.pending: List[bytes] = []
+        self.size = 0
+        self.head = b""
+        self.found = False
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self._in_file = False
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._part_type: Optional[bytes] = None
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self) -> None:
+        self._in_file = False
+        self._disposition = b""
+        self._part_type = None
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        name = self._header_name.lower()
+        if name == b"content-disposition":
+            self._disposition = self._header_value
+        elif name == b"content-type":
+            self._part_type = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        if options.get(b"name", b"").decode("utf-8", "replace") != self.field_name:
+            return  # other fields are skipped without being buffered
+        if b"filename" not in options:
+            raise UploadRejected(400, f"Field '{self.field_name}' must be a file.")
+        if self.found:
+            raise UploadRejected(400, f"Only one '{self.field_name}' file per upload.")
+        self.found = self._in_file = True
+        self.filename = options[b"filename"].decode("utf-8", "replace")
+        self.content_type = self._part_type.decode("latin-1") if self._part_type else None
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._in_file:
+            return
+        self.size += end - start
+        if self.size > self.max_bytes:
+            raise UploadRejected(413, f"Uploads may be at most {self.max_bytes} bytes.")
+        chunk = data[start:end]
+        if len(self.head) < HEAD_BYTES:
+            self.head += chunk[:HEAD_BYTES - len(self.head)]
+        self.pending.append(chunk)
+
+
+def _write_chunks(file, digest, chunks: List[bytes]) -> None:
+    for chunk in chunks:
+        digest.update(chunk)
+        file.write(chunk)
+
+
+async def stream_multipart_upload(
+    content_type: str,
+    chunks: AsyncIterator[bytes],
+    directory: str,
+    max_bytes: int,
+    field_name: str = "file",
+) -> StreamedUpload:
+    """Parses a multipart/form-data body as it arrives, streaming the ``field_name`` file to disk.
+
+    Memory use is bounded by one network chunk, whatever the file size. The caller owns
+    (and must remove) the returned file; on any error it has already been removed.
+    """
+    mime_type, params = parse_options_header(content_type)
+    if mime_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected(400, "Expected a multipart/form-data body.")
+    sink = _FilePartSink(field_name, max_bytes)
+    parser = MultipartParser(params[b"boundary"], sink.callbacks())
+    digest = hashlib.blake2b(digest_size=16)
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".upload")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            async for chunk in chunks:
+                parser.write(chunk)
+                if sink.pending:
+                    pending, sink.pending = sink.pending, []
+                    await asyncio.to_thread(_write_chunks, file, digest, pending)
+            parser.finalize()
+    except FormParserError:
+        os.unlink(path)
+        raise UploadRejected(400, "Invalid multipart data.")
+    except BaseException:
+        os.unlink(path)
+        raise
+    if not sink.found or not sink.size:
+        os.unlink(path)
+        raise UploadRejected(400, f"No '{field_name}' file in the upload.")
+    return StreamedUpload(
+        path=path, content_hash=digest.hexdigest(), size=sink.size,
+        filename=sink.filename, content_type=sink.content_type, head=sink.head,
+    )
@@ -0,0 +1,211 @@
+# backend/benchmarks/chat_load_benchmark.py
+"""Load test for /api/v1/chat against the local FAKE provider.
+
+Starts the API under uvicorn with LLM_SERVICE_PROVIDER=FAKE (or targets ``--url``) and
+drives it at rising concurrency levels. Each level runs ``--rounds`` sequential
+first-turn requests per simulated user and reports TTFT p50/p95/p99, end-to-end
+latency, streamed tokens/sec, server CPU per stream and server RSS growth. Results
+are written as JSON so runs can be diffed between commits.
+
+Usage (from backend/):
+    python -m benchmarks.chat_load_benchmark [--levels 1,10,50,100,200] [--output chat_load.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+FAKE_SERVER_ENV = {
+    "LLM_SERVICE_PROVIDER": "FAKE",
+    "LANGCHAIN_TRACING_V2": "false",
+    # Every request is a fresh session; keep the cache out of the measured path.
+    "RESPONSE_CACHE_ENABLED": "false",
+    # All load comes from one client IP.
+    "RATE_LIMIT_ENABLED": "false",
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+class ServerProcess:
+    """uvicorn running app.main:app in a child process, with CPU/RSS read from /proc."""
+
+    def __init__(self, env_overrides: Dict[str, str]):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = {**os.environ, **FAKE_SERVER_ENV, **env_overrides}
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning"],
+            env=env,
+        )
+
+    def wait_ready(self, timeout: float = 60.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Server exited during startup.")
+            try:
+                if httpx.get(f"{self.url}/ready", timeout=1.0).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("Server did not become ready in time.")
+
+    def cpu_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.process.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError):
+            return None
+
+    def rss_kb(self) -> Optional[int]:
+        try:
+            with open(f"/proc/{self.process.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return None
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+async def one_request(client: httpx.AsyncClient, url: str, prompt: str) -> dict:
+    payload = {"messages": [{"role": "user", "content": prompt}], "session_id": f"load-{uuid.uuid4().hex}"}
+    started = time.perf_counter()
+    ttft = None
+    body = b""
+    try:
+        async with client.stream("POST", f"{url}/api/v1/chat", json=payload) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return {"status": response.status_code}
+            async for chunk in response.aiter_raw():
+                if ttft is None and chunk:
+                    ttft = time.perf_counter() - started
+                body += chunk
+    except httpx.HTTPError as e:
+        return {"status": type(e).__name__}
+    text = "".join(json.loads(line[2:]) for line in body.decode().splitlines() if line.startswith("0:"))
+    return {"status": 200, "ttft": ttft, "latency": time.perf_counter() - started, "tokens": len(text.split())}
+
+
+async def run_level(url: str, concurrency: int, rounds: int, server: Optional[ServerProcess]) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0)) as client:
+        async def user(index: int) -> List[dict]:
+            return [await one_request(client, url, f"user {index} question {r} {uuid.uuid4().hex[:8]}")
+                    for r in range(rounds)]
+
+        cpu_before = server.cpu_seconds() if server else None
+        rss_before = server.rss_kb() if server else None
+        started = time.perf_counter()
+        results = [r for batch in await asyncio.gather(*(user(i) for i in range(concurrency))) for r in batch]
+        wall = time.perf_counter() - started
+        cpu_after = server.cpu_seconds() if server else None
+        rss_after = server.rss_kb() if server else None
+
+    ok = [r for r in results if r["status"] == 200]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    ttfts = [r["ttft"] * 1000 for r in ok if r["ttft"] is not None]
+    latencies = [r["latency"] * 1000 for r in ok]
+    tokens = sum(r["tokens"] for r in ok)
+    cpu = (cpu_after - cpu_before) if cpu_before is not None and cpu_after is not None else None
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "statuses": statuses,
+        "wall_s": wall,
+        "ttft_ms": {"p50": percentile(ttfts, 50), "p95": percentile(ttfts, 95), "p99": percentile(ttfts, 99)},
+        "latency_ms": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "p99": percentile(latencies, 99)},
+        "tokens_per_s": tokens / wall if wall else 0.0,
+        "cpu_ms_per_stream": (cpu / len(ok) * 1000) if cpu is not None and ok else None,
+        "rss_kb_before": rss_before,
+        "rss_growth_kb": (rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+    }
+
+
+def fmt(value: Optional[float], spec: str = ".1f") -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,10,50,100,200", help="comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=3, help="sequential requests per simulated user")
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra settings for the spawned server, e.g. FAKE_LLM_TTFT_MS=500")
+    parser.add_argument("--output", default="chat_load_results.json")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    env_overrides = dict(item.split("=", 1) for item in args.server_env)
+    server = None
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        server = ServerProcess(env_overrides)
+        url = server.url
+    try:
+        if server:
+            server.wait_ready()
+        print(f"{'conc':>5} | {'reqs':>5} | {'ok':>5} | {'TTFT p50':>9} | {'p95':>7} | {'p99':>7} | "
+              f"{'tok/s':>8} | {'CPU ms/stream':>13} | {'RSS +KB':>8}")
+        results = []
+        for concurrency in levels:
+            level = asyncio.run(run_level(url, concurrency, args.rounds, server))
+            results.append(level)
+            print(f"{concurrency:>5} | {level['requests']:>5} | {level['statuses'].get('200', 0):>5} | "
+                  f"{fmt(level['ttft_ms']['p50']):>9} | {fmt(level['ttft_ms']['p95']):>7} | "
+                  f"{fmt(level['ttft_ms']['p99']):>7} | {level['tokens_per_s']:>8.0f} | "
+                  f"{fmt(level['cpu_ms_per_stream'], '.2f'):>13} | {fmt(level['rss_growth_kb'], 'd'):>8}")
+    finally:
+        if server:
+            server.stop()
+
+    report = {
+        "benchmark": "chat_load",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "target": "spawned" if server else url,
+        "server_env": {**FAKE_SERVER_ENV, **env_overrides} if server else None,
+        "rounds": args.rounds,
+        "levels": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+# backend/benchmarks/conversation_replay.py
+"""Replays recorded multi-turn conversations against the chat API.
+
+Transcripts are JSONL, one conversation per line::
+
+    {"id": "c1", "character_id": "chandler", "turns": [
+        {"content": "hi"}, {"content": "what's up?", "think_ms": 1500}, "plain strings work too"]}
+
+Each conversation runs in its own session, turn after turn, sending the growing message
+list the frontend would send and waiting ``think_ms`` (scaled by ``--think-scale``)
+before each turn. ``--concurrency`` conversations run at once. The app is driven
+in-process (default; LLM_SERVICE_PROVIDER=FAKE unless overridden with ``--env``) or over
+HTTP with ``--url``. The report gives TTFT and latency percentiles per turn index, which
+shows how growing history affects latency, and is written as JSON; ``--baseline`` (or
+``--compare OLD NEW``) prints the per-turn change between two runs, e.g. across commits.
+
+Usage (from backend/):
+    python -m benchmarks.conversation_replay benchmarks/transcripts/sample.jsonl \\
+        [--concurrency 20] [--repeat 5] [--think-scale 0.1] [--output replay.json] [--baseline old.json]
+    python -m benchmarks.conversation_replay --compare old.json new.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.chat_load_benchmark import FAKE_SERVER_ENV, fmt, percentile
+
+CHAT_PATH = "/api/v1/chat"
+
+
+@dataclass
+class Turn:
+    content: str
+    think_ms: float = 0.0
+    image_context_notes: Optional[str] = None
+
+
+@dataclass
+class Conversation:
+    id: str
+    turns: List[Turn]
+    character_id: Optional[str] = None
+
+
+def load_transcripts(path: str) -> List[Conversation]:
+    conversations = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            turns = [Turn(content=t) if isinstance(t, str) else Turn(
+                content=t["content"], think_ms=float(t.get("think_ms", 0.0)),
+                image_context_notes=t.get("image_context_notes"),
+            ) for t in record["turns"]]
+            conversations.append(Conversation(
+                id=str(record.get("id", line_no)), turns=turns, character_id=record.get("character_id")))
+    return conversations
+
+
+class HTTPTarget:
+    """A running server, reached over HTTP."""
+
+    def __init__(self, url: str, concurrency: int):
+        self.url = url.rstrip("/")
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        self._client = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0))
+
+    async def __aenter__(self) -> "HTTPTarget":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
+
+    async def post(self, path: str, payload: dict) -> Tuple[int, AsyncIterator[bytes]]:
+        request = self._client.build_request("POST", self.url + path, json=payload)
+        response = await self._client.send(request, stream=True)
+
+        async def body() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await response.aclose()
+
+        return response.status_code, body()
+
+
+class InProcessTarget:
+    """The ASGI app called directly, with its lifespan run around the replay.
+
+    Unlike httpx's ASGITransport, the body is observed chunk by chunk as the app sends
+    it, so time to first token means the same thing as over HTTP.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lifespan = None
+
+    async def __aenter__(self) -> "InProcessTarget":
+        self._lifespan = self.app.router.lifespan_context(self.app)
+        await self._lifespan.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._lifespan.__aexit__(*exc_info)
+
+    async def post(self, path: str, payload: dict) -> Tuple[int, AsyncIterator[bytes]]:
+        body = json.dumps(payload).encode()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 0), "server": ("replay", 80),
+        }
+        chunks: asyncio.Queue = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+        finished = asyncio.Event()
+        request_sent = False
+
+        async def receive() -> dict:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                started.set_result(message["status"])
+            elif message["type"] == "http.response.body":
+                if message.get("body"):
+                    chunks.put_nowait(message["body"])
+                if not message.get("more_body", False):
+                    finished.set()
+
+        async def run() -> None:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                finished.set()
+                chunks.put_nowait(None)
+                if not started.done():
+                    started.set_result(500)
+
+        task = asyncio.create_task(run())
+
+        async def stream() -> AsyncIterator[bytes]:
+            try:
+                while (chunk := await chunks.get()) is not None:
+                    yield chunk
+            finally:
+                finished.set()
+                await task
+
+        return await started, stream()
+
+
+async def replay_turn(target, payload: dict) -> dict:
+    started = time.perf_counter()
+    ttft = None
+    body = b""
+    try:
+        status, chunks = await target.post(CHAT_PATH, payload)
+        async for chunk in chunks:
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            body += chunk
+    except (httpx.HTTPError, OSError) as e:
+        return {"status": type(e).__name__, "reply": ""}
+    reply = "".join(json.loads(line[2:]) for line in body.decode().splitlines() if line.startswith("0:"))
+    return {"status": status, "ttft": ttft, "latency": time.perf_counter() - started, "reply": reply}
+
+
+async def replay_conversation(target, conversation: Conversation, session_id: str, think_scale: float) -> List[dict]:
+    messages: List[dict] = []
+    results = []
+    for index, turn in enumerate(conversation.turns):
+        if index and turn.think_ms and think_scale:
+            await asyncio.sleep(turn.think_ms / 1000 * think_scale)
+        messages.append({"role": "user", "content": turn.content})
+        payload = {"messages": messages, "session_id": session_id,
+                   "character_id": conversation.character_id, "image_context_notes": turn.image_context_notes}
+        result = await replay_turn(target, payload)
+        messages.append({"role": "assistant", "content": result.pop("reply")})
+        results.append({"conversation": conversation.id, "session_id": session_id, "turn": index, **result})
+        if result["status"] != 200:
+            break  # later turns would replay against a history the recording never had
+    return results
+
+
+async def replay(target, conversations: List[Conversation], concurrency: int, repeat: int,
+                 think_scale: float) -> Tuple[List[dict], float]:
+    """Replays every conversation ``repeat`` times, ``concurrency`` at a time; returns turn results and wall time."""
+    run_id = uuid.uuid4().hex[:8]
+    pending = iter(itertools.product(range(repeat), conversations))
+    results: List[dict] = []
+
+    async def worker() -> None:
+        for copy, conversation in pending:
+            session_id = f"replay-{run_id}-{conversation.id}-{copy}"
+            results.extend(await replay_conversation(target, conversation, session_id, think_scale))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return results, time.perf_counter() - started
+
+
+def summarize(results: List[dict], wall: float) -> dict:
+    by_turn: Dict[int, List[dict]] = {}
+    for result in results:
+        by_turn.setdefault(result["turn"], []).append(result)
+    turns = []
+    for index in sorted(by_turn):
+        ok = [r for r in by_turn[index] if r["status"] == 200]
+        ttfts = [r["ttft"] * 1000 for r in ok if r["ttft"] is not None]
+        latencies = [r["latency"] * 1000 for r in ok]
+        turns.append({
+            "turn": index,
+            "requests": len(by_turn[index]),
+            "errors": len(by_turn[index]) - len(ok),
+            "ttft_ms": {"p50": percentile(ttfts, 50), "p95": percentile(ttfts, 95)},
+            "latency_ms": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95)},
+        })
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+    return {
+        "turns_sent": len(results),
+        "statuses": statuses,
+        "wall_s": wall,
+        "turns_per_s": len(results) / wall if wall else 0.0,
+        "by_turn": turns,
+    }
+
+
+def compare_reports(baseline: dict, current: dict) -> List[dict]:
+    """Per-turn-index change in p50/p95 latency and TTFT (ms and %) from ``baseline`` to ``current``."""
+    old = {row["turn"]: row for row in baseline["summary"]["by_turn"]}
+    rows = []
+    for row in current["summary"]["by_turn"]:
+        before = old.get(row["turn"])
+        if before is None:
+            continue
+        delta = {"turn": row["turn"]}
+        for metric in ("ttft_ms", "latency_ms"):
+            for pct in ("p50", "p95"):
+                a, b = before[metric][pct], row[metric][pct]
+                delta[f"{metric}_{pct}"] = None if a is None or b is None else b - a
+                delta[f"{metric}_{pct}_pct"] = None if not a or b is None else (b - a) / a * 100
+        rows.append(delta)
+    return rows
+
+
+def print_summary(summary: dict) -> None:
+    print(f"{summary['turns_sent']} turns in {summary['wall_s']:.1f}s ({summary['turns_per_s']:.1f} turns/s); "
+          f"statuses {summary['statuses']}")
+    print(f"{'turn':>4} | {'reqs':>5} | {'err':>4} | {'TTFT p50':>9} | {'p95':>7} | {'latency p50':>11} | {'p95':>7}")
+    for row in summary["by_turn"]:
+        print(f"{row['turn']:>4} | {row['requests']:>5} | {row['errors']:>4} | {fmt(row['ttft_ms']['p50']):>9} | "
+              f"{fmt(row['ttft_ms']['p95']):>7} | {fmt(row['latency_ms']['p50']):>11} | {fmt(row['latency_ms']['p95']):>7}")
+
+
+def print_comparison(baseline: dict, current: dict) -> None:
+    print(f"\nChange from {baseline.get('commit') or 'baseline'} to {current.get('commit') or 'current'} "
+          "(ms, % of baseline):")
+    print(f"{'turn':>4} | {'TTFT p50':>16} | {'TTFT p95':>16} | {'latency p50':>16} | {'latency p95':>16}")
+    for row in compare_reports(baseline, current):
+        cells = [f"{fmt(row[key], '+.1f')} ({fmt(row[key + '_pct'], '+.0f')}%)"
+                 for key in ("ttft_ms_p50", "ttft_ms_p95", "latency_ms_p50", "latency_ms_p95")]
+        print(f"{row['turn']:>4} | " + " | ".join(f"{cell:>16}" for cell in cells))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, conversations: List[Conversation]) -> Tuple[List[dict], float]:
+    if args.url:
+        target = HTTPTarget(args.url, args.concurrency)
+    else:
+        # Settings are read at import time, so the app is only imported once the env is set.
+        from app.main import app
+        target = InProcessTarget(app)
+    async with target:
+        return await replay(target, conversations, args.concurrency, args.repeat, args.think_scale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("transcripts", nargs="?", help="JSONL file, one conversation per line")
+    parser.add_argument("--url", help="replay over HTTP against a running server instead of in-process")
+    parser.add_argument("--concurrency", type=int, default=10, help="conversations replayed at once")
+    parser.add_argument("--repeat", type=int, default=1, help="replay every conversation this many times")
+    parser.add_argument("--think-scale", type=float, default=1.0,
+                        help="multiplier for recorded think times (0 = send turns back to back)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="settings for the in-process app, e.g. FAKE_LLM_TTFT_MS=500")
+    parser.add_argument("--output", default="replay_results.json")
+    parser.add_argument("--baseline", help="earlier report to compare this run against")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="only compare two saved reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as f:
+                reports.append(json.load(f))
+        print_comparison(*reports)
+        return
+    if not args.transcripts:
+        parser.error("a transcripts file is required unless --compare is given")
+
+    env_overrides = dict(item.split("=", 1) for item in args.env)
+    if not args.url:
+        os.environ.update({**FAKE_SERVER_ENV, "LLM_WARMUP_ON_STARTUP": "true", **env_overrides})
+    conversations = load_transcripts(args.transcripts)
+    results, wall = asyncio.run(run(args, conversations))
+    summary = summarize(results, wall)
+    print_summary(summary)
+
+    report = {
+        "benchmark": "conversation_replay",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "target": args.url or "in-process",
+        "env": None if args.url else {**FAKE_SERVER_ENV, **env_overrides},
+        "transcripts": args.transcripts,
+        "conversations": len(conversations),
+        "concurrency": args.concurrency,
+        "repeat": args.repeat,
+        "think_scale": args.think_scale,
+        "summary": summary,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
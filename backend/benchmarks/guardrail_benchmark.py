@@ -0,0 +1,75 @@
+# backend/benchmarks/guardrail_benchmark.py
+"""Compares the compiled guardrail automaton with the previous per-keyword loops.
+
+Usage (from backend/):
+    python -m benchmarks.guardrail_benchmark [--iterations 200]
+"""
+import argparse
+import random
+import string
+import time
+
+from app.services.guardrail_engine import GuardrailEngine, OUTPUT_CATEGORIES, OUTPUT_DENYLIST
+
+SAMPLE_REPLY = (
+    "Oh, I'm sorry, did my sarcasm hit you in the face? Could I BE any more tired of "
+    "statistical analysis and data reconfiguration? Joey ate the last of the cheesecake, "
+    "Monica is re-alphabetizing the spice rack, and I'm here talking to you. "
+) * 3
+
+AI_PHRASES = ["as an ai language model", "as a large language model", "i am an ai", "i'm an ai", "i am a language model"]
+
+
+def legacy_check(text: str, keywords) -> bool:
+    """The pre-automaton implementation: lower() + `in` for every keyword."""
+    lower_text = text.lower()
+    for keyword in keywords:
+        if keyword.lower() in lower_text:
+            return True
+    for phrase in AI_PHRASES:
+        if phrase in lower_text:
+            return True
+    return False
+
+
+def make_terms(count: int, rng: random.Random):
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(2000)]
+    return [" ".join(rng.choices(words, k=rng.randint(1, 3))) for _ in range(count)]
+
+
+def time_call(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    print(f"Text length: {len(SAMPLE_REPLY)} chars; streaming buffer: 50 chars")
+    print(f"{'terms':>7} | {'legacy full':>12} | {'engine full':>12} | {'legacy 50ch':>12} | {'engine 50ch':>12} | {'states':>8}")
+    for count in (10, 1_000, 10_000):
+        terms = make_terms(count, rng)
+        build_started = time.perf_counter()
+        engine = GuardrailEngine({OUTPUT_DENYLIST: terms, "ai_self_reference": AI_PHRASES})
+        build_ms = (time.perf_counter() - build_started) * 1000
+        buffer = SAMPLE_REPLY[-50:]
+
+        assert legacy_check(SAMPLE_REPLY, terms) == (engine.find(SAMPLE_REPLY, OUTPUT_CATEGORIES) is not None)
+        legacy_full = time_call(lambda: legacy_check(SAMPLE_REPLY, terms), args.iterations)
+        engine_full = time_call(lambda: engine.find(SAMPLE_REPLY, OUTPUT_CATEGORIES), args.iterations)
+        legacy_buffer = time_call(lambda: legacy_check(buffer, terms), args.iterations)
+        engine_buffer = time_call(lambda: engine.find(buffer, OUTPUT_CATEGORIES), args.iterations)
+        print(
+            f"{count:>7} | {legacy_full:>10.1f}us | {engine_full:>10.1f}us | "
+            f"{legacy_buffer:>10.1f}us | {engine_buffer:>10.1f}us | {engine.state_count:>8}"
+            f"   (compile {build_ms:.0f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
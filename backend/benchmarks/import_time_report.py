@@ -0,0 +1,110 @@
+# backend/benchmarks/import_time_report.py
+"""Cold-import profile of the API module, as a serverless cold start would pay it.
+
+Each run imports ``--module`` in a fresh interpreter with ``-X importtime`` and reports
+the wall time of the import, the slowest modules (self and cumulative), time per
+top-level package, and whether any of the lazily loaded heavy packages got imported.
+
+Usage (from backend/):
+    python -m benchmarks.import_time_report [--module app.main] [--runs 5] [--top 15] [--json report.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+# Only needed once a request reaches the model; importing any of them at startup is a regression.
+LAZY_PACKAGES = (
+    "langchain", "langchain_core", "langchain_community", "langchain_google_genai",
+    "langsmith", "google.generativeai", "google.ai", "numpy",
+)
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+_PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+modules = sorted(sys.modules)
+import json
+# One write, so the line cannot interleave with records from the background log writer.
+sys.stdout.write("IMPORT_PROBE " + json.dumps([elapsed, modules]) + "\\n")
+"""
+
+
+def cold_import(module: str, importtime: bool = False) -> dict:
+    """Imports ``module`` in a fresh interpreter; returns seconds, loaded modules and -X importtime rows."""
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _PROBE.format(module=module)]
+    result = subprocess.run(args, capture_output=True, text=True,
+                            cwd=os.path.join(os.path.dirname(__file__), ".."))
+    probe = next((line for line in result.stdout.splitlines() if line.startswith("IMPORT_PROBE ")), None)
+    if result.returncode != 0 or probe is None:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    seconds, modules = json.loads(probe[len("IMPORT_PROBE "):])
+    rows = [
+        {"module": m.group(4), "self_us": int(m.group(1)), "cumulative_us": int(m.group(2)), "depth": len(m.group(3)) // 2}
+        for m in map(_LINE.match, result.stderr.splitlines()) if m
+    ]
+    return {"seconds": seconds, "modules": modules, "rows": rows}
+
+
+def lazy_packages_loaded(modules: List[str]) -> List[str]:
+    loaded = set(modules)
+    return [p for p in LAZY_PACKAGES if p in loaded]
+
+
+def by_package(rows: List[dict]) -> Dict[str, int]:
+    totals: Dict[str, int] = defaultdict(int)
+    for row in rows:
+        totals[row["module"].split(".")[0]] += row["self_us"]
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5, help="timed cold imports (without -X importtime)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", dest="json_path", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    cold_import(args.module)  # populate __pycache__ so runs measure imports, not compilation
+    timings = [cold_import(args.module)["seconds"] * 1000 for _ in range(args.runs)]
+    profile = cold_import(args.module, importtime=True)
+    rows = profile["rows"]
+    lazy_loaded = lazy_packages_loaded(profile["modules"])
+
+    print(f"Cold import of {args.module}: median {statistics.median(timings):.1f} ms, "
+          f"min {min(timings):.1f} ms over {args.runs} runs; {len(profile['modules'])} modules loaded")
+    print(f"\nTop {args.top} by cumulative time:")
+    for row in sorted(rows, key=lambda r: -r["cumulative_us"])[:args.top]:
+        print(f"  {row['cumulative_us'] / 1000:8.1f} ms  {row['module']}")
+    print(f"\nTop {args.top} by self time:")
+    for row in sorted(rows, key=lambda r: -r["self_us"])[:args.top]:
+        print(f"  {row['self_us'] / 1000:8.1f} ms  {row['module']}")
+    packages = by_package(rows)
+    print("\nSelf time by top-level package:")
+    for package, micros in list(packages.items())[:args.top]:
+        print(f"  {micros / 1000:8.1f} ms  {package}")
+    print(f"\nLazily loaded packages imported at startup: {', '.join(lazy_loaded) or 'none'}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({
+                "module": args.module,
+                "python": sys.version.split()[0],
+                "import_ms": timings,
+                "lazy_packages_loaded": lazy_loaded,
+                "packages_self_ms": {p: us / 1000 for p, us in packages.items()},
+                "modules": rows,
+            }, f, indent=2)
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# backend/benchmarks/moderation_benchmark.py
+"""Throughput of the local moderation classifier, direct and through the micro-batcher.
+
+``direct`` scores batches of ``--batch-sizes`` messages with one call each; ``concurrent``
+submits that many messages at once from separate coroutines, as concurrent requests
+would, and lets the micro-batcher group them.
+
+Usage (from backend/):
+    python -m benchmarks.moderation_benchmark [--batch-sizes 1,8,64,256] [--messages 4096]
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+from app.core.guardrails_config import MODERATION_ALLOWED_EXAMPLES, MODERATION_FLAGGED_EXAMPLES
+from app.services.moderation_classifier import MicroBatcher, load_moderation_model
+
+
+def direct_us(model, messages, batch_size: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, len(messages), batch_size):
+        model.score_batch(messages[start:start + batch_size])
+    return (time.perf_counter() - started) / len(messages) * 1e6
+
+
+async def concurrent_us(model, messages, batch_size: int, max_delay: float) -> tuple:
+    batcher = MicroBatcher(model.score_batch, max_batch=batch_size, max_delay=max_delay)
+    started = time.perf_counter()
+    for start in range(0, len(messages), batch_size):
+        await asyncio.gather(*(batcher.score(text) for text in messages[start:start + batch_size]))
+    elapsed = time.perf_counter() - started
+    return elapsed / len(messages) * 1e6, batcher.items / max(batcher.batches, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", default="1,8,64,256")
+    parser.add_argument("--messages", type=int, default=4096)
+    parser.add_argument("--max-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    model = load_moderation_model()
+    corpus = MODERATION_FLAGGED_EXAMPLES + MODERATION_ALLOWED_EXAMPLES
+    messages = [f"{text} #{i}" for i, text in zip(range(args.messages), itertools.cycle(corpus))]
+    print(f"{'batch':>5} | {'direct us/msg':>13} | {'msgs/s':>8} | {'concurrent us/msg':>17} | {'mean batch':>10}")
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        direct = direct_us(model, messages, batch_size)
+        concurrent, mean_batch = asyncio.run(concurrent_us(model, messages, batch_size, args.max_delay_ms / 1000))
+        print(f"{batch_size:>5} | {direct:>13.1f} | {1e6 / direct:>8.0f} | {concurrent:>17.1f} | {mean_batch:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# backend/benchmarks/prompt_assembly_benchmark.py
+"""Per-turn prompt assembly cost as a conversation grows.
+
+For each history length in ``--turns`` the conversation is extended one turn at a time
+and each turn's prompt is built two ways: the template path (``character.prompt``
+renders the system prompt and re-materializes the history, then every message is
+encoded into the provider payload) and the incremental path (``PromptAssembler`` plus
+the shared per-message encoding cache). The incremental cost should stay flat as the
+history grows; the template path grows linearly.
+
+Usage (from backend/):
+    python -m benchmarks.prompt_assembly_benchmark [--turns 10,100,1000] [--samples 200]
+"""
+import argparse
+import json
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services.character_registry import character_registry
+from app.services.prompt_assembly import PromptAssembler
+
+USER_LINE = "So what do you actually do at work all day, in one sentence?"
+REPLY_LINE = "Could I BE any more vague about it? Statistical analysis and data reconfiguration, apparently."
+ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def template_turn(character, history, user_input) -> bytes:
+    messages = character.prompt.format_messages(chat_history=history, user_input_combined=user_input)
+    return json.dumps([{"role": ROLES.get(m.type, "user"), "content": str(m.content)} for m in messages]).encode()
+
+
+def incremental_turn(assembler, character, history, user_input) -> bytes:
+    return assembler.encode_messages(assembler.assemble(character, "bench", history, user_input))
+
+
+def measure(build, turns: int, samples: int) -> float:
+    """Mean microseconds per turn over ``samples`` turns, starting at a history of ``turns`` turns."""
+    history = []
+    for index in range(turns):
+        history += [HumanMessage(content=f"{USER_LINE} #{index}"), AIMessage(content=f"{REPLY_LINE} #{index}")]
+    build(history, USER_LINE)  # first turn of the session pays for the existing history
+    elapsed = 0.0
+    for index in range(samples):
+        user_input = f"{USER_LINE} (turn {turns + index})"
+        started = time.perf_counter()
+        build(history, user_input)
+        elapsed += time.perf_counter() - started
+        history += [HumanMessage(content=user_input), AIMessage(content=REPLY_LINE)]
+    return elapsed / samples * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", default="10,100,1000", help="comma-separated history lengths, in turns")
+    parser.add_argument("--samples", type=int, default=200, help="turns timed at each length")
+    args = parser.parse_args()
+
+    character = character_registry.get()
+    print(f"{'turns':>6} | {'template us/turn':>16} | {'incremental us/turn':>19} | {'speed-up':>8}")
+    for turns in (int(t) for t in args.turns.split(",")):
+        template_us = measure(lambda h, u: template_turn(character, h, u), turns, args.samples)
+        assembler = PromptAssembler()
+        incremental_us = measure(lambda h, u: incremental_turn(assembler, character, h, u), turns, args.samples)
+        print(f"{turns:>6} | {template_us:>16.1f} | {incremental_us:>19.1f} | {template_us / incremental_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# backend/benchmarks/stream_framing_benchmark.py
+"""Compares per-token SDK framing with coalesced framing across many concurrent streams.
+
+Each simulated stream emits ``--tokens`` tokens, ``--tokens-per-read`` at a time every
+``--read-interval-ms``, and is served through Starlette's StreamingResponse; the ASGI
+``send`` applies HTTP chunked encoding and sends each body chunk over a local socket
+(drained by a reader thread), so every chunk costs a real syscall, as it would on the
+uvicorn transport.
+A "source" run that only drains the token generators is the baseline; "framing CPU" is
+what each mode adds on top of it.
+
+Usage (from backend/):
+    python -m benchmarks.stream_framing_benchmark [--streams 1000] [--tokens 200]
+"""
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+from starlette.responses import StreamingResponse
+
+from app.utils.stream_framing import coalesce_frames, orjson
+
+WORDS = "Could I BE any more tired of statistical analysis and data reconfiguration ? ".split(" ")
+
+
+class Pacer:
+    """Releases every stream's next token once per interval, like chunks arriving off the
+    network, with one timer for all streams instead of a sleep per stream."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.event = asyncio.Event()
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            event, self.event = self.event, asyncio.Event()
+            event.set()
+
+
+async def token_source(tokens: int, pacer: Pacer, tokens_per_read: int):
+    for index in range(tokens):
+        if index % tokens_per_read == 0:
+            await pacer.event.wait()
+        yield WORDS[index % len(WORDS)] + " "
+
+
+async def per_token_frames(tokens):
+    """The previous chat.py path: json.dumps + f-string per token, encoded by the server."""
+    async for token in tokens:
+        if token is not None:
+            yield f"0:{json.dumps(token)}\n".encode()
+
+
+def read_until_closed(peer: socket.socket) -> None:
+    with peer:
+        while peer.recv(1 << 20):
+            pass
+
+
+SCOPE = {"type": "http", "asgi": {"spec_version": "2.4"}}
+
+
+async def consume(frames, sink: socket.socket) -> int:
+    writes = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal writes
+        body = message.get("body")
+        if body:
+            writes += 1
+            sink.send(b"%x\r\n%b\r\n" % (len(body), body))
+
+    await StreamingResponse(frames, media_type="text/plain")(SCOPE, receive, send)
+    return writes
+
+
+async def drain(tokens, sink: socket.socket) -> int:
+    async for _token in tokens:
+        pass
+    return 0
+
+
+async def run(mode: str, streams: int, tokens: int, tokens_per_read: int, interval: float, max_delay: float):
+    pacer = Pacer(interval)
+
+    def frames():
+        source = token_source(tokens, pacer, tokens_per_read)
+        if mode == "source":
+            return source
+        if mode == "per-token":
+            return per_token_frames(source)
+        return coalesce_frames(source, max_delay=max_delay)
+
+    sink, peer = socket.socketpair()
+    reader = threading.Thread(target=read_until_closed, args=(peer,), daemon=True)
+    reader.start()
+    pacing = asyncio.create_task(pacer.run())
+    try:
+        cpu_started = time.process_time()
+        wall_started = time.perf_counter()
+        serve = drain if mode == "source" else consume
+        writes = await asyncio.gather(*(serve(frames(), sink) for _ in range(streams)))
+        wall = time.perf_counter() - wall_started
+        cpu = time.process_time() - cpu_started
+    finally:
+        pacing.cancel()
+        sink.close()
+        reader.join()
+    return sum(writes), wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=1000)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--tokens-per-read", type=int, default=4,
+                        help="tokens delivered per upstream read (SSE events often carry several)")
+    parser.add_argument("--read-interval-ms", type=float, default=20.0)
+    parser.add_argument("--max-delay-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    interval = args.read_interval_ms / 1000
+    print(f"{args.streams} streams x {args.tokens} tokens, {args.tokens_per_read} tokens every "
+          f"{args.read_interval_ms} ms; "
+          f"encoder: {'orjson' if orjson is not None else 'stdlib'}")
+    print(f"{'mode':>10} | {'chunks':>9} | {'chunks/s':>10} | {'wall s':>7} | {'CPU s':>7} | "
+          f"{'CPU ms/stream':>13} | {'framing CPU ms/stream':>21}")
+    baseline = None
+    for mode in ("source", "per-token", "coalesced"):
+        chunks, wall, cpu = asyncio.run(run(mode, args.streams, args.tokens, args.tokens_per_read, interval, args.max_delay_ms / 1000))
+        baseline = cpu if baseline is None else baseline
+        print(f"{mode:>10} | {chunks:>9} | {chunks / wall:>10.0f} | {wall:>7.2f} | {cpu:>7.2f} | "
+              f"{cpu / args.streams * 1000:>13.3f} | {(cpu - baseline) / args.streams * 1000:>21.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -91,14 +91,17 @@ def test_handle_chat_streaming_success(
         expected_call_args = {
             "user_input": "Hello there",
             "image_notes": None,
-            "conversation_id": "test_session_123"
+            "conversation_id": "test_session_123",
+            "character_id": "chandler"
         }
         # Assertion now targets the MagicMock wrapping the async generator
         method_to_check = \
             mock_llm_service.async_generate_streaming_response
-        method_to_check.assert_called_once_with(
-            **expected_call_args
-        )
+        method_to_check.assert_called_once()
+        call_kwargs = dict(method_to_check.call_args.kwargs)
+        # The framing layer reports every frame it sent back to the service.
+        assert "".join(call_kwargs.pop("delivered_parts")) == expected_full_message
+        assert call_kwargs == expected_call_args
 
     app_fixture.dependency_overrides = {} 
 
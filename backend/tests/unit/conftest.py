@@ -0,0 +1,27 @@
+import itertools
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from app.core.config import settings
+from app.services import llm_providers, llm_service as llm_service_module
+from app.services.session_store import session_store
+
+
+@pytest.fixture
+def fake_llm_service(monkeypatch):
+    """An LLMService whose Gemini client is replaced by a scripted fake chat model.
+
+    Replies are "Reply 1 from Chandler.", "Reply 2 from Chandler.", ...; the model
+    instance is exposed as ``service.llm`` so tests can inspect or swap its replies.
+    """
+    monkeypatch.setattr(settings, "GOOGLE_API_KEY", "test-key")
+    replies = (AIMessage(content=f"Reply {i} from Chandler.") for i in itertools.count(1))
+    monkeypatch.setattr(
+        llm_providers, "ChatGoogleGenerativeAI",
+        lambda **kwargs: GenericFakeChatModel(messages=replies),
+    )
+    yield llm_service_module.LLMService()
+    for session_id in list(session_store._entries):
+        session_store.delete(session_id)
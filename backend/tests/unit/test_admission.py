@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.api.v1.endpoints import chat as chat_module
+from app.main import app
+from app.services import llm_service as llm_service_module
+from app.services.admission import AdmissionController, AdmissionRejected, guard_stream
+from app.services.history_shaping import SummaryDeferred
+
+
+async def test_turns_of_one_session_run_in_arrival_order():
+    controller = AdmissionController(max_in_flight=10)
+    order = []
+
+    async def turn(name):
+        ticket = await controller.admit("s1")
+        order.append(name)
+        await asyncio.sleep(0.01)
+        order.append(name + " done")
+        ticket.release()
+
+    await asyncio.gather(turn("a"), turn("b"), turn("c"))
+
+    assert order == ["a", "a done", "b", "b done", "c", "c done"]
+    assert controller.stats()["sessions"] == 0
+
+
+async def test_global_cap_queues_then_rejects_fast_when_wait_queue_is_full():
+    controller = AdmissionController(max_in_flight=1, max_waiting=1)
+    first = await controller.admit("s1")
+    second = asyncio.create_task(controller.admit("s2"))
+    await asyncio.sleep(0)
+    assert controller.waiting == 1
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.admit("s3")
+    assert rejected.value.status_code == 503
+    assert rejected.value.retry_after >= 1
+
+    first.release()
+    (await second).release()
+    stats = controller.stats()
+    assert stats["in_flight"] == 0
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == {"queue_full": 1}
+    assert stats["queue_time_ms"]["max"] > 0
+
+
+async def test_waiting_too_long_is_rejected_and_frees_the_wait_slot():
+    controller = AdmissionController(max_in_flight=1, max_waiting=4, max_wait_seconds=0.02)
+    held = await controller.admit("s1")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.admit("s2")
+    assert (rejected.value.reason, rejected.value.status_code) == ("wait_timeout", 503)
+    assert controller.waiting == 0
+    held.release()
+    assert controller.in_flight == 0
+
+
+async def test_too_many_pending_turns_for_one_session_get_429():
+    controller = AdmissionController(max_pending_per_session=2)
+    running = await controller.admit("s1")
+    queued = asyncio.create_task(controller.admit("s1"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.admit("s1")
+    assert rejected.value.status_code == 429
+
+    running.release()
+    (await queued).release()
+
+
+async def test_cancelled_waiter_does_not_leak_its_slot():
+    controller = AdmissionController(max_in_flight=1)
+    held = await controller.admit("s1")
+    waiter = asyncio.create_task(controller.admit("s2"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    held.release()
+
+    assert controller.in_flight == 0
+    assert controller.waiting == 0
+    (await controller.admit("s3")).release()
+
+
+async def test_batch_turns_hold_at_most_their_share_and_leave_slots_to_interactive():
+    controller = AdmissionController(max_in_flight=3, max_batch_in_flight=1)
+    first = await controller.admit("b1", batch=True)
+    second = asyncio.create_task(controller.admit("b2", batch=True))
+    await asyncio.sleep(0)
+    assert controller.stats()["batch_waiting"] == 1
+
+    interactive = await asyncio.wait_for(controller.admit("i1"), 0.1)
+    assert controller.in_flight == 2
+
+    first.release()
+    (await second).release()
+    interactive.release()
+    assert controller.stats()["batch_in_flight"] == controller.in_flight == 0
+
+
+async def test_try_admit_only_takes_idle_capacity():
+    controller = AdmissionController(max_in_flight=2, max_batch_in_flight=1)
+    background = controller.try_admit("summary", batch=True)
+    assert background is not None
+    assert controller.try_admit("summary", batch=True) is None  # batch share taken
+
+    interactive = await controller.admit("s1")
+    assert controller.try_admit("other") is None  # no free slot
+    background.release()
+    interactive.release()
+    assert controller.in_flight == controller.stats()["batch_in_flight"] == 0
+
+
+async def test_summaries_are_deferred_while_chat_turns_hold_every_slot(fake_llm_service, monkeypatch):
+    controller = AdmissionController(max_in_flight=1)
+    monkeypatch.setattr(llm_service_module, "admission_controller", controller)
+    turn = [HumanMessage(content="hi"), AIMessage(content="hello")]
+
+    ticket = await controller.admit("s1")
+    with pytest.raises(SummaryDeferred):
+        await fake_llm_service._summarize_turns("", turn)
+    ticket.release()
+
+    assert await fake_llm_service._summarize_turns("", turn)
+    assert controller.in_flight == 0
+
+
+async def test_guarded_stream_releases_ticket_when_closed_early():
+    controller = AdmissionController(max_in_flight=1)
+
+    async def frames():
+        yield b"0:\"a\"\n"
+        yield b"0:\"b\"\n"
+
+    guarded = guard_stream(frames(), await controller.admit("s1"))
+    await anext(guarded)
+    await guarded.aclose()
+    assert controller.in_flight == 0
+
+    guard_stream(frames(), await controller.admit("s1"))  # never iterated, then dropped
+    assert controller.in_flight == 0
+
+
+def test_chat_endpoint_refuses_with_retry_after_when_overloaded(monkeypatch):
+    controller = AdmissionController(max_in_flight=1, max_waiting=0)
+    monkeypatch.setattr(chat_module, "admission_controller", controller)
+    app.dependency_overrides[chat_module.get_llm_service] = lambda: object()
+
+    async def occupy():
+        return await controller.admit("someone-else")
+
+    try:
+        with TestClient(app) as client:
+            client.portal.call(occupy)
+            response = client.post(
+                "/api/v1/chat",
+                json={"messages": [{"role": "user", "content": "hi"}], "session_id": "s"},
+            )
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
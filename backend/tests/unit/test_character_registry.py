@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from app.services.character_registry import CharacterRegistry, UnknownCharacterError, character_registry
+from app.services.session_store import session_store
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def prompts_dir(tmp_path):
+    (tmp_path / "chandler_bing.txt").write_text("You are Chandler.")
+    (tmp_path / "tyrion_lannister.txt").write_text("You are Tyrion.")
+    (tmp_path / "notes.md").write_text("not a persona")
+    return tmp_path
+
+
+def test_personas_are_discovered_and_compiled_lazily(prompts_dir):
+    registry = CharacterRegistry(str(prompts_dir))
+    assert registry.ids() == ["chandler", "tyrion"]
+    assert registry.compilations == 0
+
+    tyrion = registry.get("tyrion")
+    assert tyrion.name == "Tyrion Lannister"
+    assert registry.get("TYRION") is tyrion
+    assert registry.compilations == 1
+    rendered = tyrion.prompt.format_messages(chat_history=[], user_input_combined="hi")
+    assert rendered[0].content == "You are Tyrion."
+
+
+def test_changed_persona_file_is_recompiled(prompts_dir):
+    clock = FakeClock()
+    registry = CharacterRegistry(str(prompts_dir), reload_interval=2.0, clock=clock)
+    before = registry.get("tyrion")
+
+    path = prompts_dir / "tyrion_lannister.txt"
+    path.write_text("You are Tyrion, now with more wine.")
+    os.utime(path, (before.mtime + 10, before.mtime + 10))
+    assert registry.get("tyrion") is before  # not re-checked within the interval
+
+    clock.now = 3.0
+    after = registry.get("tyrion")
+    assert after is not before
+    assert after.system_prompt == "You are Tyrion, now with more wine."
+
+
+def test_new_persona_files_are_picked_up_and_unknown_ids_rejected(prompts_dir):
+    clock = FakeClock()
+    registry = CharacterRegistry(str(prompts_dir), clock=clock)
+    with pytest.raises(UnknownCharacterError):
+        registry.resolve("peter")
+
+    (prompts_dir / "peter_griffin.txt").write_text("You are Peter.")
+    clock.now = 5.0
+    assert registry.resolve("peter") == "peter"
+    assert registry.resolve(None) == "chandler"
+
+
+def test_default_character_falls_back_to_built_in_prompt(tmp_path):
+    registry = CharacterRegistry(str(tmp_path))
+    assert registry.get().system_prompt.startswith("You are Chandler Bing")
+
+
+def test_shipped_personas_match_frontend_ids():
+    assert {"chandler", "tyrion", "heisenberg", "peter"} <= set(character_registry.ids())
+
+
+async def test_character_id_routes_to_its_own_persona_and_history(fake_llm_service):
+    chunks = [chunk async for chunk in fake_llm_service.async_generate_streaming_response(
+        "Who are you?", conversation_id="s1", character_id="tyrion"
+    )]
+    assert "".join(chunks) == "Reply 1 from Chandler."
+
+    assert session_store.peek("s1") is None
+    assert len(session_store.peek("tyrion:s1").messages) == 2
+    runnable = fake_llm_service.get_runnable("tyrion")
+    assert fake_llm_service.get_runnable("tyrion") is runnable
+    assert fake_llm_service.get_runnable("chandler") is not runnable
@@ -0,0 +1,165 @@
+import asyncio
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.v1.endpoints import chat as chat_module
+from app.api.v1.endpoints.chat_ws import ChatConnection
+from app.core.config import settings
+from app.core.guardrails_config import CANNED_RESPONSE_INPUT_TRIGGERED
+from app.main import app
+from app.services.admission import admission_controller
+from app.services.character_registry import history_session_id
+from app.services.rate_limit import RateLimitMiddleware, TokenBucketLimiter
+
+
+def chat_frame(conversation_id, content, **fields):
+    return {"type": "chat", "conversation_id": conversation_id,
+            "message": {"role": "user", "content": content}, **fields}
+
+
+def read_until_done(ws, conversation_ids):
+    """Frames until every conversation has finished; returns ({id: text}, {id: final frame})."""
+    texts = {conversation_id: "" for conversation_id in conversation_ids}
+    finished = {}
+    while len(finished) < len(conversation_ids):
+        frame = ws.receive_json()
+        if frame["type"] == "token":
+            texts[frame["conversation_id"]] += frame["text"]
+        elif frame["type"] in ("done", "error"):
+            finished[frame["conversation_id"]] = frame
+    return texts, finished
+
+
+def connection_histories(conversation_id):
+    """Contents of every stored history for conversation_id, whichever connection opened it."""
+    return [[message.content for message in chat_module.session_store.get(session_id).messages]
+            for session_id in list(chat_module.session_store._entries)
+            if session_id.startswith("ws:") and session_id.endswith(f":{conversation_id}")]
+
+
+@pytest.fixture
+def client(fake_llm_service):
+    app.dependency_overrides[chat_module.get_llm_service] = lambda: fake_llm_service
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_conversations_are_multiplexed_over_one_connection(client):
+    with client.websocket_connect("/api/v1/chat/ws") as ws:
+        ws.send_json(chat_frame("ws-a", "Hi Chandler"))
+        ws.send_json(chat_frame("ws-b", "Hello there", character_id="tyrion", session_id="ws-b-session"))
+        ws.send_json({"type": "ping"})
+        texts, finished = read_until_done(ws, ["ws-a", "ws-b"])
+        ws.send_json(chat_frame("ws-a", "How was work?"))
+        follow_up, _ = read_until_done(ws, ["ws-a"])
+
+    assert {frame["outcome"] for frame in finished.values()} == {"generated"}
+    for text in (texts["ws-a"], texts["ws-b"], follow_up["ws-a"]):
+        assert re.fullmatch(r"Reply \d+ from Chandler\.", text)
+    assert connection_histories("ws-a") == [["Hi Chandler", texts["ws-a"], "How was work?", follow_up["ws-a"]]]
+    assert len(chat_module.session_store.get(history_session_id("tyrion", "ws-b-session")).messages) == 2
+
+
+def test_conversation_ids_are_private_to_their_connection(client):
+    with client.websocket_connect("/api/v1/chat/ws") as first, \
+            client.websocket_connect("/api/v1/chat/ws") as second:
+        first.send_json(chat_frame("1", "I'm Monica"))
+        first_texts, _ = read_until_done(first, ["1"])
+        second.send_json(chat_frame("1", "I'm Ross"))
+        second_texts, _ = read_until_done(second, ["1"])
+
+    assert sorted(connection_histories("1")) == sorted([
+        ["I'm Monica", first_texts["1"]], ["I'm Ross", second_texts["1"]]])
+    assert "1" not in chat_module.session_store
+
+
+def test_cancel_stops_the_turn_and_releases_its_slot(client, fake_llm_service, monkeypatch):
+    closed = []
+
+    async def endless_reply(**kwargs):
+        try:
+            yield "Well, "
+            await asyncio.sleep(3600)
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(fake_llm_service, "async_generate_streaming_response", endless_reply)
+    with client.websocket_connect("/api/v1/chat/ws") as ws:
+        ws.send_json(chat_frame("ws-cancel", "Tell me a long story"))
+        first = ws.receive_json()
+        ws.send_json(chat_frame("ws-cancel", "Are you there?"))
+        busy = ws.receive_json()
+        ws.send_json({"type": "cancel", "conversation_id": "ws-cancel"})
+        done = ws.receive_json()
+
+    assert first == {"type": "token", "conversation_id": "ws-cancel", "text": "Well, "}
+    assert (busy["type"], busy["status"]) == ("error", 409)
+    assert done == {"type": "done", "conversation_id": "ws-cancel", "outcome": "cancelled"}
+    assert closed == [True]
+    assert admission_controller.stats()["in_flight"] == 0
+
+
+def test_guardrail_replies_and_bad_frames_are_in_band(client):
+    with client.websocket_connect("/api/v1/chat/ws") as ws:
+        ws.send_json(chat_frame("ws-rude", "you stupid bot"))
+        texts, finished = read_until_done(ws, ["ws-rude"])
+        ws.send_text("not json")
+        not_json = ws.receive_json()
+        ws.send_json({"type": "chat", "conversation_id": "ws-empty"})
+        invalid = ws.receive_json()
+        ws.send_json(chat_frame("ws-nobody", "hi", character_id="nobody"))
+        unknown = ws.receive_json()
+
+    assert texts["ws-rude"] == CANNED_RESPONSE_INPUT_TRIGGERED
+    assert finished["ws-rude"]["outcome"] == "input_guardrail"
+    assert (not_json["status"], invalid["status"], unknown["status"]) == (400, 422, 404)
+    assert (invalid["conversation_id"], unknown["conversation_id"]) == ("ws-empty", "ws-nobody")
+
+
+def test_server_pings_quiet_connections(client, monkeypatch):
+    monkeypatch.setattr(settings, "WS_PING_INTERVAL_SECONDS", 0.05)
+    with client.websocket_connect("/api/v1/chat/ws") as ws:
+        assert ws.receive_json() == {"type": "ping"}
+        ws.send_json({"type": "pong"})
+        assert ws.receive_json() == {"type": "ping"}
+
+
+def test_rate_limited_clients_are_refused_at_the_handshake():
+    limited = RateLimitMiddleware(app, TokenBucketLimiter(rate=0.1, burst=1))
+    with TestClient(limited) as limited_client:
+        with limited_client.websocket_connect("/api/v1/chat/ws"):
+            pass
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with limited_client.websocket_connect("/api/v1/chat/ws"):
+                pass
+
+    assert refused.value.code == 1013
+
+
+def test_pages_from_other_origins_are_refused(client):
+    with client.websocket_connect("/api/v1/chat/ws", headers={"Origin": settings.CORS_ALLOWED_ORIGINS[0]}) as ws:
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect("/api/v1/chat/ws", headers={"Origin": "https://evil.example"}):
+            pass
+
+    assert refused.value.code == 1008
+
+
+async def test_control_replies_never_block_the_reader():
+    connection = ChatConnection(websocket=None, llm_service=None, send_queue_frames=1)
+    cancelled = asyncio.get_running_loop().create_future()
+    connection._turns["slow"] = cancelled
+    await connection._dispatch('{"type": "ping"}')
+    await asyncio.wait_for(connection._dispatch('{"type": "ping"}'), timeout=1)  # outbox full: dropped
+    await asyncio.wait_for(connection._dispatch('{"type": "cancel", "conversation_id": "slow"}'), timeout=1)
+
+    assert cancelled.cancelled()
+    assert connection._outbox.qsize() == 1
@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.import_time_report import LAZY_PACKAGES, cold_import, lazy_packages_loaded
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "..")
+# Cold import of app.main is ~0.5 s without LangChain and ~1.7 s with it on a dev laptop.
+IMPORT_BUDGET_MS = float(os.environ.get("COLD_IMPORT_BUDGET_MS", "1000"))
+
+SERVE_WITHOUT_MODEL = """
+import json, sys
+from fastapi.testclient import TestClient
+from app.main import app
+
+with TestClient(app) as client:
+    for path in ("/", "/health", "/metrics"):
+        assert client.get(path).status_code == 200, path
+    assert client.get("/ready").status_code == 503  # no warm-up: the service is built on first use
+    for content in (None, "you stupid bot"):
+        messages = [] if content is None else [{"role": "user", "content": content}]
+        assert client.post("/api/v1/chat", json={"messages": messages}).status_code == 200
+    after_canned = sorted(sys.modules)
+    reply = client.post("/api/v1/chat", json={"messages": [{"role": "user", "content": "hi"}]}).text
+sys.stdout.write("REPORT " + json.dumps({"after_canned": after_canned, "after_generation": sorted(sys.modules), "reply": reply}) + "\\n")
+"""
+
+
+def test_cold_import_of_app_main_is_within_budget():
+    cold_import("app.main")  # compile bytecode first
+    best_ms = min(cold_import("app.main")["seconds"] for _ in range(3)) * 1000
+
+    assert best_ms <= IMPORT_BUDGET_MS, (
+        f"Cold import of app.main took {best_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms); "
+        "run `python -m benchmarks.import_time_report` to see what got slower."
+    )
+
+
+def test_canned_replies_and_health_checks_never_import_langchain():
+    env = {
+        **os.environ,
+        "LLM_SERVICE_PROVIDER": "FAKE",
+        "FAKE_LLM_TTFT_MS": "0",
+        "FAKE_LLM_TOKENS_PER_SECOND": "0",
+        "LLM_WARMUP_ON_STARTUP": "false",
+        "LANGCHAIN_TRACING_V2": "false",
+    }
+    result = subprocess.run([sys.executable, "-c", SERVE_WITHOUT_MODEL], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+    line = next(line for line in result.stdout.splitlines() if line.startswith("REPORT "))
+    report = json.loads(line[len("REPORT "):])
+
+    assert lazy_packages_loaded(report["after_canned"]) == []
+    assert report["reply"].startswith("0:")
+    assert "langchain_core" in lazy_packages_loaded(report["after_generation"])
+    assert set(LAZY_PACKAGES) >= set(lazy_packages_loaded(report["after_generation"]))
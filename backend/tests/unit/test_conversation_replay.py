@@ -0,0 +1,50 @@
+import json
+
+from app.api.v1.endpoints import chat as chat_module
+from app.core.config import settings
+from app.main import app
+from app.services.session_store import session_store
+from benchmarks.conversation_replay import InProcessTarget, compare_reports, load_transcripts, replay, summarize
+
+
+def write_transcripts(tmp_path):
+    path = tmp_path / "transcripts.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in [
+        {"id": "a", "turns": ["hi", {"content": "and then?", "think_ms": 10}, {"content": "bye", "think_ms": 10}]},
+        {"id": "b", "character_id": "tyrion", "turns": [{"content": "hello"}, {"content": "more"}]},
+    ]) + "\n")
+    return str(path)
+
+
+async def test_replay_keeps_turn_order_per_session_and_reports_by_turn_index(fake_llm_service, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+    app.dependency_overrides[chat_module.get_llm_service] = lambda: fake_llm_service
+    conversations = load_transcripts(write_transcripts(tmp_path))
+    try:
+        async with InProcessTarget(app) as target:
+            results, wall = await replay(target, conversations, concurrency=2, repeat=2, think_scale=1.0)
+    finally:
+        app.dependency_overrides = {}
+
+    assert len(results) == 10 and all(r["status"] == 200 and r["ttft"] is not None for r in results)
+    for session_id in {r["session_id"] for r in results}:
+        turns = [r["turn"] for r in results if r["session_id"] == session_id]
+        assert turns == list(range(len(turns)))
+    histories = [len(session_store.peek(sid).messages) for sid in session_store._entries]
+    assert sorted(histories) == [4, 4, 6, 6]  # each replayed copy kept its own session
+
+    summary = summarize(results, wall)
+    assert [(row["turn"], row["requests"]) for row in summary["by_turn"]] == [(0, 4), (1, 4), (2, 2)]
+
+
+def test_compare_reports_gives_per_turn_deltas():
+    def report(*p50s):
+        return {"summary": {"by_turn": [
+            {"turn": i, "ttft_ms": {"p50": v, "p95": v}, "latency_ms": {"p50": v * 2, "p95": None}}
+            for i, v in enumerate(p50s)]}}
+
+    [first, second] = compare_reports(report(10.0, 20.0), report(15.0, 10.0, 99.0))
+
+    assert (first["turn"], first["ttft_ms_p50"], first["ttft_ms_p50_pct"]) == (0, 5.0, 50.0)
+    assert (second["latency_ms_p50"], second["latency_ms_p50_pct"]) == (-20.0, -50.0)
+    assert second["latency_ms_p95"] is None
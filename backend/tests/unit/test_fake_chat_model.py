@@ -0,0 +1,52 @@
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.core.config import settings
+from app.services.fake_chat_model import FakeStreamingChatModel
+from app.services.llm_service import LLMService
+
+
+def test_replies_are_deterministic_per_prompt_and_seed():
+    model = FakeStreamingChatModel(ttft_ms=0, tokens_per_second=0, reply_tokens=8)
+    hello = model.invoke([HumanMessage(content="hello")]).content
+
+    assert hello == model.invoke([HumanMessage(content="hello")]).content
+    assert len(hello.split()) == 8
+    assert hello != model.invoke([HumanMessage(content="goodbye")]).content
+    assert hello != FakeStreamingChatModel(ttft_ms=0, tokens_per_second=0, reply_tokens=8, seed=1).invoke(
+        [HumanMessage(content="hello")]).content
+
+
+async def test_streams_tokens_after_ttft_at_the_configured_rate():
+    model = FakeStreamingChatModel(ttft_ms=50, tokens_per_second=200, jitter=0, reply_tokens=10)
+    started = time.perf_counter()
+    arrivals = []
+    async for chunk in model.astream([HumanMessage(content="hi")]):
+        arrivals.append((time.perf_counter() - started, chunk.content))
+
+    assert len(arrivals) == 10
+    assert arrivals[0][0] >= 0.045
+    assert arrivals[-1][0] >= 0.045 + 9 * 0.005 * 0.9
+
+
+async def test_error_rate_fails_calls():
+    model = FakeStreamingChatModel(ttft_ms=0, error_rate=1.0)
+    with pytest.raises(RuntimeError, match="simulated"):
+        async for _ in model.astream([HumanMessage(content="hi")]):
+            pass
+
+
+async def test_llm_service_streams_from_the_fake_provider(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SERVICE_PROVIDER", "FAKE")
+    monkeypatch.setattr(settings, "FAKE_LLM_TTFT_MS", 0.0)
+    monkeypatch.setattr(settings, "FAKE_LLM_TOKENS_PER_SECOND", 0.0)
+    monkeypatch.setattr(settings, "FAKE_LLM_REPLY_TOKENS", 5)
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+    service = LLMService()
+
+    reply = "".join([t async for t in service.async_generate_streaming_response("ping", conversation_id="fake")])
+
+    assert isinstance(service.llm, FakeStreamingChatModel)
+    assert len(reply.split()) == 5
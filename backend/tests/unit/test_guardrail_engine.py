@@ -0,0 +1,85 @@
+from app.services.guardrail_engine import (
+    GuardrailEngine, INPUT_CATEGORIES, OUTPUT_CATEGORIES, StreamingGuardrailScanner, guardrail_engine
+)
+
+
+def test_matches_report_term_and_category():
+    match = guardrail_engine.find("You are such a STUPID BOT!", INPUT_CATEGORIES)
+    assert match.term == "stupid bot"
+    assert match.category == "input_denylist"
+
+
+def test_unicode_lookalikes_are_normalized():
+    # Fullwidth letters fold to ASCII under NFKC.
+    assert guardrail_engine.find("ｓｔｕｐｉｄ ｂｏｔ", INPUT_CATEGORIES) is not None
+
+
+def test_categories_restrict_the_scan():
+    text = "Well, as a large language model, I must decline."
+    assert guardrail_engine.find(text, INPUT_CATEGORIES) is None
+    assert guardrail_engine.find(text, OUTPUT_CATEGORIES).term == "as a large language model"
+
+
+def test_overlapping_and_suffix_terms_are_all_found():
+    engine = GuardrailEngine({"a": ["she", "he", "hers"], "b": ["his", "he"]})
+    found = {(m.term, m.category, m.start) for m in engine.find_all("ushers")}
+    assert found == {("she", "a", 1), ("he", "a", 2), ("he", "b", 2), ("hers", "a", 2)}
+
+
+def test_clean_text_has_no_match():
+    assert guardrail_engine.find("Could I BE any more sarcastic?") is None
+
+
+def split_at(text, cuts):
+    bounds = [0] + sorted(cuts) + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def run_scanner(engine, tokens, categories=OUTPUT_CATEGORIES):
+    scanner = StreamingGuardrailScanner(engine, categories)
+    released = []
+    for token in tokens:
+        text, match = scanner.feed(token)
+        released.append(text)
+        if match is not None:
+            return "".join(released), match
+    released.append(scanner.flush())
+    return "".join(released), None
+
+
+def test_streaming_scanner_detects_phrase_split_at_every_boundary():
+    text = "Honestly? As a Large Language Model, I could not say."
+    phrase_start = text.lower().index("as a large")
+    for cut in range(1, len(text)):
+        for second_cut in (cut // 2, (cut + len(text)) // 2):
+            cuts = sorted({cut, second_cut} - {0, len(text)})
+            released, match = run_scanner(guardrail_engine, split_at(text, cuts))
+            assert match is not None and match.term == "as a large language model"
+            assert released == text[:phrase_start]
+
+
+def test_streaming_scanner_handles_phrases_longer_than_old_buffer():
+    long_phrase = "this is a deliberately long forbidden phrase that exceeds fifty characters"
+    engine = GuardrailEngine({"output_denylist": [long_phrase]})
+    text = "Well, " + long_phrase.upper() + " and more."
+    tokens = [text[i:i + 3] for i in range(0, len(text), 3)]
+
+    released, match = run_scanner(engine, tokens, categories=None)
+
+    assert match.term == long_phrase
+    assert released == "Well, "
+
+
+def test_streaming_scanner_releases_clean_text_with_minimal_hold_back():
+    scanner = StreamingGuardrailScanner(guardrail_engine, OUTPUT_CATEGORIES)
+    assert scanner.feed("Could I BE any more ") == ("Could I BE any more ", None)
+    # "as a" could still become "as a large language model", so it is held back.
+    assert scanner.feed("tired as a") == ("tired ", None)
+    assert scanner.feed(" rock?") == ("as a rock?", None)
+    assert scanner.flush() == ""
+
+
+def test_streaming_scanner_ignores_terms_from_other_categories():
+    # "stupid bot" is an input-only term and must not cause hold-back on output.
+    scanner = StreamingGuardrailScanner(guardrail_engine, OUTPUT_CATEGORIES)
+    assert scanner.feed("you stupid bo") == ("you stupid bo", None)
@@ -0,0 +1,102 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.services.history_shaping import HistoryShaper, estimate_message_tokens, estimate_tokens
+
+
+def make_history(turns, words=20):
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"question {i} " + "word " * words))
+        messages.append(AIMessage(content=f"answer {i} " + "word " * words))
+    return messages
+
+
+async def fake_summarizer(summary, turn):
+    return (summary + " " + turn[0].content.split(" word")[0]).strip()
+
+
+def test_estimate_tokens_is_roughly_four_chars_per_token():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+
+
+def test_short_history_is_sent_unchanged():
+    shaper = HistoryShaper(token_budget=10_000)
+    history = make_history(3)
+    assert shaper.shape("s", history) == history
+
+
+def test_long_history_fits_budget_and_keeps_latest_turns():
+    shaper = HistoryShaper(token_budget=200, keep_last_turns=2)
+    history = make_history(50)
+
+    shaped = shaper.shape("s", history)
+
+    assert sum(estimate_message_tokens(m) for m in shaped) <= 200
+    assert shaped[-1] is history[-1]
+    assert isinstance(shaped[0], HumanMessage)
+
+
+async def test_older_turns_are_folded_into_rolling_summary_in_background():
+    shaper = HistoryShaper(token_budget=200, keep_last_turns=2, summarizer=fake_summarizer)
+    history = make_history(6)
+
+    shaper.shape("s", history)  # returns immediately; summarization runs as a task
+    await shaper.wait_idle()
+
+    summary = shaper.get_summary("s")
+    assert summary.summarized_count == 8
+    assert summary.text == "question 0 question 1 question 2 question 3"
+
+    shaped = shaper.shape("s", history)
+    assert isinstance(shaped[0], SystemMessage)
+    assert "question 3" in shaped[0].content
+    assert shaped[1].content.startswith("question 4")
+
+
+async def test_summary_is_reanchored_after_store_trims_old_turns():
+    shaper = HistoryShaper(token_budget=200, keep_last_turns=2, summarizer=fake_summarizer)
+    history = make_history(6)
+    shaper.shape("s", history)
+    await shaper.wait_idle()
+
+    trimmed = history[4:]  # the session store dropped the two oldest turns
+    shaped = shaper.shape("s", trimmed)
+
+    assert shaper.get_summary("s").summarized_count == 4
+    assert shaped[1].content.startswith("question 4")
+
+
+async def test_summary_of_a_replaced_history_is_dropped():
+    shaper = HistoryShaper(token_budget=200, keep_last_turns=2, summarizer=fake_summarizer)
+    shaper.shape("s", make_history(6))
+    await shaper.wait_idle()
+
+    other_conversation = [HumanMessage(content=f"unrelated {i}") for i in range(12)]
+    shaped = shaper.shape("s", other_conversation)
+
+    assert not any(isinstance(message, SystemMessage) for message in shaped)
+    assert shaper.get_summary("s") is None
+
+
+async def test_forget_drops_the_summary_and_stops_its_update():
+    started = asyncio.Event()
+
+    async def stalled_summarizer(summary, turn):
+        started.set()
+        await asyncio.sleep(3600)
+
+    shaper = HistoryShaper(token_budget=200, keep_last_turns=2, summarizer=fake_summarizer)
+    shaper.shape("s", make_history(6))
+    await shaper.wait_idle()
+    shaper.summarizer = stalled_summarizer
+    shaper.shape("s", make_history(8))
+    await started.wait()
+
+    shaper.forget("s")
+    await asyncio.sleep(0)
+
+    assert shaper.get_summary("s") is None
+    assert not shaper._tasks
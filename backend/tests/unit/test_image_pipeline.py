@@ -0,0 +1,181 @@
+import asyncio
+import base64
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import chat as chat_module
+from app.core.config import settings
+from app.main import app
+from app.services import image_pipeline as image_pipeline_module
+from app.services.image_pipeline import (
+    ImageDescriber, ImageDescriptionCache, ImagePipeline, LocalImageDescriber, prepare_image,
+)
+from app.utils.upload_stream import StreamedUpload, UploadRejected, stream_multipart_upload
+
+FIXTURE_IMAGE = os.path.join(os.path.dirname(__file__), "..", "e2e", "fixtures", "test_image.jpg")
+BOUNDARY = "chatterbox-test-boundary"
+
+
+def fixture_image() -> bytes:
+    with open(FIXTURE_IMAGE, "rb") as f:
+        return base64.b64decode(f.read())  # the e2e fixture is stored base64-encoded
+
+
+def multipart_body(parts):
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def in_chunks(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+class CountingDescriber(ImageDescriber):
+    def __init__(self):
+        self.calls = 0
+
+    async def describe(self, image):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return f"description {self.calls}"
+
+
+def write_upload(directory, data, name):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return StreamedUpload(path=path, content_hash=hashlib.blake2b(data, digest_size=16).hexdigest(),
+                          size=len(data), filename=name, content_type=None, head=data[:32])
+
+
+async def test_multipart_file_is_streamed_to_disk_in_chunks(tmp_path):
+    image = fixture_image()
+    body = multipart_body([("note", None, b"skipped"), ("file", "meme.jpg", image)])
+
+    upload = await stream_multipart_upload(
+        f"multipart/form-data; boundary={BOUNDARY}", in_chunks(body, 7), str(tmp_path), max_bytes=len(image))
+
+    assert open(upload.path, "rb").read() == image
+    assert upload.content_hash == hashlib.blake2b(image, digest_size=16).hexdigest()
+    assert (upload.filename, upload.size) == ("meme.jpg", len(image))
+    with pytest.raises(UploadRejected) as too_large:
+        await stream_multipart_upload(
+            f"multipart/form-data; boundary={BOUNDARY}", in_chunks(body, 1024), str(tmp_path), max_bytes=100)
+    assert too_large.value.status_code == 413
+    assert os.listdir(tmp_path) == [os.path.basename(upload.path)]  # the rejected upload was removed
+
+
+def test_describers_must_implement_describe():
+    class Mute(ImageDescriber):
+        pass
+
+    with pytest.raises(TypeError, match="describe"):
+        Mute()
+
+
+def test_near_duplicates_are_found_by_hamming_distance_and_lru_evicts():
+    cache = ImageDescriptionCache(max_entries=2, max_distance=4)
+    cache.put("a", "notes a", perceptual_hash=0b1111_0000)
+    cache.put("b", "notes b", perceptual_hash=None)
+
+    assert cache.find_similar(0b1111_0111) == "notes a"  # 3 bits away
+    assert cache.find_similar(0xFFFF_FFFF) is None
+    cache.put("c", "notes c", perceptual_hash=1 << 63)  # evicts "b", the least recently used
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("notes a", None, "notes c")
+    assert (cache.peek("a"), cache.peek("b")) == ("notes a", None)
+    assert cache.stats()["exact_hits"] == 2  # peeks are not hits
+
+
+async def test_repeated_images_are_described_once(tmp_path):
+    describer = CountingDescriber()
+    pipeline = ImagePipeline(describer=describer, directory=str(tmp_path))
+    image = fixture_image()
+
+    first, concurrent = await asyncio.gather(
+        pipeline.ingest(write_upload(tmp_path, image, "one.upload")),
+        pipeline.ingest(write_upload(tmp_path, image, "two.upload")),
+    )
+    repeat = await pipeline.ingest(write_upload(tmp_path, image, "three.upload"))
+
+    assert describer.calls == 1
+    assert first.notes == concurrent.notes == repeat.notes == "description 1"
+    assert (first.source, concurrent.source, repeat.source) == ("described", "exact", "exact")
+    assert os.listdir(tmp_path) == []
+    with pytest.raises(UploadRejected):
+        await pipeline.ingest(write_upload(tmp_path, b"not an image at all", "four.upload"))
+
+
+async def test_cancelled_upload_does_not_cancel_the_shared_description(tmp_path):
+    describer = CountingDescriber()
+    pipeline = ImagePipeline(describer=describer, directory=str(tmp_path))
+    image = fixture_image()
+
+    leader = asyncio.create_task(pipeline.ingest(write_upload(tmp_path, image, "one.upload")))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(pipeline.ingest(write_upload(tmp_path, image, "two.upload")))
+    await asyncio.sleep(0)
+    leader.cancel()  # the first client went away mid-describe
+
+    assert (await follower).notes == "description 1"
+    assert leader.cancelled()
+    assert describer.calls == 1 and pipeline.cache.peek(follower.result().image_id) == "description 1"
+    assert os.listdir(tmp_path) == []
+
+
+async def test_downscaled_near_duplicates_reuse_notes(tmp_path):
+    image_module = pytest.importorskip("PIL.Image")
+    describer = CountingDescriber()
+    pipeline = ImagePipeline(describer=describer, directory=str(tmp_path), max_dimension=64)
+    original = await pipeline.ingest(write_upload(tmp_path, fixture_image(), "a.upload"))
+
+    with image_module.open(io.BytesIO(fixture_image())) as picture:
+        picture.convert("RGB").resize((picture.width // 2, picture.height // 2)).save(tmp_path / "b.jpg", quality=60)
+    resized = await pipeline.ingest(write_upload(tmp_path, (tmp_path / "b.jpg").read_bytes(), "b.upload"))
+
+    assert (original.source, resized.source, describer.calls) == ("described", "similar", 1)
+    prepared = prepare_image(write_upload(tmp_path, (tmp_path / "b.jpg").read_bytes(), "c.upload"), "jpeg", 64, 10**8, 80)
+    with image_module.open(prepared.path) as downscaled:
+        assert max(downscaled.size) <= 64
+    assert "image" in await LocalImageDescriber().describe(prepared)
+
+
+def test_upload_endpoint_and_chat_turns_by_image_id(fake_llm_service, monkeypatch):
+    app.dependency_overrides[chat_module.get_llm_service] = lambda: fake_llm_service
+    image = fixture_image()
+    try:
+        with TestClient(app) as client:
+            uploaded = client.post("/api/v1/images", files={"file": ("meme.jpg", image, "image/jpeg")})
+            again = client.post("/api/v1/images", files={"file": ("copy.jpg", image, "image/jpeg")})
+            not_image = client.post("/api/v1/images", files={"file": ("notes.txt", b"hello", "image/jpeg")})
+            image_id = uploaded.json()["image_id"]
+            chat = client.post("/api/v1/chat", json={
+                "messages": [{"role": "user", "content": "What is this?"}],
+                "session_id": "image-1", "image_id": image_id,
+            })
+            unknown = client.post("/api/v1/chat", json={
+                "messages": [{"role": "user", "content": "And this?"}], "image_id": "0" * 32,
+            })
+            bad_length = client.post("/api/v1/images", content=b"x", headers={
+                "content-type": f"multipart/form-data; boundary={BOUNDARY}", "content-length": "lots"})
+            monkeypatch.setattr(settings, "IMAGE_UPLOAD_MAX_BYTES", 100)
+            too_large = client.post("/api/v1/images", files={"file": ("meme.jpg", image, "image/jpeg")})
+    finally:
+        app.dependency_overrides = {}
+
+    assert uploaded.status_code == 200 and uploaded.json()["context_notes"].startswith("The user shared")
+    assert again.json()["source"] == "exact" and again.json()["image_id"] == image_id
+    assert (not_image.status_code, unknown.status_code, too_large.status_code) == (415, 404, 413)
+    assert bad_length.status_code == 400
+    assert image_pipeline_module.image_pipeline._executor is None  # threads stopped at shutdown
+    assert image_pipeline_module.image_pipeline.cache.stats()["exact_hits"] == 1  # the repeat upload, not the chat turn
+    assert chat.status_code == 200
+    recorded = chat_module.session_store.get("image-1").messages[0].content
+    assert recorded == f"What is this? [Image context: {uploaded.json()['context_notes']}]"
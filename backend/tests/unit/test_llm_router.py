@@ -0,0 +1,127 @@
+import json
+import time
+
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.core.config import settings
+from app.services.fake_chat_model import FakeStreamingChatModel
+from app.services.llm_providers import OpenAICompatibleChatModel
+from app.services.llm_router import CircuitBreaker, HedgedChatRouter, ProvidersUnavailableError
+from app.services.llm_service import LLMService
+
+PROMPT = [HumanMessage(content="hello")]
+
+
+def fake(ttft_ms=0.0, error_rate=0.0, seed=0):
+    return FakeStreamingChatModel(ttft_ms=ttft_ms, tokens_per_second=0, jitter=0, error_rate=error_rate,
+                                  reply_tokens=5, seed=seed)
+
+
+def router(*providers, hedge_after=0.05, threshold=5):
+    names = [f"p{i}" for i in range(len(providers))]
+    return HedgedChatRouter(
+        providers=list(providers), provider_names=names, hedge_after=hedge_after,
+        breakers={name: CircuitBreaker(name, failure_threshold=threshold) for name in names},
+    )
+
+
+async def reply(model):
+    return "".join([chunk.content async for chunk in model.astream(PROMPT)])
+
+
+def expected(model):
+    return "".join(model.reply_for(PROMPT))
+
+
+async def test_slow_primary_is_hedged_and_the_first_token_wins():
+    slow, fast = fake(ttft_ms=1000, seed=1), fake(ttft_ms=10, seed=2)
+    hedged = router(slow, fast, hedge_after=0.05)
+
+    started = time.perf_counter()
+    text = await reply(hedged)
+
+    assert text == expected(fast)
+    assert time.perf_counter() - started < 0.5  # did not wait for the slow primary
+
+
+async def test_fast_primary_never_starts_the_backup():
+    primary, backup = fake(ttft_ms=5, seed=1), fake(error_rate=1.0, seed=2)
+    hedged = router(primary, backup, hedge_after=0.2)
+
+    assert await reply(hedged) == expected(primary)
+    assert hedged.breakers["p1"].failures == 0
+
+
+async def test_error_before_first_token_fails_over_immediately():
+    broken, backup = fake(error_rate=1.0, seed=1), fake(seed=2)
+    hedged = router(broken, backup, hedge_after=10)
+
+    assert await reply(hedged) == expected(backup)
+    assert hedged.breakers["p0"].failures == 1
+    assert hedged.breakers["p1"].failures == 0
+
+
+async def test_open_circuit_skips_the_provider_until_all_are_open():
+    broken, backup = fake(error_rate=1.0, seed=1), fake(error_rate=1.0, seed=2)
+    hedged = router(broken, backup, hedge_after=0, threshold=1)
+
+    with pytest.raises(RuntimeError, match="simulated"):
+        await reply(hedged)
+    assert hedged.breakers["p0"].state == hedged.breakers["p1"].state == "open"
+    with pytest.raises(ProvidersUnavailableError):
+        await reply(hedged)
+
+
+def test_circuit_breaker_half_opens_for_one_probe():
+    now = [0.0]
+    breaker = CircuitBreaker("p", failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow()  # the probe
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+async def test_openai_compatible_model_streams_server_sent_events():
+    def handler(request):
+        assert request.url.path == "/v1/chat/completions"
+        assert request.headers["authorization"] == "Bearer key"
+        body = json.loads(request.content)
+        assert body["messages"] == [{"role": "user", "content": "hello"}] and body["stream"] is True
+        events = (
+            'data: {"choices":[{"delta":{"role":"assistant"}}]}\n\n'
+            'data: {"choices":[{"delta":{"content":"Could I "}}]}\n\n'
+            'data: {"choices":[{"delta":{"content":"BE"}}]}\n\n'
+            "data: [DONE]\n\n"
+        )
+        return httpx.Response(200, text=events, headers={"content-type": "text/event-stream"})
+
+    model = OpenAICompatibleChatModel(endpoint_url="https://llama.test/v1", model="llama", api_key="key",
+                                      transport=httpx.MockTransport(handler))
+
+    assert await reply(model) == "Could I BE"
+
+
+async def test_openai_compatible_model_raises_on_http_errors():
+    model = OpenAICompatibleChatModel(endpoint_url="https://llama.test/v1", model="llama",
+                                      transport=httpx.MockTransport(lambda request: httpx.Response(503)))
+    with pytest.raises(httpx.HTTPStatusError):
+        await reply(model)
+
+
+def test_llm_service_routes_when_fallbacks_are_configured(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SERVICE_PROVIDER", "FAKE")
+    monkeypatch.setattr(settings, "LLM_FALLBACK_PROVIDERS", "fake, GEMINI")
+    monkeypatch.setattr(settings, "GOOGLE_API_KEY", "test-key")
+
+    service = LLMService()
+
+    assert isinstance(service.llm, HedgedChatRouter)
+    assert service.llm.provider_names == ["FAKE", "GEMINI"]
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import chat as chat_module
+from app.core.config import settings
+from app.core.guardrails_config import CANNED_RESPONSE_INPUT_TRIGGERED
+from app.main import app
+from app.services.fake_chat_model import FakeStreamingChatModel
+from app.services.llm_service import BatchTurn
+from app.services.session_store import session_store
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+
+
+async def collect(results):
+    return [result async for result in results]
+
+
+async def test_batch_runs_with_bounded_concurrency_and_yields_in_completion_order(fake_llm_service, monkeypatch):
+    running, peak = 0, 0
+
+    async def reply(turn, character_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(float(turn.user_input))
+        running -= 1
+        return "done " + turn.user_input
+
+    monkeypatch.setattr(fake_llm_service, "_generate_batch_reply", reply)
+    delays = ["0.06", "0.01", "0.03", "0.01"]
+    turns = [BatchTurn(user_input=d, conversation_id=f"c{i}", item_id=str(i)) for i, d in enumerate(delays)]
+
+    results = await collect(fake_llm_service.generate_batch(turns, max_concurrency=2))
+
+    assert peak == 2
+    assert [r["id"] for r in results] == ["1", "2", "3", "0"]
+    assert all(r["status"] == "ok" and r["reply"] == "done " + delays[r["index"]] for r in results)
+
+
+async def test_batch_items_go_through_guardrails_and_report_their_status(fake_llm_service):
+    turns = [
+        BatchTurn(user_input="hello", conversation_id="kept"),
+        BatchTurn(user_input="hello", conversation_id="throwaway", keep_history=False),
+        BatchTurn(user_input="you stupid bot", conversation_id="rude"),
+        BatchTurn(user_input="", conversation_id="empty"),
+        BatchTurn(user_input="hello", conversation_id="who", character_id="nobody"),
+    ]
+
+    results = {r["session_id"]: r for r in await collect(fake_llm_service.generate_batch(turns, max_concurrency=3))}
+
+    assert results["kept"]["status"] == results["throwaway"]["status"] == "ok"
+    assert results["kept"]["reply"].startswith("Reply ")
+    assert results["rude"] == {**results["rude"], "status": "input_guardrail", "reply": CANNED_RESPONSE_INPUT_TRIGGERED}
+    assert results["empty"]["status"] == "empty"
+    assert results["who"]["status"] == "unknown_character"
+    assert len(fake_llm_service.get_session_history("kept").messages) == 2
+    assert session_store.peek("throwaway") is None
+
+
+async def test_slow_items_time_out_without_holding_their_admission_slot(fake_llm_service):
+    fake_llm_service.llm = FakeStreamingChatModel(ttft_ms=2000, tokens_per_second=0, jitter=0, reply_tokens=3)
+    fake_llm_service._runnables.clear()
+    turns = [BatchTurn(user_input="hello", conversation_id="slow")]
+
+    [result] = await collect(fake_llm_service.generate_batch(turns, item_timeout=0.05))
+
+    assert result["status"] == "timeout"
+    assert chat_module.admission_controller.stats()["batch_in_flight"] == 0
+
+
+def test_batch_endpoint_streams_ndjson_results(fake_llm_service):
+    app.dependency_overrides[chat_module.get_llm_service] = lambda: fake_llm_service
+    body = {
+        "items": [{"id": f"q{i}", "messages": [{"role": "user", "content": f"question {i}"}]} for i in range(3)],
+        "max_concurrency": 2,
+    }
+    try:
+        with TestClient(app) as client:
+            response = client.post("/api/v1/chat/batch", json=body)
+            too_large = client.post("/api/v1/chat/batch", json={"items": body["items"] * settings.BATCH_MAX_ITEMS})
+    finally:
+        app.dependency_overrides = {}
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert sorted(r["id"] for r in results) == ["q0", "q1", "q2"]
+    assert all(r["status"] == "ok" and r["session_id"].startswith("batch-") for r in results)
+    assert too_large.status_code == 413
@@ -0,0 +1,75 @@
+import asyncio
+import itertools
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.core.config import settings
+from app.core.guardrails_config import CANNED_RESPONSE_OUTPUT_TRIGGERED
+from app.services.request_coalescing import request_coalescer
+from app.services.response_cache import response_cache
+from app.utils.stream_framing import coalesce_frames
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+
+
+def script_replies(service, *replies):
+    service.llm.messages = itertools.cycle([AIMessage(content=reply) for reply in replies])
+
+
+def contents(service, session_id):
+    return [message.content for message in service.get_session_history(session_id).messages]
+
+
+@pytest.mark.parametrize("coalescing", [True, False])
+async def test_abandoned_stream_records_only_what_was_sent(fake_llm_service, monkeypatch, coalescing):
+    monkeypatch.setattr(settings, "REQUEST_COALESCING_ENABLED", coalescing)
+    script_replies(fake_llm_service, "Could I BE any more interrupted right now?")
+
+    stream = fake_llm_service.async_generate_streaming_response("hello", conversation_id="gone")
+    first = await anext(stream)
+    second = await anext(stream)
+    await stream.aclose()  # client disconnected
+    await asyncio.sleep(0.01)
+
+    assert request_coalescer.in_flight == 0  # upstream generation was cancelled
+    assert contents(fake_llm_service, "gone") == ["hello", first + second]
+
+
+async def test_cut_off_stream_records_the_text_the_client_received(fake_llm_service):
+    script_replies(fake_llm_service, "Could I BE any more interrupted right now?")
+    delivered = []
+    frames = coalesce_frames(
+        fake_llm_service.async_generate_streaming_response("hello", conversation_id="cut", delivered_parts=delivered),
+        max_delay=60, queue_size=2, encode=str, on_delivered=delivered.append,
+    )
+    received = await anext(frames)
+    next_frame = asyncio.create_task(anext(frames))  # the client sent the first frame and waits for more
+    await asyncio.sleep(0.01)  # meanwhile more of the reply is buffered
+    next_frame.cancel()  # client disconnected
+    with pytest.raises(asyncio.CancelledError):
+        await next_frame
+    await asyncio.sleep(0.01)
+
+    assert received == "Could"
+    assert contents(fake_llm_service, "cut") == ["hello", received]
+
+
+async def test_stream_abandoned_before_any_text_is_not_recorded(fake_llm_service):
+    stream = fake_llm_service.async_generate_streaming_response("hello", conversation_id="never")
+    await stream.aclose()
+    assert contents(fake_llm_service, "never") == []
+
+
+async def test_completed_and_guardrailed_turns_record_what_the_client_saw(fake_llm_service):
+    script_replies(fake_llm_service, "Well, as a large language model I cannot joke.")
+
+    reply = "".join([t async for t in fake_llm_service.async_generate_streaming_response(
+        "joke please", conversation_id="guarded")])
+
+    assert reply == "Well, " + CANNED_RESPONSE_OUTPUT_TRIGGERED
+    assert contents(fake_llm_service, "guarded") == ["joke please", reply]
+    response_cache.clear()
@@ -0,0 +1,86 @@
+import json
+import logging
+import queue
+
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import chat as chat_module
+from app.core.logging_config import (
+    ContextFilter, JSONFormatter, NonBlockingQueueHandler, RateLimitFilter, parse_sample_rates,
+)
+from app.main import app
+
+
+def record(name="app.test", level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    rec = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_sampling_keeps_a_fixed_fraction_of_low_level_records():
+    limiter = RateLimitFilter(sample_rates=parse_sample_rates("app.services=0.25"))
+
+    kept = [limiter.filter(record("app.services.llm_service")) for _ in range(8)]
+
+    assert kept.count(True) == 2
+    assert limiter.filter(record("app.services.llm_service", level=logging.WARNING))
+    assert all(limiter.filter(record("app.other")) for _ in range(8))
+
+
+def test_rate_limit_drops_over_budget_and_reports_the_suppressed_count():
+    now = [0.0]
+    limiter = RateLimitFilter(rate=1.0, burst=2, clock=lambda: now[0])
+
+    assert [limiter.filter(record()) for _ in range(4)] == [True, True, False, False]
+    now[0] = 1.0
+    resumed = record()
+    assert limiter.filter(resumed)
+    assert resumed.suppressed == 2
+
+
+def test_errors_are_never_rate_limited():
+    limiter = RateLimitFilter(rate=1.0, burst=1, clock=lambda: 0.0)
+
+    assert limiter.filter(record())
+    assert not limiter.filter(record())
+    assert all(limiter.filter(record(level=level)) for level in (logging.ERROR, logging.CRITICAL, logging.ERROR))
+
+
+def test_json_formatter_emits_one_object_with_ids_and_extras():
+    line = JSONFormatter().format(record(request_id="r1", session_id="s1", turn=3))
+    entry = json.loads(line)
+
+    assert entry["message"] == "hello world"
+    assert (entry["level"], entry["logger"]) == ("INFO", "app.test")
+    assert (entry["request_id"], entry["session_id"], entry["turn"]) == ("r1", "s1", 3)
+
+
+def test_queue_handler_drops_instead_of_blocking_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(record())
+    handler.handle(record())
+
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().getMessage() == "hello world"  # interpolated before queueing
+
+
+def test_request_and_session_ids_reach_log_records_and_the_response():
+    captured = []
+    capture = logging.Handler()
+    capture.addFilter(ContextFilter())
+    capture.emit = captured.append
+    chat_logger = logging.getLogger(chat_module.__name__)
+    chat_logger.addHandler(capture)
+    try:
+        with TestClient(app) as client:
+            response = client.post(
+                "/api/v1/chat", headers={"X-Request-ID": "req-42"},
+                json={"messages": [{"role": "user", "content": "you stupid bot"}], "session_id": "s-42"},
+            )
+            generated = client.get("/health").headers["x-request-id"]
+    finally:
+        chat_logger.removeHandler(capture)
+
+    assert response.headers["x-request-id"] == "req-42"
+    assert len(generated) == 32
+    assert captured and all((r.request_id, r.session_id) == ("req-42", "s-42") for r in captured)
@@ -0,0 +1,117 @@
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import chat as chat_module
+from app.core.metrics import MetricsRegistry, _Metric
+from app.main import app
+
+
+def sample_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_renders_counters_gauges_and_cumulative_histograms():
+    registry = MetricsRegistry(prefix="t")
+    requests = registry.counter("requests_total", "Requests.", ["outcome"])
+    streams = registry.gauge("streams", "Streams.")
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    registry.register_collector("store", lambda: {"sessions": 3, "backend": "memory", "cache": {"hits": 2}})
+
+    requests.labels("ok").inc()
+    requests.labels("ok").inc(2)
+    requests.labels('we"ird').inc()
+    streams.inc()
+    for value in (0.05, 0.1, 0.5, 7.0):
+        latency.observe(value)
+
+    text = registry.render()
+
+    assert "# TYPE t_requests_total counter" in text
+    assert 't_requests_total{outcome="ok"} 3' in text
+    assert 't_requests_total{outcome="we\\"ird"} 1' in text
+    assert "t_streams 1" in text
+    assert sample_lines(text, "t_latency_seconds") == [
+        't_latency_seconds_bucket{le="0.1"} 2',
+        't_latency_seconds_bucket{le="1"} 3',
+        't_latency_seconds_bucket{le="+Inf"} 4',
+        "t_latency_seconds_sum 7.65",
+        "t_latency_seconds_count 4",
+    ]
+    assert "t_store_sessions 3" in text
+    assert "t_store_cache_hits 2" in text
+    assert "t_store_backend" not in text
+
+
+def test_merges_worker_snapshots_and_drops_gauges_of_dead_workers(tmp_path):
+    registry = MetricsRegistry(snapshot_dir=str(tmp_path), prefix="t")
+    requests = registry.counter("requests_total", "Requests.")
+    streams = registry.gauge("streams", "Streams.")
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(1.0,))
+    requests.inc(2)
+    streams.set(1)
+    latency.observe(0.5)
+
+    other = registry.snapshot()
+    dead_pid = 2 ** 22 + 12345  # above the default pid_max, so never a live process
+    other["pid"] = dead_pid
+    (tmp_path / f"{dead_pid}.json").write_text(json.dumps(other))
+
+    text = registry.render()
+
+    assert "t_requests_total 4" in text
+    assert "t_streams 1" in text  # only this (live) worker
+    assert 't_latency_seconds_bucket{le="1"} 2' in text
+    assert os.path.exists(tmp_path / f"{os.getpid()}.json")
+
+
+def test_metric_types_missing_an_operation_fail_when_created():
+    class Unfinished(_Metric):
+        def snapshot(self):
+            return {}
+
+    with pytest.raises(TypeError, match="_new_child"):
+        Unfinished("t_x", "X.")
+
+
+def test_collector_fields_merge_by_their_declared_mode(tmp_path):
+    registry = MetricsRegistry(snapshot_dir=str(tmp_path), prefix="t")
+    stats = {"hits": 3, "mean_batch_size": 4.0, "threshold": 0.75}
+    registry.register_collector("clf", lambda: dict(stats), {"mean_batch_size": "mean", "threshold": "max"})
+
+    other = registry.snapshot()
+    other["pid"] = os.getppid()  # a live worker
+    other["metrics"]["t_clf_mean_batch_size"]["samples"] = [[[], 2.0]]
+    (tmp_path / f"{os.getppid()}.json").write_text(json.dumps(other))
+
+    text = registry.render()
+
+    assert "t_clf_hits 6" in text
+    assert "t_clf_mean_batch_size 3" in text
+    assert "t_clf_threshold 0.75" in text
+
+
+def test_metrics_endpoint_reports_chat_traffic(fake_llm_service):
+    app.dependency_overrides[chat_module.get_llm_service] = lambda: fake_llm_service
+    try:
+        with TestClient(app) as client:
+            client.post("/api/v1/chat", json={"messages": [{"role": "user", "content": "hi"}], "session_id": "m1"})
+            client.post("/api/v1/chat", json={"messages": [{"role": "user", "content": "you stupid bot"}],
+                                              "session_id": "m2"})
+            response = client.get("/metrics")
+    finally:
+        app.dependency_overrides = {}
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'chatterbox_chat_requests_total{outcome="generated"}' in text
+    assert 'chatterbox_chat_requests_total{outcome="input_guardrail"}' in text
+    assert 'chatterbox_guardrail_triggers_total{stage="input",category="input_denylist"}' in text
+    assert "chatterbox_time_to_first_token_seconds_count" in text
+    assert "chatterbox_response_tokens_bucket" in text
+    assert "chatterbox_active_streams 0" in text
+    assert "chatterbox_admission_in_flight 0" in text
+    assert "chatterbox_sessions " in text
@@ -0,0 +1,68 @@
+import asyncio
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import chat as chat_module
+from app.core.config import Settings, settings
+from app.core.guardrails_config import CANNED_RESPONSE_INPUT_TRIGGERED
+from app.main import app
+from app.services.moderation_classifier import (
+    LinearModerationModel, MicroBatcher, load_moderation_model, moderation_classifier,
+)
+from app.utils.text_vectors import HashedNgramEncoder
+
+PARAPHRASES = ["go and end yourself already", "describe explicit sex", "you idiotic bot"]
+BENIGN = ["Hey Chandler, how are you?", "What do you think about this image?", "this homework is killing me"]
+
+
+def test_batch_encoding_matches_single_encoding():
+    encoder = HashedNgramEncoder(dim=256)
+    texts = ["Hello there", "", "Could I BE any more vague?"]
+
+    matrix = encoder.encode_batch(texts)
+
+    assert np.array_equal(matrix, np.stack([encoder.encode(text) for text in texts]))
+
+
+def test_seed_model_separates_paraphrases_from_small_talk(tmp_path):
+    model = load_moderation_model()
+    scores = model.score_batch(PARAPHRASES + BENIGN)
+
+    assert scores[:3].min() >= moderation_classifier.threshold > scores[3:].max()
+    model.save(str(tmp_path / "model.npz"))
+    assert np.allclose(LinearModerationModel.load(str(tmp_path / "model.npz")).score_batch(PARAPHRASES), scores[:3])
+
+
+async def test_concurrent_requests_share_one_batch():
+    batches = []
+
+    def score_batch(texts):
+        batches.append(list(texts))
+        return np.arange(len(texts), dtype=np.float32)
+
+    batcher = MicroBatcher(score_batch, max_batch=4, max_delay=0.01)
+    scores = await asyncio.gather(*(batcher.score(f"m{i}") for i in range(6)))
+
+    assert scores == [0.0, 1.0, 2.0, 3.0, 0.0, 1.0]
+    assert batches == [["m0", "m1", "m2", "m3"], ["m4", "m5"]]  # full batch at once, the rest after the window
+
+
+def test_classifier_is_off_unless_a_trained_model_is_configured():
+    assert Settings(MODERATION_MODEL_PATH="", MODERATION_CLASSIFIER_ENABLED=None).MODERATION_CLASSIFIER_ENABLED is False
+    assert Settings(MODERATION_MODEL_PATH="model.npz", MODERATION_CLASSIFIER_ENABLED=None).MODERATION_CLASSIFIER_ENABLED is True
+    assert Settings(MODERATION_MODEL_PATH="", MODERATION_CLASSIFIER_ENABLED=True).MODERATION_CLASSIFIER_ENABLED is True
+
+
+def test_paraphrases_missed_by_the_denylist_get_the_canned_reply(fake_llm_service, monkeypatch):
+    monkeypatch.setattr(settings, "MODERATION_CLASSIFIER_ENABLED", True)
+    app.dependency_overrides[chat_module.get_llm_service] = lambda: fake_llm_service
+    try:
+        with TestClient(app) as client:
+            refused = client.post("/api/v1/chat", json={"messages": [{"role": "user", "content": PARAPHRASES[0]}]})
+            allowed = client.post("/api/v1/chat", json={"messages": [{"role": "user", "content": BENIGN[0]}]})
+    finally:
+        app.dependency_overrides = {}
+
+    assert CANNED_RESPONSE_INPUT_TRIGGERED in refused.text
+    assert "from Chandler" in allowed.text
@@ -0,0 +1,63 @@
+import gc
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services.character_registry import character_registry
+from app.services.prompt_assembly import PromptAssembler, encode_message
+
+
+def turns(count, start=0):
+    return [m for i in range(start, start + count) for m in (HumanMessage(content=f"q{i}"), AIMessage(content=f"a{i}"))]
+
+
+def test_assembled_prompt_matches_the_character_template():
+    character = character_registry.get()
+    history = turns(3)
+
+    assembled = PromptAssembler().assemble(character, "s", history, "what now?")
+    rendered = character.prompt.format_messages(chat_history=history, user_input_combined="what now?")
+
+    assert [(m.type, m.content) for m in assembled] == [(m.type, m.content) for m in rendered]
+
+
+def test_each_message_is_encoded_once_across_turns():
+    assembler = PromptAssembler()
+    character = character_registry.get()
+    history = turns(2)
+    first = assembler.encode_messages(assembler.assemble(character, "s", history, "q2"))
+    misses = assembler.encodings.misses
+
+    history += [HumanMessage(content="q2"), AIMessage(content="a2")]
+    body = assembler.encode_messages(assembler.assemble(character, "s", history, "q3"))
+
+    assert assembler.encodings.misses - misses == 3  # the new turn's two messages and the new input
+    assert json.loads(body)[-3:] == [json.loads(encode_message(m)) for m in history[-2:]] + [{"role": "user", "content": "q3"}]
+    assert json.loads(first)[0] == json.loads(body)[0] == {"role": "system", "content": character.system_prompt}
+    assert assembler.restarts == 0
+
+
+def test_trimmed_history_restarts_the_transcript():
+    assembler = PromptAssembler()
+    character = character_registry.get()
+    history = turns(3)
+    assembler.assemble(character, "s", history, "x")
+
+    trimmed = history[2:] + turns(1, start=3)
+    messages = assembler.assemble(character, "s", trimmed, "y")
+
+    assert assembler.restarts == 1
+    assert [m.content for m in messages[1:-1]] == [m.content for m in trimmed]
+    assert [item["content"] for item in json.loads(assembler.encode_messages(messages))[1:-1]] == [m.content for m in trimmed]
+
+
+def test_encodings_are_dropped_with_their_messages():
+    assembler = PromptAssembler()
+    message = HumanMessage(content="short-lived")
+    assembler.encodings.encode(message)
+    count = len(assembler.encodings)
+
+    del message
+    gc.collect()
+
+    assert len(assembler.encodings) == count - 1
@@ -0,0 +1,171 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import chat as chat_module
+from app.core.config import settings
+from app.main import app
+from app.services.rate_limit import (
+    RateLimitExceeded, RateLimitMiddleware, SessionRateLimits, TokenBucketLimiter,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_buckets_refill_lazily_and_report_the_wait():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=2.0, burst=3, clock=clock)
+
+    assert [limiter.acquire("k") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("k") == 0.5
+    clock.now = 0.5
+    assert limiter.acquire("k") == 0.0
+    assert limiter.acquire("other") == 0.0  # keys are independent
+
+
+def test_memory_is_bounded_and_refilled_buckets_are_dropped_first():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=1.0, burst=2, shards=1, max_keys=400, clock=clock)
+    for index in range(10_000):
+        limiter.acquire(f"ip-{index}")
+    assert len(limiter) == 400
+
+    clock.now = 10.0  # every bucket has refilled: the next arrivals sweep them out
+    for index in range(8):
+        limiter.acquire(f"late-{index}")
+    assert len(limiter) == 8
+
+
+async def test_session_token_budget_is_charged_after_the_reply():
+    clock = FakeClock()
+    limits = SessionRateLimits(tokens=TokenBucketLimiter(rate=10.0, burst=100, clock=clock))
+
+    async def reply():
+        yield "x" * 400
+
+    assert [text async for text in limits.metered("s", "hi", reply())] == ["x" * 400]
+    with pytest.raises(RateLimitExceeded) as refused:
+        limits.check("s")  # 101 estimated tokens charged against a budget of 100
+    assert (refused.value.scope, refused.value.retry_after) == ("session_tokens", 1)
+    clock.now = 0.1
+    limits.check("s")
+
+
+def test_middleware_refuses_over_limit_clients_with_retry_after():
+    inner = FastAPI()
+
+    @inner.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    @inner.get("/health")
+    async def health():
+        return {"ok": True}
+
+    limited = RateLimitMiddleware(inner, TokenBucketLimiter(rate=0.1, burst=2))
+    with TestClient(limited) as client:
+        statuses = [client.get("/api/ping").status_code for _ in range(3)]
+        refused = client.get("/api/ping")
+        health_response = client.get("/health")
+
+    assert statuses == [200, 200, 429]
+    assert refused.headers["retry-after"] == "10"
+    assert health_response.status_code == 200
+
+
+def test_chat_sessions_are_limited_independently(monkeypatch):
+    monkeypatch.setattr(chat_module.session_rate_limits, "requests", TokenBucketLimiter(rate=0.01, burst=1))
+    canned = {"messages": [{"role": "user", "content": "you stupid bot"}]}
+    with TestClient(app) as client:
+        first = client.post("/api/v1/chat", json={**canned, "session_id": "limited-a"})
+        second = client.post("/api/v1/chat", json={**canned, "session_id": "limited-a"})
+        other = client.post("/api/v1/chat", json={**canned, "session_id": "limited-b"})
+
+    assert (first.status_code, second.status_code, other.status_code) == (200, 429, 200)
+    assert int(second.headers["retry-after"]) == 100
+
+
+async def test_metered_stream_closes_the_reply_before_finishing():
+    events = []
+
+    async def reply():
+        try:
+            yield "partial"
+            yield "never sent"
+        finally:
+            events.append("reply closed")
+
+    async def consume():
+        stream = SessionRateLimits().metered("s", "hi", reply())
+        try:
+            await stream.__anext__()
+        finally:
+            await stream.aclose()
+            events.append("metered closed")
+
+    await consume()
+    assert events == ["reply closed", "metered closed"]
+
+
+def test_refusals_carry_cors_headers_and_preflights_are_free():
+    middleware = [entry.cls for entry in app.user_middleware]  # outermost first
+    assert middleware.index(CORSMiddleware) < middleware.index(RateLimitMiddleware)
+
+    inner = FastAPI()
+
+    @inner.post("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    inner.add_middleware(RateLimitMiddleware, limiter=TokenBucketLimiter(rate=0.01, burst=1))
+    inner.add_middleware(CORSMiddleware, allow_origins=["http://localhost:3000"], allow_methods=["*"],
+                         expose_headers=["Retry-After"])
+    origin = {"Origin": "http://localhost:3000"}
+    with TestClient(inner) as client:
+        preflights = [client.options("/api/ping", headers={
+            **origin, "Access-Control-Request-Method": "POST"}).status_code for _ in range(3)]
+        first = client.post("/api/ping", headers=origin)
+        refused = client.post("/api/ping", headers=origin)
+
+    assert preflights == [200, 200, 200] and first.status_code == 200
+    assert refused.status_code == 429
+    assert refused.headers["access-control-allow-origin"] == "http://localhost:3000"
+    assert refused.headers["access-control-expose-headers"] == "Retry-After"
+
+
+def test_batches_cost_one_ip_token_per_item(fake_llm_service, monkeypatch):
+    monkeypatch.setattr(chat_module, "ip_rate_limiter", TokenBucketLimiter(rate=0.01, burst=5))
+    app.dependency_overrides[chat_module.get_llm_service] = lambda: fake_llm_service
+
+    def batch(size):
+        return {"items": [{"messages": [{"role": "user", "content": "you stupid bot"}]}] * size}
+
+    try:
+        with TestClient(app) as client:
+            first = client.post("/api/v1/chat/batch", json=batch(5))
+            second = client.post("/api/v1/chat/batch", json=batch(3))
+    finally:
+        app.dependency_overrides = {}
+
+    assert (first.status_code, second.status_code) == (200, 429)
+    assert int(second.headers["retry-after"]) == 100
+
+
+def test_anonymous_chats_are_limited_per_client(monkeypatch):
+    monkeypatch.setattr(chat_module.session_rate_limits, "requests", TokenBucketLimiter(rate=0.01, burst=1))
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED_FOR", True)
+    canned = {"messages": [{"role": "user", "content": "you stupid bot"}]}
+    with TestClient(app) as client:
+        statuses = [
+            client.post("/api/v1/chat", json=canned, headers={"X-Forwarded-For": ip}).status_code
+            for ip in ("10.0.0.1", "10.0.0.1", "10.0.0.2")
+        ]
+
+    assert statuses == [200, 429, 200]
@@ -0,0 +1,112 @@
+import asyncio
+
+from app.services.llm_service import LLMService
+from app.services.request_coalescing import SingleFlight
+from app.services.response_cache import response_cache
+
+
+class Upstream:
+    """Controllable upstream: emits tokens when released, counts how often it was started."""
+
+    def __init__(self, tokens, fail_after=None):
+        self.tokens = tokens
+        self.fail_after = fail_after
+        self.starts = 0
+        self.closed = False
+        self.gate = asyncio.Event()
+
+    async def stream(self):
+        self.starts += 1
+        try:
+            for index, token in enumerate(self.tokens):
+                if index == 1:
+                    await self.gate.wait()
+                if self.fail_after is not None and index == self.fail_after:
+                    raise RuntimeError("upstream failed")
+                yield token
+                await asyncio.sleep(0)
+        finally:
+            self.closed = True
+
+
+async def collect(subscription):
+    return [token async for token in subscription]
+
+
+async def test_identical_requests_share_one_upstream_and_late_joiners_replay():
+    flight = SingleFlight()
+    upstream = Upstream(["a", "b", "c"])
+
+    first = flight.subscribe("key", upstream.stream)
+    first_task = asyncio.create_task(collect(first))
+    await asyncio.sleep(0.01)  # "a" has been produced
+    second = flight.subscribe("key", upstream.stream)
+    upstream.gate.set()
+
+    assert await first_task == ["a", "b", "c"]
+    assert await collect(second) == ["a", "b", "c"]
+    assert upstream.starts == 1
+    assert first.is_leader and not second.is_leader
+    assert flight.in_flight == 0
+
+
+async def test_errors_reach_every_subscriber():
+    flight = SingleFlight()
+    upstream = Upstream(["a", "b", "c"], fail_after=2)
+    subscriptions = [flight.subscribe("key", upstream.stream) for _ in range(3)]
+    upstream.gate.set()
+
+    results = await asyncio.gather(*(collect(s) for s in subscriptions), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+async def test_upstream_survives_one_disconnect_and_is_cancelled_when_all_leave():
+    flight = SingleFlight()
+    upstream = Upstream(["a", "b", "c"])
+    leader = flight.subscribe("key", upstream.stream)
+    follower = flight.subscribe("key", upstream.stream)
+
+    assert await anext(aiter(leader)) == "a"
+    await leader.aclose()  # leader's client went away
+    assert not upstream.closed
+
+    assert await anext(aiter(follower)) == "a"
+    await follower.aclose()
+    await asyncio.sleep(0.01)
+    assert upstream.closed
+    assert flight.in_flight == 0
+
+    # A new request after abandonment starts a fresh upstream.
+    upstream.gate.set()
+    assert await collect(flight.subscribe("key", upstream.stream)) == ["a", "b", "c"]
+    assert upstream.starts == 2
+
+
+async def test_concurrent_identical_turns_record_history_for_every_session(fake_llm_service):
+    response_cache.clear()
+
+    async def ask(session_id):
+        return "".join([t async for t in fake_llm_service.async_generate_streaming_response(
+            "tell me a joke", conversation_id=session_id)])
+
+    replies = await asyncio.gather(*(ask(f"viral-{i}") for i in range(5)))
+
+    assert replies == ["Reply 1 from Chandler."] * 5
+    for i in range(5):
+        history = fake_llm_service.get_session_history(f"viral-{i}").messages
+        assert [m.content for m in history] == ["tell me a joke", "Reply 1 from Chandler."]
+    response_cache.clear()
+
+
+async def test_turns_for_different_models_never_share_an_upstream(fake_llm_service):
+    response_cache.clear()
+    cooler_service = LLMService(temperature=0.1)
+
+    async def ask(service, session_id):
+        return "".join([t async for t in service.async_generate_streaming_response(
+            "tell me a joke", conversation_id=session_id)])
+
+    replies = await asyncio.gather(ask(fake_llm_service, "model-a"), ask(cooler_service, "model-b"))
+
+    assert sorted(replies) == ["Reply 1 from Chandler.", "Reply 2 from Chandler."]
+    response_cache.clear()
@@ -0,0 +1,71 @@
+from app.services.response_cache import SemanticResponseCache, replay_stream, response_cache
+
+
+def test_exact_and_near_duplicate_prompts_hit():
+    cache = SemanticResponseCache(similarity_threshold=0.8)
+    cache.store("chandler", "Hi Chandler!", "Hi. Could I BE any happier to see you?")
+    cache.store("chandler", "Tell me a joke", "Knock knock.")
+
+    assert cache.lookup("chandler", "hi chandler") == "Hi. Could I BE any happier to see you?"
+    assert cache.lookup("chandler", "Please tell me a joke!") == "Knock knock."
+    assert cache.lookup("chandler", "what is your job?") is None
+
+
+def test_one_word_changes_are_different_questions():
+    cache = SemanticResponseCache()
+    cache.store("chandler", "tell me a joke about ross", "Ross joke.")
+    cache.store("chandler", "what do you think of joey", "Great guy.")
+
+    assert cache.lookup("chandler", "Tell me a joke about Ross!") == "Ross joke."
+    assert cache.lookup("chandler", "tell me a joke about rose") is None  # scores 0.925
+    assert cache.lookup("chandler", "what do you think of joe") is None
+
+
+def test_namespaces_are_isolated():
+    cache = SemanticResponseCache()
+    cache.store("chandler", "tell me a joke", "Knock knock.")
+    assert cache.lookup("tyrion", "tell me a joke") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticResponseCache(max_entries=2)
+    cache.store("c", "first prompt", "one")
+    cache.store("c", "second prompt", "two")
+    cache.lookup("c", "first prompt")
+    cache.store("c", "third prompt", "three")
+
+    assert cache.lookup("c", "second prompt") is None
+    assert cache.lookup("c", "first prompt") == "one"
+    assert cache.lookup("c", "third prompt") == "three"
+
+
+def test_batched_lookup():
+    cache = SemanticResponseCache()
+    cache.store("c", "tell me a joke", "joke")
+    cache.store("c", "what's your job", "statistical analysis")
+    assert cache.lookup_many("c", ["What's your job?", "unrelated question", "Tell me a joke"]) == [
+        "statistical analysis", None, "joke"
+    ]
+
+
+async def test_replay_stream_reconstructs_text():
+    text = "Could I BE any more\ncached?  Yes."
+    chunks = [chunk async for chunk in replay_stream(text)]
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+
+
+async def test_first_turn_reply_is_served_from_cache_for_new_sessions(fake_llm_service):
+    response_cache.clear()
+    first = "".join([t async for t in fake_llm_service.async_generate_streaming_response(
+        "Hi Chandler!", conversation_id="cache-session-1")])
+    second = "".join([t async for t in fake_llm_service.async_generate_streaming_response(
+        "hi chandler", conversation_id="cache-session-2")])
+    follow_up = "".join([t async for t in fake_llm_service.async_generate_streaming_response(
+        "hi chandler", conversation_id="cache-session-2")])
+
+    assert first == second == "Reply 1 from Chandler."
+    assert follow_up == "Reply 2 from Chandler."  # not context-free any more
+    history = fake_llm_service.get_session_history("cache-session-2").messages
+    assert [m.content for m in history] == ["hi chandler", "Reply 1 from Chandler.", "hi chandler", "Reply 2 from Chandler."]
+    response_cache.clear()
@@ -0,0 +1,47 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services.service_registry import LLMServiceRegistry
+
+
+@pytest.fixture
+def api_key(monkeypatch):
+    monkeypatch.setattr(settings, "GOOGLE_API_KEY", "test-key")
+
+
+def test_registry_pools_services_by_key(api_key):
+    registry = LLMServiceRegistry()
+
+    default_service = registry.get()
+    assert registry.get() is default_service
+    assert registry.get(temperature=0.1) is not default_service
+    assert registry.health()["pooled_services"] == 2
+
+
+async def test_registry_warm_up_sets_readiness(api_key):
+    registry = LLMServiceRegistry()
+    assert not registry.is_ready
+
+    assert await registry.warm_up() is True
+    assert registry.is_ready
+    assert registry.health()["warmup_duration_ms"] is not None
+
+
+async def test_registry_warm_up_failure_is_reported(monkeypatch):
+    monkeypatch.setattr(settings, "GOOGLE_API_KEY", None)
+    registry = LLMServiceRegistry()
+
+    assert await registry.warm_up() is False
+    health = registry.health()
+    assert health["ready"] is False
+    assert "GOOGLE_API_KEY" in health["last_error"]
+
+
+def test_health_and_ready_endpoints(api_key):
+    with TestClient(app) as client:
+        assert client.get("/health").json() == {"status": "ok"}
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["ready"] is True
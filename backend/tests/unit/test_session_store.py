@@ -0,0 +1,92 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services.session_store import BaseSessionStore, InMemorySessionStore, estimate_message_bytes
+from app.utils.history_fingerprint import (
+    EMPTY_HISTORY_FINGERPRINT, extend_fingerprint, fingerprint_messages,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def add_turn(history, text="hello"):
+    history.add_messages([HumanMessage(content=text), AIMessage(content=text)])
+
+
+def test_lru_eviction_by_session_count():
+    store = InMemorySessionStore(max_sessions=2)
+    store.get("a")
+    store.get("b")
+    store.get("a")  # "b" is now least recently used
+    store.get("c")
+
+    assert "a" in store and "c" in store
+    assert "b" not in store
+    assert store.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_oldest_sessions():
+    store = InMemorySessionStore(max_bytes=20_000)
+    for session_id in ("a", "b", "c"):
+        add_turn(store.get(session_id), "x" * 4000)
+
+    stats = store.stats()
+    assert stats["bytes"] <= 20_000
+    assert "c" in store and "a" not in store
+
+
+def test_messages_per_session_are_trimmed_by_whole_turns():
+    store = InMemorySessionStore(max_messages_per_session=4)
+    history = store.get("a")
+    for i in range(5):
+        add_turn(history, f"turn {i}")
+
+    assert [m.content for m in history.messages] == ["turn 3", "turn 3", "turn 4", "turn 4"]
+    assert store.stats()["bytes"] == sum(estimate_message_bytes(m) for m in history.messages)
+
+
+def test_idle_sessions_expire_on_access_and_sweep():
+    clock = FakeClock()
+    store = InMemorySessionStore(ttl_seconds=10, clock=clock)
+    add_turn(store.get("a"))
+    store.get("b")
+
+    clock.now = 5
+    store.get("b")
+    clock.now = 12
+    assert store.sweep() == 1
+    assert "a" not in store and "b" in store
+
+    clock.now = 30
+    assert store.get("b").messages == []
+    assert store.stats()["expirations"] == 2
+
+
+def test_history_fingerprint_covers_every_turn_and_survives_trimming():
+    store = InMemorySessionStore(max_messages_per_session=2)
+    assert store.history_fingerprint("s") == (EMPTY_HISTORY_FINGERPRINT, 0)
+    history = store.get("s")
+    expected = EMPTY_HISTORY_FINGERPRINT
+    for text in ("q1", "q2"):
+        history.add_messages([HumanMessage(content=text), AIMessage(content=f"a-{text}")])
+        expected = extend_fingerprint(extend_fingerprint(expected, "user", text), "assistant", f"a-{text}")
+
+    assert store.history_fingerprint("s") == (expected, 2)
+    assert expected != fingerprint_messages(history.messages)  # trimmed turns still count
+    history.clear()
+    assert store.history_fingerprint("s") == (EMPTY_HISTORY_FINGERPRINT, 0)
+
+
+def test_stores_missing_an_operation_fail_when_created():
+    class IncompleteStore(BaseSessionStore):
+        def sweep(self) -> int:
+            return 0
+
+    with pytest.raises(TypeError, match="history_fingerprint"):
+        IncompleteStore()
@@ -0,0 +1,165 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services.sqlite_session_store import SQLiteSessionStore
+from app.utils.history_fingerprint import fingerprint_messages
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def make_store(db_path, **kwargs):
+    kwargs.setdefault("flush_interval_seconds", 0.05)
+    return SQLiteSessionStore(path=db_path, **kwargs)
+
+
+def refreshed(store, session_id):
+    """The session as a turn sees it: revalidated (off the event loop) first."""
+    asyncio.run(store.refresh(session_id))
+    return store.get(session_id)
+
+
+class CommitFailsStore(SQLiteSessionStore):
+    """A store whose writer cannot commit (a full disk, say)."""
+
+    def _connect(self):
+        conn = super()._connect()
+        return FailingCommit(conn) if threading.current_thread().name == "sqlite-session-writer" else conn
+
+
+class FailingCommit:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT":
+            raise sqlite3.OperationalError("database or disk is full")
+        return self._conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_database_uses_wal_mode(db_path):
+    store = make_store(db_path)
+    store.close()
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+
+
+def test_appends_are_visible_immediately_and_batched_on_disk(db_path):
+    store = make_store(db_path)
+    history = store.get("s1")
+    for i in range(20):
+        history.add_messages([HumanMessage(content=f"q{i}"), AIMessage(content=f"a{i}")])
+
+    assert len(history.messages) == 40  # served from the read cache before the flush
+    assert store.flush(timeout=5)
+    stats = store.stats()
+    assert stats["rows_written"] == 40
+    assert stats["batches_written"] < 20
+    store.close()
+
+
+def test_other_workers_see_committed_turns(db_path):
+    worker_a = make_store(db_path)
+    worker_b = make_store(db_path)
+
+    worker_a.get("s1").add_messages([HumanMessage(content="hi"), AIMessage(content="hello")])
+    worker_a.flush(timeout=5)
+    assert [m.content for m in worker_b.get("s1").messages] == ["hi", "hello"]
+
+    # worker_b now has the session cached; a new turn from worker_a must still show up.
+    worker_a.get("s1").add_messages([HumanMessage(content="again"), AIMessage(content="sure")])
+    worker_a.flush(timeout=5)
+    assert [m.content for m in worker_b.get("s1").messages] == ["hi", "hello"]  # reads alone never query
+    assert [m.content for m in refreshed(worker_b, "s1").messages][-2:] == ["again", "sure"]
+    assert isinstance(worker_b.get("s1").messages[-1], AIMessage)
+
+    worker_a.close()
+    worker_b.close()
+
+
+def test_rows_from_another_worker_are_not_hidden_by_our_own_appends(db_path):
+    worker_a = make_store(db_path)
+    worker_b = make_store(db_path)
+    worker_a.get("s1").add_messages([HumanMessage(content="hi")])
+    worker_a.flush(timeout=5)
+    assert len(worker_b.get("s1").messages) == 1  # cached by worker_b
+
+    worker_a.get("s1").add_messages([HumanMessage(content="from a")])
+    worker_a.flush(timeout=5)
+    worker_b.get("s1").add_messages([HumanMessage(content="from b")])  # appended before revalidating
+    worker_b.flush(timeout=5)
+
+    transcript = [HumanMessage(content="hi"), HumanMessage(content="from a"), HumanMessage(content="from b")]
+    assert [m.content for m in refreshed(worker_b, "s1").messages] == [m.content for m in transcript]
+    assert worker_b.history_fingerprint("s1") == (fingerprint_messages(transcript), 3)
+    refreshed(worker_a, "s1")
+    assert worker_a.history_fingerprint("s1") == (fingerprint_messages(transcript), 3)
+    worker_a.close()
+    worker_b.close()
+
+
+def test_history_is_capped_per_session(db_path):
+    store = make_store(db_path, max_messages_per_session=4)
+    history = store.get("s1")
+    for i in range(5):
+        history.add_messages([HumanMessage(content=f"q{i}"), AIMessage(content=f"a{i}")])
+    store.flush(timeout=5)
+    store.close()
+
+    reopened = make_store(db_path, max_messages_per_session=4)
+    assert [m.content for m in reopened.get("s1").messages] == ["q3", "a3", "q4", "a4"]
+    reopened.close()
+
+
+def test_history_fingerprint_is_persisted_with_each_message(db_path):
+    store = make_store(db_path, max_messages_per_session=2)
+    turns = [HumanMessage(content="q0"), AIMessage(content="a0"), HumanMessage(content="q1"), AIMessage(content="a1")]
+    store.get("s1").add_messages(turns)
+    expected = (fingerprint_messages(turns), 2)
+    assert store.history_fingerprint("s1") == expected
+    store.flush(timeout=5)
+    store.close()
+
+    other_worker = make_store(db_path, max_messages_per_session=2)
+    assert other_worker.history_fingerprint("s1") == expected
+    other_worker.close()
+
+
+def test_turns_that_fail_to_commit_are_not_served_from_the_cache(db_path):
+    store = make_store(db_path)
+    store.get("s1").add_messages([HumanMessage(content="kept")])
+    store.flush(timeout=5)
+    store.close()
+
+    failing = CommitFailsStore(path=db_path, flush_interval_seconds=0.05)
+    history = failing.get("s1")
+    history.add_messages([HumanMessage(content="lost"), AIMessage(content="also lost")])
+    assert failing.flush(timeout=5)
+
+    assert [m.content for m in refreshed(failing, "s1").messages] == ["kept"]
+    assert failing.stats()["rows_written"] == 0
+    failing.close()
+
+
+def test_close_closes_the_readers_of_every_thread(db_path):
+    store = make_store(db_path)
+    store.get("s1").add_messages([HumanMessage(content="hi")])
+    store.flush(timeout=5)
+    refreshed(store, "s1")  # opens a reader in a worker thread
+    readers = list(store._readers)
+    store.close()
+
+    assert len(readers) == 2 and store._readers == []
+    for conn in readers:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import pytest
+
+from app.utils import stream_framing
+from app.utils.stream_framing import coalesce_frames, encode_text_frame
+
+
+def decode(frames):
+    parts = []
+    for frame in frames:
+        assert frame.startswith(b"0:") and frame.endswith(b"\n")
+        parts.append(json.loads(frame[2:]))
+    return parts
+
+
+async def token_stream(tokens, delay=0.0, error=None):
+    for token in tokens:
+        if delay:
+            await asyncio.sleep(delay)
+        yield token
+    if error is not None:
+        raise error
+
+
+async def collect(frames):
+    return [frame async for frame in frames]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_frames_are_valid_sdk_text_parts(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(stream_framing, "orjson", None)
+    text = 'He said "hi"\n\tthen… 🎉 left \\ quickly'
+    assert decode([encode_text_frame(text)]) == [text]
+
+
+async def test_first_token_is_flushed_alone_then_tokens_are_coalesced():
+    tokens = ["Could ", "I ", "BE ", "any ", "more ", "framed?"]
+    frames = await collect(coalesce_frames(token_stream(tokens, delay=0.002), max_delay=0.2))
+    assert decode(frames) == ["Could ", "I BE any more framed?"]
+
+
+async def test_time_cap_flushes_partial_window():
+    tokens = ["a", "b", "c", "d"]
+    frames = await collect(coalesce_frames(token_stream(tokens, delay=0.03), max_delay=0.01))
+    assert "".join(decode(frames)) == "abcd"
+    assert len(frames) == 4
+
+
+async def test_time_cap_flushes_held_text_while_upstream_stalls():
+    resume = asyncio.Event()
+
+    async def stalling_stream():
+        yield "a"
+        await asyncio.sleep(0.005)
+        yield "b"
+        await resume.wait()
+        yield "c"
+
+    frames = coalesce_frames(stalling_stream(), max_delay=0.02)
+    assert decode([await asyncio.wait_for(frames.__anext__(), 1)]) == ["a"]
+    assert decode([await asyncio.wait_for(frames.__anext__(), 1)]) == ["b"]
+    resume.set()
+    assert decode(await collect(frames)) == ["c"]
+
+
+async def test_size_cap_flushes_before_the_time_cap():
+    tokens = ["x" * 4] * 6
+    frames = await collect(coalesce_frames(token_stream(tokens, delay=0.002), max_chars=8, max_delay=1.0))
+    assert decode(frames) == ["xxxx", "xxxxxxxx", "xxxxxxxx", "xxxx"]
+
+
+async def test_tokens_that_pile_up_go_out_in_one_frame():
+    frames = await collect(coalesce_frames(token_stream(["a", "b", "c"]), max_delay=0))
+    assert decode(frames) == ["abc"]
+
+
+async def test_zero_delay_never_waits_for_more_tokens():
+    frames = await collect(coalesce_frames(token_stream(["a", "b", "c"], delay=0.01), max_delay=0))
+    assert decode(frames) == ["a", "b", "c"]
+
+
+async def test_pending_text_is_flushed_before_upstream_error():
+    frames = []
+    with pytest.raises(RuntimeError):
+        async for frame in coalesce_frames(token_stream(["a", "b", "c"], error=RuntimeError("boom")), max_delay=1.0):
+            frames.append(frame)
+    assert decode(frames) == ["abc"]
+
+
+async def test_slow_reader_bounds_buffered_tokens_and_disconnect_closes_upstream():
+    produced = []
+    closed = asyncio.Event()
+
+    async def endless_upstream():
+        try:
+            while True:
+                produced.append(len(produced))
+                yield "tok "
+                await asyncio.sleep(0)
+        finally:
+            closed.set()
+
+    before = stream_framing.stream_counters.stats()
+    frames = coalesce_frames(endless_upstream(), max_delay=0.01, queue_size=8)
+    await frames.__anext__()
+    await asyncio.sleep(0.05)  # reader stalls; the pump must stop at the queue bound
+    assert len(produced) <= 10
+
+    await frames.aclose()
+    await asyncio.wait_for(closed.wait(), 1)
+    after = stream_framing.stream_counters.stats()
+    assert after["streams_cancelled"] == before["streams_cancelled"] + 1
+    assert after["tokens_abandoned"] > before["tokens_abandoned"]